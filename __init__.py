@@ -14,10 +14,14 @@ from .fast64_internal.sm64.sm64_geolayout_parser import generateMetarig
 from .fast64_internal.oot import OOT_Properties, oot_register, oot_unregister
 from .fast64_internal.oot.oot_level import OOT_ObjectProperties
 from .fast64_internal.utility_anim import utility_anim_register, utility_anim_unregister, ArmatureApplyWithMeshOperator
+from .fast64_internal.utility_profile import exportProfiler
+from .fast64_internal.f3d.f3d_cost_estimate import DISPLAY_LIST_COST_SORT_FIELDS, getCostliest
 
 from .fast64_internal.f3d.f3d_material import mat_register, mat_unregister
 from .fast64_internal.f3d.f3d_render_engine import render_engine_register, render_engine_unregister
 from .fast64_internal.f3d.f3d_writer import f3d_writer_register, f3d_writer_unregister
+from .fast64_internal.f3d.f3d_texture_cache import textureCache, F3D_ClearTextureCache
+from .fast64_internal.f3d.f3d_mesh_cache import meshCache, F3D_ClearMeshCache
 from .fast64_internal.f3d.f3d_parser import f3d_parser_register, f3d_parser_unregister
 from .fast64_internal.f3d.flipbook import flipbook_register, flipbook_unregister
 
@@ -206,6 +210,101 @@ class Fast64_GlobalSettingsPanel(bpy.types.Panel):
         col.prop(context.scene, "exportHiddenGeometry")
         col.prop(context.scene, "fullTraceback")
         prop_split(col, context.scene.fast64.settings, "anim_range_choice", "Anim Range")
+        col.prop(context.scene.fast64.settings, "optimize_triangle_order")
+        col.prop(context.scene.fast64.settings, "optimize_display_lists")
+        col.prop(context.scene.fast64.settings, "optimize_material_order")
+        col.prop(context.scene.fast64.settings, "deduplicate_geometry")
+        col.prop(context.scene.fast64.settings, "deduplicate_textures")
+        col.prop(context.scene.fast64.settings, "quantize_ci_textures")
+        col.prop(context.scene.fast64.settings, "evaluated_export")
+        prop_split(col, context.scene.fast64.settings, "export_worker_count", "Export Workers")
+        col.prop(context.scene.fast64.settings, "texture_cache_enabled")
+        if context.scene.fast64.settings.texture_cache_enabled:
+            prop_split(col, context.scene.fast64.settings, "texture_cache_size", "Texture Cache Size (MB)")
+            col.label(text=textureCache.getReport())
+            col.operator(F3D_ClearTextureCache.bl_idname)
+        col.prop(context.scene.fast64.settings, "mesh_cache_enabled")
+        if context.scene.fast64.settings.mesh_cache_enabled:
+            prop_split(col, context.scene.fast64.settings, "mesh_cache_size", "Mesh Cache Size (MB)")
+            col.label(text=meshCache.getReport())
+            col.operator(F3D_ClearMeshCache.bl_idname)
+
+
+class Fast64_ExportProfilePanel(bpy.types.Panel):
+    bl_idname = "FAST64_PT_export_profile"
+    bl_label = "Fast64 Export Profile"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Fast64"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    # called every frame
+    def draw(self, context):
+        col = self.layout.column()
+        prop_split(col, context.scene.fast64.settings, "export_log_level", "Console Output")
+        col.prop(context.scene.fast64.settings, "save_export_profile")
+
+        report = exportProfiler.lastReport
+        if report is None:
+            col.label(text="No export profiled yet.")
+            return
+
+        col.label(text=f"{report['export']}: {report['seconds']:.3f}s")
+        box = col.box().column()
+        for stage, stats in report["stages"].items():
+            row = box.row()
+            row.label(text=stage)
+            row.label(text=f"{stats['ownSeconds']:.3f}s ({stats['seconds']:.3f}s total)")
+            row.label(text=f"{stats['calls']} calls")
+        if len(report["counters"]) > 0:
+            box = col.box().column()
+            for counter, count in report["counters"].items():
+                row = box.row()
+                row.label(text=counter)
+                row.label(text=str(count))
+
+
+class Fast64_DisplayListCostPanel(bpy.types.Panel):
+    bl_idname = "FAST64_PT_display_list_cost"
+    bl_label = "Fast64 Display List Cost"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Fast64"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    # called every frame
+    def draw(self, context):
+        settings = context.scene.fast64.settings
+        col = self.layout.column()
+        col.prop(settings, "estimate_display_list_cost")
+        prop_split(col, settings, "display_list_cost_sort", "Sort By")
+
+        reports = exportProfiler.lastCostReports
+        if reports is None:
+            col.label(text="No display list cost estimated yet.")
+            return
+
+        field = settings.display_list_cost_sort
+        for report in reports:
+            total = report["total"]
+            col.label(text=f"{report['model']}: {total['triangles']} tris, {total['vertexBytes']} vertex bytes")
+            col.label(text=f"{total['tmemBytes']} TMEM bytes in {total['textureLoads'] + total['paletteLoads']} loads")
+            for title, section in (("Draw Layers", "drawLayers"), ("Materials", "materials"), ("Meshes", "meshes")):
+                box = col.box().column()
+                box.label(text=title)
+                for name, cost in getCostliest(report[section], field, 10):
+                    row = box.row()
+                    row.label(text=name)
+                    row.label(text=str(cost[field]))
+                    row.label(text=f"{cost['triangles']} tris")
 
 
 class Fast64_GlobalToolsPanel(bpy.types.Panel):
@@ -260,6 +359,153 @@ class Fast64Settings_Properties(bpy.types.PropertyGroup):
         default="intersect_action_and_scene",
     )
 
+    optimize_triangle_order: bpy.props.BoolProperty(
+        name="Optimize Triangle Order",
+        description=(
+            "Reorder triangles within each material to minimize vertex buffer loads.\n"
+            "This reduces vertex data size and RSP DMA time, but makes exports slower"
+        ),
+        default=False,
+    )
+
+    optimize_display_lists: bpy.props.BoolProperty(
+        name="Optimize Display Lists",
+        description=(
+            "Remove redundant syncs and state commands (ex. setting the same combiner twice) from display lists.\n"
+            "A material list called once, from a single mesh, starts with the state left by the previous material, "
+            "and doesn't load textures or palettes the previous materials left in TMEM.\n"
+            "Shared material lists are optimized on their own, since they can be called with any state"
+        ),
+        default=False,
+    )
+
+    optimize_material_order: bpy.props.BoolProperty(
+        name="Optimize Material Order",
+        description=(
+            "Draw materials in the order with the fewest texture, palette, combiner and render mode changes.\n"
+            "Skeleton limbs start with the material drawn last by the previous limb when possible.\n"
+            "The order only saves commands with Optimize Display Lists, which removes the texture loads "
+            "and state commands repeating what the previous materials set"
+        ),
+        default=False,
+    )
+
+    deduplicate_geometry: bpy.props.BoolProperty(
+        name="Deduplicate Geometry",
+        description=(
+            "Export identical vertex and triangle lists (ex. copies of the same mesh) only once per model.\n"
+            "Meshes with a copy draw the first one's lists, so their own vertex and triangle symbols aren't exported"
+        ),
+        default=False,
+    )
+
+    deduplicate_textures: bpy.props.BoolProperty(
+        name="Deduplicate Textures",
+        description=(
+            "Export images with identical pixels (ex. duplicated .001 images) only once per model.\n"
+            "Materials using a copy load the first image instead, merged images are listed in the console"
+        ),
+        default=False,
+    )
+
+    quantize_ci_textures: bpy.props.BoolProperty(
+        name="Quantize CI Textures",
+        description=(
+            "Reduce CI textures with too many colors to the 16/256 color palette limit instead of failing.\n"
+            "Flipbook textures sharing a palette are quantized together"
+        ),
+        default=False,
+    )
+
+    evaluated_export: bpy.props.BoolProperty(
+        name="Export Without Operators",
+        description=(
+            "Read evaluated meshes and apply transforms in memory, instead of duplicating objects with operators.\n"
+            "Used by SM64 level, geolayout and collision exports, and OOT scene, room, collision and DL exports"
+        ),
+        default=False,
+    )
+
+    export_log_level: bpy.props.EnumProperty(
+        name="Console Output",
+        description="How much export progress is printed to the console, printing a lot slows exports down",
+        items=[
+            ("QUIET", "Quiet", "Only print warnings and errors", 0),
+            ("NORMAL", "Normal", "Also print a summary of each export", 1),
+            ("VERBOSE", "Verbose", "Also print every converted texture and binary export address", 2),
+        ],
+        default="NORMAL",
+    )
+
+    save_export_profile: bpy.props.BoolProperty(
+        name="Save Export Profile",
+        description=(
+            "Save the time spent in each export stage to fast64_export_profile.json, "
+            "in the directory of the first exported file"
+        ),
+        default=False,
+    )
+
+    estimate_display_list_cost: bpy.props.BoolProperty(
+        name="Estimate Display List Cost",
+        description=(
+            "Estimate the vertex, triangle, texture load and sync counts of exported display lists "
+            "per draw layer, material and mesh.\n"
+            "The estimate is saved to fast64_display_list_cost.json, in the directory of the first exported file"
+        ),
+        default=False,
+    )
+
+    display_list_cost_sort: bpy.props.EnumProperty(
+        name="Sort By",
+        description="Which estimate the display list cost panel lists the costliest entries by",
+        items=[(field, label, label) for field, label in DISPLAY_LIST_COST_SORT_FIELDS],
+        default="tmemBytes",
+    )
+
+    export_worker_count: bpy.props.IntProperty(
+        name="Export Workers",
+        description=(
+            "Number of worker processes converting texture data in parallel during export.\n"
+            "0 converts everything in Blender's process. The exported data is the same either way"
+        ),
+        default=0,
+        min=0,
+        soft_max=16,
+    )
+
+    texture_cache_enabled: bpy.props.BoolProperty(
+        name="Cache Texture Conversions",
+        description=(
+            "Store converted texture data on disk, so that unchanged textures are not converted again.\n"
+            "Entries are keyed by the image pixels and texture formats"
+        ),
+        default=False,
+    )
+
+    texture_cache_size: bpy.props.IntProperty(
+        name="Texture Cache Size",
+        description="Maximum size of the texture cache in megabytes, least recently used entries are deleted first",
+        default=256,
+        min=1,
+    )
+
+    mesh_cache_enabled: bpy.props.BoolProperty(
+        name="Cache Mesh Conversions",
+        description=(
+            "Store converted vertices and triangles on disk, so that unchanged objects are not converted again.\n"
+            "Entries are keyed by the evaluated mesh data, materials and export transform"
+        ),
+        default=False,
+    )
+
+    mesh_cache_size: bpy.props.IntProperty(
+        name="Mesh Cache Size",
+        description="Maximum size of the mesh cache in megabytes, least recently used entries are deleted first",
+        default=256,
+        min=1,
+    )
+
 
 class Fast64_Properties(bpy.types.PropertyGroup):
     """
@@ -386,6 +632,8 @@ classes = (
     # Fast64_GlobalObjectPanel,
     F3D_GlobalSettingsPanel,
     Fast64_GlobalSettingsPanel,
+    Fast64_ExportProfilePanel,
+    Fast64_DisplayListCostPanel,
     SM64_ArmatureToolsPanel,
     Fast64_GlobalToolsPanel,
     UpgradeF3DMaterialsDialog,
@@ -0,0 +1,211 @@
+import bpy, addon_utils, json, os, sys, time
+
+from .utility import PluginError, fileSink, exportProfiler
+from .f3d.f3d_texture_cache import textureCache
+from .f3d.f3d_mesh_cache import meshCache
+
+# Short names of export operators for manifests, any other operator can be used with its bl_idname.
+BATCH_EXPORT_OPERATORS = {
+    "sm64_level": "object.sm64_export_level",
+    "sm64_geolayout_object": "object.sm64_export_geolayout_object",
+    "sm64_geolayout_armature": "object.sm64_export_geolayout_armature",
+    "sm64_dl": "object.sm64_export_dl",
+    "sm64_collision": "object.sm64_export_collision",
+    "sm64_anim": "object.sm64_export_anim",
+    "sm64_spline": "object.sm64_export_spline",
+    "oot_scene": "object.oot_export_level",
+    "oot_dl": "object.oot_export_dl",
+    "oot_skeleton": "object.oot_export_skeleton",
+    "oot_collision": "object.oot_export_collision",
+    "oot_anim": "object.oot_export_anim",
+    "oot_cutscene": "object.oot_export_cutscene",
+    "oot_all_cutscenes": "object.oot_export_all_cutscenes",
+    "f3d_dl": "object.f3d_export_dl",
+}
+
+# Scene properties set for every job unless the manifest sets them,
+# so that textures and meshes used by several jobs are only converted once.
+BATCH_DEFAULT_PROPERTIES = {
+    "fast64.settings.texture_cache_enabled": True,
+    "fast64.settings.mesh_cache_enabled": True,
+}
+
+
+def getPropertyOwner(scene: bpy.types.Scene, path: str):
+    """Returns (owner, attribute name) for a property path relative to the scene, ex. fast64.settings.f3d_type."""
+    owner = scene
+    names = path.split(".")
+    for name in names[:-1]:
+        owner = getattr(owner, name)
+    if not hasattr(owner, names[-1]):
+        raise PluginError(f"Scene property {path} does not exist.")
+    return owner, names[-1]
+
+
+def getPropertyValue(value):
+    """Manifest values are JSON, object pointers are written as {"object": name}."""
+    if isinstance(value, dict):
+        if "object" not in value:
+            raise PluginError(f"Invalid property value {value}, only objects can be referenced.")
+        if value["object"] not in bpy.data.objects:
+            raise PluginError(f"Object {value['object']} not found.")
+        return bpy.data.objects[value["object"]]
+    return value
+
+
+def setSceneProperties(scene: bpy.types.Scene, properties: dict) -> list[tuple]:
+    """Sets scene properties, returns the previous values to pass to restoreSceneProperties."""
+    previousValues = []
+    try:
+        for path, value in properties.items():
+            owner, name = getPropertyOwner(scene, path)
+            previousValue = getattr(owner, name)
+            if hasattr(previousValue, "__len__") and not isinstance(previousValue, (str, set, bpy.types.ID)):
+                previousValue = tuple(previousValue)
+            setattr(owner, name, getPropertyValue(value))
+            previousValues.append((owner, name, previousValue))
+    except:
+        restoreSceneProperties(previousValues)
+        raise
+    return previousValues
+
+
+def restoreSceneProperties(previousValues: list[tuple]):
+    for owner, name, value in reversed(previousValues):
+        setattr(owner, name, value)
+
+
+def selectExportObject(scene: bpy.types.Scene, viewLayer: bpy.types.ViewLayer, name: str):
+    if name not in scene.objects:
+        raise PluginError(f"Object {name} not found in scene {scene.name}.")
+    for obj in viewLayer.objects:
+        obj.select_set(False, view_layer=viewLayer)
+    obj = scene.objects[name]
+    obj.select_set(True, view_layer=viewLayer)
+    viewLayer.objects.active = obj
+
+
+def getBatchOperator(operatorName: str):
+    idname = BATCH_EXPORT_OPERATORS.get(operatorName, operatorName)
+    category, _, name = idname.partition(".")
+    operator = getattr(getattr(bpy.ops, category), name)
+    try:
+        operator.get_rna_type()
+    except KeyError:
+        raise PluginError(f"Unknown export operator {operatorName}.")
+    return operator
+
+
+def runBatchJob(job: dict, defaultProperties: dict, baseDirectory: str) -> dict:
+    """Runs one manifest job, returns its summary. Relative blend file paths are relative to baseDirectory."""
+    name = job.get("name", job["operator"])
+    result = {"name": name, "operator": job["operator"], "status": "FAILED", "error": None}
+    startTime = time.perf_counter()
+    rewritten, unchanged = fileSink.getCounts()
+    exportProfiler.lastReport = None
+    try:
+        if "blend" in job:
+            blendPath = os.path.abspath(os.path.join(baseDirectory, job["blend"]))
+            if os.path.normcase(blendPath) != os.path.normcase(os.path.abspath(bpy.data.filepath or "")):
+                bpy.ops.wm.open_mainfile(filepath=blendPath)
+
+        scene = bpy.data.scenes[job["scene"]] if "scene" in job else bpy.context.scene
+        viewLayer = scene.view_layers[job["view_layer"]] if "view_layer" in job else scene.view_layers[0]
+        operator = getBatchOperator(job["operator"])
+
+        previousValues = setSceneProperties(scene, {**defaultProperties, **job.get("properties", {})})
+        try:
+            if "object" in job:
+                selectExportObject(scene, viewLayer, job["object"])
+            with bpy.context.temp_override(scene=scene, view_layer=viewLayer):
+                # Operators report their errors, which raises a RuntimeError here.
+                status = operator()
+            result["status"] = next(iter(status))
+        finally:
+            restoreSceneProperties(previousValues)
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = round(time.perf_counter() - startTime, 6)
+    result["filesRewritten"] = fileSink.rewritten - rewritten
+    result["filesUnchanged"] = fileSink.unchanged - unchanged
+    result["profile"] = exportProfiler.lastReport
+    return result
+
+
+def runBatchExport(manifest: dict, baseDirectory: str | None = None) -> dict:
+    """
+    Runs every job of a manifest, returns a summary with the result of each job.
+    Jobs run in the same Blender session, so the texture cache, mesh cache and export workers are shared by all of them.
+    """
+    if baseDirectory is None:
+        baseDirectory = os.getcwd()
+    defaultProperties = {**BATCH_DEFAULT_PROPERTIES, **manifest.get("properties", {})}
+    startTime = time.perf_counter()
+    cacheCounts = (textureCache.hits, textureCache.misses, meshCache.hits, meshCache.misses)
+    jobs = []
+    for job in manifest["jobs"]:
+        print(f"Batch export: {job.get('name', job['operator'])}")
+        result = runBatchJob(job, defaultProperties, baseDirectory)
+        jobs.append(result)
+        if result["status"] != "FINISHED" and manifest.get("stop_on_error", False):
+            break
+
+    return {
+        "seconds": round(time.perf_counter() - startTime, 6),
+        "succeeded": sum(1 for job in jobs if job["status"] == "FINISHED"),
+        "failed": sum(1 for job in jobs if job["status"] != "FINISHED"),
+        "textureCache": {"hits": textureCache.hits - cacheCounts[0], "misses": textureCache.misses - cacheCounts[1]},
+        "meshCache": {"hits": meshCache.hits - cacheCounts[2], "misses": meshCache.misses - cacheCounts[3]},
+        "jobs": jobs,
+    }
+
+
+def printBatchSummary(summary: dict):
+    for job in summary["jobs"]:
+        line = f"{job['name']}: {job['status']} in {job['seconds']:.2f}s"
+        line += f" ({job['filesRewritten']} files rewritten, {job['filesUnchanged']} unchanged)"
+        if job["error"] is not None:
+            line += f"\n    {job['error']}"
+        print(line)
+    textureCacheCounts = summary["textureCache"]
+    meshCacheCounts = summary["meshCache"]
+    print(
+        f"Batch export: {summary['succeeded']} succeeded, {summary['failed']} failed in {summary['seconds']:.2f}s, "
+        + f"texture cache: {textureCacheCounts['hits']} hits, {textureCacheCounts['misses']} misses, "
+        + f"mesh cache: {meshCacheCounts['hits']} hits, {meshCacheCounts['misses']} misses"
+    )
+
+
+def ensureAddonRegistered():
+    if not hasattr(bpy.types.Scene, "fast64"):
+        addon_utils.enable(__package__.rpartition(".")[0], default_set=False)
+
+
+def main(argv: list[str] | None = None):
+    """
+    Command line entry point, the manifest path is given after "--":
+    blender -b file.blend --python-expr "from fast64.fast64_internal.batch_export import main; main()" -- jobs.json
+    Exits with status 1 if any job failed.
+    """
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    if len(argv) != 1:
+        raise PluginError("Expected the path of a batch export manifest after --.")
+
+    manifestPath = os.path.abspath(argv[0])
+    with open(manifestPath, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    ensureAddonRegistered()
+    summary = runBatchExport(manifest, os.path.dirname(manifestPath))
+    printBatchSummary(summary)
+
+    if "summary" in manifest:
+        summaryPath = os.path.join(os.path.dirname(manifestPath), manifest["summary"])
+        with open(summaryPath, "w", newline="\n") as file:
+            json.dump(summary, file, indent=4)
+        print(f"Saved batch export summary to {summaryPath}")
+
+    if summary["failed"] > 0:
+        sys.exit(1)
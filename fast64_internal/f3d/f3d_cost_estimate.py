@@ -0,0 +1,214 @@
+import re
+
+from .f3d_gbi import *
+from .f3d_gbi import _DPLoadTextureBlock
+
+# The RSP display list stack is 10 (F3D) to 18 (F3DEX2) entries deep, deeper calls are not followed.
+DISPLAY_LIST_COST_MAX_DEPTH = 18
+
+# Report fields which the cost panel can sort by, as (field, label).
+DISPLAY_LIST_COST_SORT_FIELDS = [
+    ("tmemBytes", "TMEM Load Bytes"),
+    ("vertexBytes", "Vertex Bytes"),
+    ("triangles", "Triangles"),
+    ("textureLoads", "Texture Loads"),
+    ("pipeSyncs", "Pipe Syncs"),
+    ("commandBytes", "Command Bytes"),
+]
+
+
+def getTexelBytes(siz: str) -> float:
+    """Bytes per texel of a G_IM_SIZ value, ex. 0.5 for G_IM_SIZ_4b and 2 for G_IM_SIZ_16b_LOAD_BLOCK."""
+    match = re.match(r"G_IM_SIZ_(\d+)b", siz)
+    return int(match.group(1)) / 8 if match else 0
+
+
+class DisplayListCost:
+    """Work done by the RSP and RDP to run some display lists, counted from their commands."""
+
+    def __init__(self):
+        self.commands = 0
+        self.commandBytes = 0
+        self.displayListCalls = 0
+        self.vertexLoads = 0
+        self.vertices = 0
+        self.vertexBytes = 0
+        self.triangles = 0
+        self.textureLoads = 0
+        self.paletteLoads = 0
+        self.tmemBytes = 0
+        self.pipeSyncs = 0
+        self.tileSyncs = 0
+        self.loadSyncs = 0
+        self.fullSyncs = 0
+        self.cycleTypes = set()
+        self.renderModes = set()
+
+    def to_dict(self) -> dict:
+        data = {name: value for name, value in vars(self).items() if not isinstance(value, set)}
+        data["tmemBytes"] = int(self.tmemBytes)
+        data["cycleTypes"] = sorted(self.cycleTypes)
+        data["renderModes"] = sorted(self.renderModes)
+        return data
+
+
+class DisplayListCostEstimator:
+    """
+    Statically estimates the cost of a model's display lists, by walking the draw list of each mesh
+    and following its display list calls, as the RSP would.
+    Costs are counted per mesh, per draw layer, and per material. A material is charged for its own list
+    and revert list, and for the vertices and triangles drawn while it is the current material.
+    """
+
+    def __init__(self, fModel: FModel):
+        self.fModel = fModel
+        self.f3d = fModel.f3d
+        self.total = DisplayListCost()
+        self.meshes: dict[str, DisplayListCost] = {}
+        self.drawLayers: dict[str, DisplayListCost] = {}
+        self.materials: dict[str, DisplayListCost] = {}
+        self.materialInfo: dict[str, dict] = {}  # material list name : {"material", "drawLayer", "calls"}
+
+        # GfxList : (material list name, draw layer)
+        self.materialLists = {}
+        for (material, drawLayer, areaKey), (fMaterial, texDimensions) in fModel.getAllMaterials().items():
+            name = fMaterial.material.name
+            materialName = getattr(material, "name", str(material))
+            self.materialInfo[name] = {"material": materialName, "drawLayer": str(drawLayer), "calls": 0}
+            self.materialLists[fMaterial.material] = (name, drawLayer)
+            if fMaterial.revert is not None:
+                self.materialLists[fMaterial.revert] = (name, drawLayer)
+
+        # Walk state
+        self.meshDrawLayer = None
+        self.textureImageSize = None
+        self.materialCosts: list[DisplayListCost] = []
+
+    def getAllMeshes(self, fModel: FModel) -> list[FMesh]:
+        meshes = list(fModel.meshes.values())
+        for subModel in fModel.subModels:
+            meshes.extend(self.getAllMeshes(subModel))
+        return meshes
+
+    def estimate(self):
+        for fMesh in self.getAllMeshes(self.fModel):
+            meshCost = self.meshes.setdefault(fMesh.name, DisplayListCost())
+            self.meshDrawLayer = fMesh.drawLayer
+            self.textureImageSize = None
+            self.materialCosts = []
+            self.walk(fMesh.draw, [self.total, meshCost], 0)
+
+    def getMaterialCosts(self, name: str, drawLayer) -> list[DisplayListCost]:
+        # Meshes built for one draw layer are counted in that layer, otherwise the material's layer is used.
+        layer = str(self.meshDrawLayer if self.meshDrawLayer is not None else drawLayer)
+        return [
+            self.materials.setdefault(name, DisplayListCost()),
+            self.drawLayers.setdefault(layer, DisplayListCost()),
+        ]
+
+    def walk(self, gfxList: GfxList, costs: list[DisplayListCost], depth: int):
+        for command in gfxList.commands:
+            for cost in costs:
+                cost.commands += 1
+                cost.commandBytes += command.size(self.f3d)
+
+            if isinstance(command, (SPDisplayList, SPBranchList)) and isinstance(command.displayList, GfxList):
+                self.call(command.displayList, costs, depth)
+            else:
+                self.addCommand(command, costs)
+
+            if isinstance(command, (SPEndDisplayList, SPBranchList)):
+                break
+
+    def call(self, gfxList: GfxList, costs: list[DisplayListCost], depth: int):
+        for cost in costs:
+            cost.displayListCalls += 1
+        if depth >= DISPLAY_LIST_COST_MAX_DEPTH:
+            return
+
+        if gfxList in self.materialLists:
+            name, drawLayer = self.materialLists[gfxList]
+            materialCosts = self.getMaterialCosts(name, drawLayer)
+            if gfxList.tag == GfxListTag.Material:
+                self.materialInfo[name]["calls"] += 1
+            self.walk(gfxList, costs + [cost for cost in materialCosts if cost not in costs], depth + 1)
+            # Geometry drawn after a revert list has no known material.
+            self.materialCosts = materialCosts if gfxList.tag == GfxListTag.Material else []
+        else:
+            self.walk(gfxList, costs + [cost for cost in self.materialCosts if cost not in costs], depth + 1)
+
+    def addCommand(self, command, costs: list[DisplayListCost]):
+        if isinstance(command, SPVertex):
+            self.addCounts(costs, vertexLoads=1, vertices=command.count, vertexBytes=command.count * VTX_SIZE)
+        elif isinstance(command, SP1Triangle):
+            self.addCounts(costs, triangles=1)
+        elif isinstance(command, SP2Triangles):
+            self.addCounts(costs, triangles=2)
+        elif isinstance(command, DPSetTextureImage):
+            self.textureImageSize = command.siz
+        elif isinstance(command, DPLoadBlock):
+            texelCount = command.lrs + 1 if isinstance(command.lrs, int) else 0
+            self.addCounts(costs, textureLoads=1, tmemBytes=texelCount * self.getLoadTexelBytes())
+        elif isinstance(command, DPLoadTile):
+            # Tile coordinates are 10.2 fixed point.
+            if all(isinstance(value, int) for value in (command.uls, command.ult, command.lrs, command.lrt)):
+                texelCount = ((command.lrs - command.uls) // 4 + 1) * ((command.lrt - command.ult) // 4 + 1)
+            else:
+                texelCount = 0
+            self.addCounts(costs, textureLoads=1, tmemBytes=texelCount * self.getLoadTexelBytes())
+        elif isinstance(command, DPLoadTLUTCmd):
+            self.addCounts(costs, paletteLoads=1, tmemBytes=(command.count + 1) * 2)
+        elif isinstance(command, _DPLoadTextureBlock):
+            # Used to load palettes on hardware version 1, into the upper half of TMEM.
+            tmemBytes = command.width * command.height * getTexelBytes(command.siz)
+            if isinstance(command.tmem, int) and command.tmem >= 256:
+                self.addCounts(costs, paletteLoads=1, tmemBytes=tmemBytes)
+            else:
+                self.addCounts(costs, textureLoads=1, tmemBytes=tmemBytes)
+        elif isinstance(command, DPPipeSync):
+            self.addCounts(costs, pipeSyncs=1)
+        elif isinstance(command, DPTileSync):
+            self.addCounts(costs, tileSyncs=1)
+        elif isinstance(command, DPLoadSync):
+            self.addCounts(costs, loadSyncs=1)
+        elif isinstance(command, DPFullSync):
+            self.addCounts(costs, fullSyncs=1)
+        elif isinstance(command, DPSetCycleType):
+            for cost in costs:
+                cost.cycleTypes.add(command.mode)
+        elif isinstance(command, DPSetRenderMode):
+            if command.use_preset:
+                renderMode = ", ".join(command.flagList)
+            else:
+                renderMode = " | ".join(["custom blender"] + list(command.flagList))
+            for cost in costs:
+                cost.renderModes.add(renderMode)
+
+    def getLoadTexelBytes(self) -> float:
+        return getTexelBytes(self.textureImageSize) if self.textureImageSize is not None else 0
+
+    def addCounts(self, costs: list[DisplayListCost], **counts):
+        for cost in costs:
+            for name, count in counts.items():
+                setattr(cost, name, getattr(cost, name) + count)
+
+    def getReport(self) -> dict:
+        return {
+            "model": self.fModel.name,
+            "total": self.total.to_dict(),
+            "drawLayers": {layer: cost.to_dict() for layer, cost in self.drawLayers.items()},
+            "meshes": {name: cost.to_dict() for name, cost in self.meshes.items()},
+            "materials": {name: {**self.materialInfo[name], **cost.to_dict()} for name, cost in self.materials.items()},
+        }
+
+
+def estimateDisplayListCost(fModel: FModel) -> dict:
+    """Returns the estimated display list cost report of a model and its sub models."""
+    estimator = DisplayListCostEstimator(fModel)
+    estimator.estimate()
+    return estimator.getReport()
+
+
+def getCostliest(costs: dict[str, dict], field: str, count: int) -> list[tuple[str, dict]]:
+    """Returns the count entries of a report section with the highest value of field."""
+    return sorted(costs.items(), key=lambda item: -item[1][field])[:count]
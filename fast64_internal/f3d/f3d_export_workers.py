@@ -0,0 +1,119 @@
+import bpy, multiprocessing, os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ..utility import exportProfiler
+
+# Worker processes can't import bpy, so they only import the modules their tasks come from (ex. f3d_image_encode).
+# The addon packages are registered as empty packages, so that their __init__ files (which import bpy) never run.
+WORKER_BOOTSTRAP = """
+import sys, types
+for name, path in packages:
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [path]
+        sys.modules[name] = package
+"""
+
+
+def getAddonPackages() -> list[tuple[str, str]]:
+    """Returns (name, directory) of this package and its parents, ex. fast64.fast64_internal.f3d."""
+    packages = []
+    name = __package__
+    path = os.path.dirname(os.path.abspath(__file__))
+    while name:
+        packages.append((name, path))
+        name = name.rpartition(".")[0]
+        path = os.path.dirname(path)
+    return packages
+
+
+class ExportTask:
+    """
+    Result of a task submitted to the export worker pool.
+    If the worker processes stopped, the task is run again in the main process.
+    onResult is called in the main process when the result is first read (ex. to store it in a cache).
+    """
+
+    def __init__(self, future: Future, function, args: tuple, onResult=None):
+        self.future = future
+        self.function = function
+        self.args = args
+        self.onResult = onResult
+
+    def result(self):
+        try:
+            with exportProfiler.timer("waiting for workers"):
+                result = self.future.result()
+        except BrokenProcessPool:
+            print("Export worker stopped, converting in the main process.")
+            result = self.function(*self.args)
+        if self.onResult is not None:
+            self.onResult(result)
+        return result
+
+
+class ExportWorkerPool:
+    """
+    Runs independent conversion tasks (ex. texture encoding) in worker processes.
+    Tasks only receive and return plain data (numpy arrays, bytes), and results are read by the object they belong to,
+    so names and output order are the same as a serial export. With no workers, tasks run when submitted.
+    """
+
+    def __init__(self):
+        self.requestedWorkerCount = 0
+        self.workerCount = 0  # set to 0 if workers can't be used, until the worker count setting changes
+        self.executor: ProcessPoolExecutor | None = None
+
+    def configure(self, workerCount: int):
+        if workerCount != self.requestedWorkerCount:
+            self.shutdown()
+            self.requestedWorkerCount = workerCount
+            self.workerCount = workerCount
+
+    def getExecutor(self) -> ProcessPoolExecutor | None:
+        if self.executor is None and self.workerCount > 0:
+            try:
+                # Blender's process can't be forked safely, so workers are always spawned.
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workerCount,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=exec,
+                    initargs=(WORKER_BOOTSTRAP, {"packages": getAddonPackages()}),
+                )
+            except (OSError, ValueError, NotImplementedError) as e:
+                print(f"Could not start export workers, converting in the main process: {e}")
+                self.workerCount = 0
+        return self.executor
+
+    def submit(self, function, args: tuple, onResult=None) -> ExportTask:
+        """function must be importable without bpy, and args must be picklable."""
+        executor = self.getExecutor()
+        if executor is not None:
+            try:
+                return ExportTask(executor.submit(function, *args), function, args, onResult)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Export workers stopped, converting in the main process: {e}")
+                self.shutdown()
+                self.workerCount = 0
+
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return ExportTask(future, function, args, onResult)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+exportWorkerPool = ExportWorkerPool()
+
+
+def getExportWorkerPool() -> ExportWorkerPool:
+    """Returns the worker pool, using the worker count from the global settings (0 runs tasks serially)."""
+    exportWorkerPool.configure(bpy.context.scene.fast64.settings.export_worker_count)
+    return exportWorkerPool
@@ -1,8 +1,9 @@
 # Macros are all copied over from gbi.h
 from typing import Sequence
-import bpy, os, enum
-from struct import pack
+import bpy, os, enum, tempfile
+from struct import pack, Struct
 from ..utility import *
+from .f3d_gfx_optimize import GfxListOptimizer
 
 
 class ScrollMethod(enum.Enum):
@@ -1704,6 +1705,9 @@ def _SHIFTL(value, amount, mask):
 MTX_SIZE = 64
 VTX_SIZE = 16
 GFX_SIZE = 8
+
+# position (s16 x3), flag, texture coordinates (s16 x2), color or normal (u8 x4)
+VTX_STRUCT = Struct(">hhhHhh4B")
 VP_SIZE = 8
 LIGHT_SIZE = 16  # 12, but padded to 64bit alignment
 AMBIENT_SIZE = 8
@@ -1971,17 +1975,23 @@ class Vtx:
         self.colorOrNormal = colorOrNormal
 
     def to_binary(self):
+        data = bytearray(VTX_SIZE)
+        self.pack_into(data, 0)
+        return data
+
+    def pack_into(self, buffer, offset):
         signX = 1 if self.uv[0] >= 0 else -1
         signY = 1 if self.uv[1] >= 0 else -1
-        uv = [self.uv[0] % (signX * 2**15), self.uv[1] % (signY * 2**15)]
-        return (
-            self.position[0].to_bytes(2, "big", signed=True)
-            + self.position[1].to_bytes(2, "big", signed=True)
-            + self.position[2].to_bytes(2, "big", signed=True)
-            + bytearray([0x00, 0x00])
-            + uv[0].to_bytes(2, "big", signed=True)
-            + uv[1].to_bytes(2, "big", signed=True)
-            + bytearray(self.colorOrNormal)
+        VTX_STRUCT.pack_into(
+            buffer,
+            offset,
+            self.position[0],
+            self.position[1],
+            self.position[2],
+            0,
+            self.uv[0] % (signX * 2**15),
+            self.uv[1] % (signY * 2**15),
+            *self.colorOrNormal,
         )
 
     def to_soh_xml(self):
@@ -2070,8 +2080,9 @@ class VtxList:
     def set_addr(self, startAddress):
         startAddress = get64bitAlignedAddr(startAddress)
         self.startAddress = startAddress
-        print("VtxList " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
-        return startAddress, startAddress + self.size()
+        size = self.size()
+        printExport("VtxList " + self.name + ": " + str(startAddress) + ", " + str(size))
+        return startAddress, startAddress + size
 
     def save_binary(self, romfile):
         romfile.seek(self.startAddress)
@@ -2081,20 +2092,24 @@ class VtxList:
         return len(self.vertices) * VTX_SIZE
 
     def to_binary(self):
-        data = bytearray(0)
-        for vert in self.vertices:
-            data.extend(vert.to_binary())
+        # Packs every vertex into one preallocated buffer instead of concatenating per vertex bytes.
+        data = bytearray(self.size())
+        for index, vert in enumerate(self.vertices):
+            vert.pack_into(data, index * VTX_SIZE)
         return data
 
     def to_c(self):
         data = CData()
-        data.header = "extern Vtx " + self.name + "[" + str(len(self.vertices)) + "];\n"
-        data.source = "Vtx " + self.name + "[" + str(len(self.vertices)) + "] = {\n"
-        for vert in self.vertices:
-            data.source += "\t" + vert.to_c() + ",\n"
-        data.source += "};\n\n"
+        self.to_c_stream(data)
         return data
 
+    def to_c_stream(self, fp):
+        fp.writeHeader("extern Vtx " + self.name + "[" + str(len(self.vertices)) + "];\n")
+        fp.writeSource("Vtx " + self.name + "[" + str(len(self.vertices)) + "] = {\n")
+        for vert in self.vertices:
+            fp.writeSource("\t" + vert.to_c() + ",\n")
+        fp.writeSource("};\n\n")
+
     def to_soh_xml(self):
         data = ""
 
@@ -2125,19 +2140,17 @@ class GfxList:
     def set_addr(self, startAddress, f3d):
         startAddress = get64bitAlignedAddr(startAddress)
         self.startAddress = startAddress
-        print("GfxList " + self.name + ": " + str(startAddress) + ", " + str(self.size(f3d)))
-        return startAddress, startAddress + self.size(f3d)
+        size = self.size(f3d)
+        printExport("GfxList " + self.name + ": " + str(startAddress) + ", " + str(size))
+        return startAddress, startAddress + size
 
     def save_binary(self, romfile, f3d, segments):
-        print("GfxList " + self.name + ": " + str(self.startAddress) + ", " + str(self.size(f3d)))
+        printExport("GfxList " + self.name + ": " + str(self.startAddress) + ", " + str(self.size(f3d)))
         romfile.seek(self.startAddress)
         romfile.write(self.to_binary(f3d, segments))
 
     def size(self, f3d):
-        size = 0
-        for command in self.commands:
-            size += command.size(f3d)
-        return size
+        return sum([command.size(f3d) for command in self.commands])
 
     # Size, including display lists called with SPDisplayList
     def size_total(self, f3d):
@@ -2160,37 +2173,40 @@ class GfxList:
         return ptrs
 
     def to_binary(self, f3d, segments):
-        data = bytearray(0)
-        for command in self.commands:
-            data.extend(command.to_binary(f3d, segments))
-
-        return data
+        return bytearray(b"".join([command.to_binary(f3d, segments) for command in self.commands]))
 
     def to_c_static(self):
-        data = "Gfx " + self.name + "[] = {\n"
-        for command in self.commands:
-            data += "\t" + command.to_c(True) + ",\n"
-        data += "};\n\n"
-        return data
+        return (
+            "Gfx "
+            + self.name
+            + "[] = {\n"
+            + "".join(["\t" + command.to_c(True) + ",\n" for command in self.commands])
+            + "};\n\n"
+        )
 
     def to_c_dynamic(self):
-        data = "Gfx* " + self.name + "(Gfx* glistp) {\n"
-        for command in self.commands:
-            data += "\t" + command.to_c(False) + ";\n"
-        data += "\treturn glistp;\n}\n\n"
-        return data
+        return (
+            "Gfx* "
+            + self.name
+            + "(Gfx* glistp) {\n"
+            + "".join(["\t" + command.to_c(False) + ";\n" for command in self.commands])
+            + "\treturn glistp;\n}\n\n"
+        )
 
     def to_c(self, f3d):
         data = CData()
+        self.to_c_stream(data, f3d)
+        return data
+
+    def to_c_stream(self, fp, f3d):
         if self.DLFormat == DLFormat.Static:
-            data.header = "extern Gfx " + self.name + "[];\n"
-            data.source = self.to_c_static()
+            fp.writeHeader("extern Gfx " + self.name + "[];\n")
+            fp.writeSource(self.to_c_static())
         elif self.DLFormat == DLFormat.Dynamic:
-            data.header = "Gfx* " + self.name + "(Gfx* glistp);\n"
-            data.source = self.to_c_dynamic()
+            fp.writeHeader("Gfx* " + self.name + "(Gfx* glistp);\n")
+            fp.writeSource(self.to_c_dynamic())
         else:
             raise PluginError("Invalid GfxList format: " + str(self.DLFormat))
-        return data
 
     def to_soh_xml(self, modelDirPath, objectPath):
         data = "<DisplayList Version=\"0\">\n"
@@ -2294,6 +2310,12 @@ class FModel:
         self.matWriteMethod = matWriteMethod
         self.global_data = FGlobalData()
         self.texturesSavedLastExport = 0  # hacky
+        self.finalized = False
+        # dict of texture content key : key in self.textures, for textures with identical pixels and formats
+        self.textureContentKeys = {}
+        # dict of bpy.types.Image : (shape, hash) of its pixels, so that each image is only read and hashed once
+        self.imagePixelHashes = {}
+        self.mergedTextures = []  # list of (image name, name of the FImage used instead)
 
     # Called before SPEndDisplayList
     def onMaterialCommandsBuilt(self, fMaterial, material, drawLayer):
@@ -2332,6 +2354,7 @@ class FModel:
         meshName = getFMeshName(self, name, namePrefix, drawLayer, isSkinned)
         checkUniqueBoneNames(self, meshName, name)
         self.meshes[meshName] = FMesh(meshName, self.DLFormat)
+        self.meshes[meshName].drawLayer = drawLayer
 
         self.onAddMesh(self.meshes[meshName], contextObj)
 
@@ -2386,6 +2409,14 @@ class FModel:
         else:
             return None, None
 
+    def getTextureKeyFromContent(self, contentKey):
+        """Returns the key of a texture with the given content in this model, its parent or its siblings, or None."""
+        models = [self] if self.parentModel is None else [self, self.parentModel, *self.parentModel.subModels]
+        for model in models:
+            if contentKey in model.textureContentKeys:
+                return model.textureContentKeys[contentKey]
+        return None
+
     def getLightAndHandleShared(self, lightName):
         # Check if light is in self
         if lightName in self.lights:
@@ -2454,7 +2485,160 @@ class FModel:
             addresses.extend(self.materialRevert.get_ptr_addresses(f3d))
         return addresses
 
+    def finalize(self):
+        """
+        Called before emitting C, XML or binary data, once all display lists of this model and its sub models are built.
+        Building code can refer to commands by index until then (ex. CI flipbooks, material overrides).
+        """
+        if self.finalized:
+            return
+        self.finalized = True
+        settings = bpy.context.scene.fast64.settings
+        if settings.deduplicate_geometry:
+            self.deduplicateGeometry()
+        if settings.optimize_display_lists:
+            self.optimizeDisplayLists()
+        if len(self.mergedTextures) > 0:
+            printExport(
+                f"{self.name}: merged textures with identical pixels: "
+                + ", ".join(f"{imageName} -> {textureName}" for imageName, textureName in self.mergedTextures),
+                "NORMAL",
+            )
+        for subModel in self.subModels:
+            subModel.finalize()
+        if settings.estimate_display_list_cost and self.parentModel is None:
+            self.estimateDisplayListCost()
+
+    @profileStage("display list cost estimation")
+    def estimateDisplayListCost(self):
+        """Adds the estimated cost of this model's display lists, including sub models, to the export profile."""
+        # Imported here since the estimator is built on the classes of this module.
+        from .f3d_cost_estimate import estimateDisplayListCost
+
+        exportProfiler.addCostReport(estimateDisplayListCost(self))
+
+    @profileStage("geometry deduplication")
+    def deduplicateGeometry(self):
+        """
+        Removes triangle groups with the same vertices and triangle commands as another group of this model
+        (ex. copies of the same mesh), and draws the first group's lists in their place.
+        Groups with vertex scrolling are kept, since their vertices are modified at runtime.
+        """
+        # Vertex lists loaded by the triangle lists of other groups must stay in the output.
+        sharedVertexLists = set()
+        for name, mesh in self.meshes.items():
+            for triGroup in mesh.triangleGroups:
+                for command in triGroup.triList.commands:
+                    if isinstance(command, SPVertex) and command.vertList is not triGroup.vertexList:
+                        sharedVertexLists.add(command.vertList)
+
+        uniqueGroups = {}  # content key : FTriGroup
+        replacements = {}  # removed triangle list : triangle list drawn instead
+        removedSize = 0
+        for name, mesh in self.meshes.items():
+            triangleGroups = []
+            for triGroup in mesh.triangleGroups:
+                if triGroup.vertexList in sharedVertexLists or triGroup.fMaterial.scrollData.hasVertexScroll():
+                    triangleGroups.append(triGroup)
+                    continue
+                key = triGroup.getContentKey()
+                if key in uniqueGroups:
+                    replacements[triGroup.triList] = uniqueGroups[key].triList
+                    removedSize += triGroup.triList.size(self.f3d) + triGroup.vertexList.size()
+                else:
+                    uniqueGroups[key] = triGroup
+                    triangleGroups.append(triGroup)
+            mesh.triangleGroups = triangleGroups
+
+        if len(replacements) == 0:
+            return
+        for name, mesh in self.meshes.items():
+            for gfxList in [mesh.draw, *mesh.drawMatOverrides.values()]:
+                for command in gfxList.commands:
+                    if isinstance(command, (SPDisplayList, SPBranchList)) and command.displayList in replacements:
+                        command.displayList = replacements[command.displayList]
+
+        exportProfiler.count("duplicate triangle groups removed", len(replacements))
+        printExport(
+            f"{self.name}: removed {len(replacements)} duplicate triangle groups ({removedSize} bytes)",
+            "NORMAL",
+        )
+
+    def getRemovableMaterialLists(self) -> set[GfxList]:
+        """
+        Returns the material lists of this model, its parent and sibling models that are called once,
+        directly from a mesh draw list. The state at their start is then known from that draw list.
+        """
+        rootModel = self if self.parentModel is None else self.parentModel
+        drawLists, materialLists, otherLists = set(), set(), []
+
+        def addModelLists(fModel: FModel):
+            for name, mesh in fModel.meshes.items():
+                drawLists.update([mesh.draw, *mesh.drawMatOverrides.values()])
+                otherLists.extend(triGroup.triList for triGroup in mesh.triangleGroups)
+            for materialKey, (fMaterial, texDimensions) in fModel.materials.items():
+                materialLists.update(gfxList for gfxList in (fMaterial.material, fMaterial.revert) if gfxList)
+            for name, lod in fModel.LODGroups.items():
+                otherLists.extend(gfxList for gfxList in [lod.draw, *lod.subdraws] if gfxList is not None)
+            if fModel.materialRevert is not None:
+                otherLists.append(fModel.materialRevert)
+            for subModel in fModel.subModels:
+                addModelLists(subModel)
+
+        addModelLists(rootModel)
+        callers = {}  # called GfxList : lists calling it, once per call
+        for gfxList in [*drawLists, *materialLists, *otherLists]:
+            for command in gfxList.commands:
+                if isinstance(command, (SPDisplayList, SPBranchList)) and isinstance(command.displayList, GfxList):
+                    callers.setdefault(command.displayList, []).append(gfxList)
+        return {
+            gfxList
+            for gfxList in materialLists
+            if len(callers.get(gfxList, [])) == 1 and callers[gfxList][0] in drawLists
+        }
+
+    def getGeometryWord(self, flagList: list[str]) -> int | None:
+        """Geometry mode word of a flag list for GfxListOptimizer, None if a flag isn't known."""
+        try:
+            return geoFlagListToWord([flag for flag in flagList if flag != "0"], self.f3d)
+        except PluginError:
+            return None
+
+    @profileStage("display list optimization")
+    def optimizeDisplayLists(self):
+        """
+        Removes redundant commands from the display lists of this model.
+        Draw lists carry their state into the material lists only they call, other lists are optimized on their own.
+        """
+        optimizer = GfxListOptimizer(self.getGeometryWord)
+        removableLists = self.getRemovableMaterialLists()
+        for name, mesh in self.meshes.items():
+            optimizer.optimizeCalls(mesh.draw, removableLists)
+            for override in mesh.drawMatOverrides.values():
+                optimizer.optimizeCalls(override, removableLists)
+        for name, mesh in self.meshes.items():
+            for triGroup in mesh.triangleGroups:
+                optimizer.optimize(triGroup.triList)
+        for materialKey, (fMaterial, texDimensions) in self.materials.items():
+            optimizer.optimize(fMaterial.material)
+            if fMaterial.revert is not None:
+                optimizer.optimize(fMaterial.revert)
+        if self.materialRevert is not None:
+            optimizer.optimize(self.materialRevert)
+
+        if optimizer.removedCount > 0:
+            exportProfiler.count("display list commands removed", optimizer.removedCount)
+            exportProfiler.count("TMEM loads removed", optimizer.removedLoadCount)
+            printExport(
+                f"{self.name}: removed {optimizer.removedCount} redundant display list commands "
+                + f"({optimizer.removedCount * GFX_SIZE} bytes), "
+                + f"including {optimizer.removedLoadCount} loads of textures or palettes already in TMEM",
+                "NORMAL",
+            )
+
+    @profileStage("binary emission")
     def set_addr(self, startAddress):
+        self.finalize()
         addrRange = (startAddress, startAddress)
         startAddrSet = False
         for name, lod in self.LODGroups.items():
@@ -2496,6 +2680,7 @@ class FModel:
                 startAddress = addrRange[0]
         return startAddress, addrRange[1]
 
+    @profileStage("binary emission")
     def save_binary(self, romfile, segments):
         for name, light in self.lights.items():
             light.save_binary(romfile)
@@ -2518,19 +2703,6 @@ class FModel:
             data.append(light.to_c())
         return data
 
-    def to_c_textures(self, texCSeparate, savePNG, texDir, texArrayBitSize):
-        # since decomp is linux, don't use os.path.join
-        # on windows this results in '\', which is incorrect (should be '/')
-        if len(texDir) > 0 and texDir[-1] != "/":
-            texDir += "/"
-        data = CData()
-        for info, texture in self.textures.items():
-            if savePNG:
-                data.append(texture.to_c_tex_separate(texDir, texArrayBitSize))
-            else:
-                data.append(texture.to_c(texArrayBitSize))
-        return data
-
     def to_c_materials(self, gfxFormatter):
         data = CData()
         for materialKey, (fMaterial, texDimensions) in self.materials.items():
@@ -2549,7 +2721,9 @@ class FModel:
         return data
 
     # OTRTODO
+    @profileStage("XML emission")
     def to_soh_xml(self, modelDirPath, objectPath):
+        self.finalize()
         data = ""
 
         #data += "<!-- Mesh Static Start -->\n"
@@ -2575,23 +2749,51 @@ class FModel:
         return data
 
     def to_c(self, textureExportSettings: TextureExportSettings, gfxFormatter: GfxFormatter):
-        texCSeparate = textureExportSettings.texCSeparate
-        savePNG = textureExportSettings.savePNG
-        texDir = textureExportSettings.includeDir
-
         staticData = CData()
         dynamicData = CData()
         texC = CData()
+        self.to_c_parts(textureExportSettings, gfxFormatter, staticData, dynamicData, texC)
+        return ExportCData(staticData, dynamicData, texC)
+
+    def to_c_stream(self, fp, textureExportSettings: TextureExportSettings, gfxFormatter: GfxFormatter):
+        """
+        Writes the same data as to_c(...).all() to fp.
+        Dynamic and texture data are streamed to temporary CDataStreams, since they come after all static data.
+        """
+        with CDataStream() as dynamicData, CDataStream() as texC:
+            self.to_c_parts(textureExportSettings, gfxFormatter, fp, dynamicData, texC)
+            fp.append(dynamicData)
+            fp.append(texC)
+
+    @profileStage("C emission")
+    def to_c_parts(
+        self,
+        textureExportSettings: TextureExportSettings,
+        gfxFormatter: GfxFormatter,
+        staticData: CData | CDataStream,
+        dynamicData: CData | CDataStream,
+        texC: CData | CDataStream,
+    ):
+        self.finalize()
+        texCSeparate = textureExportSettings.texCSeparate
+        savePNG = textureExportSettings.savePNG
+        texDir = textureExportSettings.includeDir
 
         # Source
         staticData.append(self.to_c_lights())
 
-        texData = self.to_c_textures(texCSeparate, savePNG, texDir, gfxFormatter.texArrayBitSize)
-        staticData.header += texData.header
-        if texCSeparate:
-            texC.source += texData.source
-        else:
-            staticData.source += texData.source
+        # since decomp is linux, don't use os.path.join
+        # on windows this results in '\', which is incorrect (should be '/')
+        if len(texDir) > 0 and texDir[-1] != "/":
+            texDir += "/"
+        for info, texture in self.textures.items():
+            texData = CData()
+            texture.to_c_stream(texData, gfxFormatter.texArrayBitSize, texDir if savePNG else None)
+            staticData.writeHeader(texData.header)
+            if texCSeparate:
+                texC.writeSource(texData.source)
+            else:
+                staticData.writeSource(texData.source)
 
         dynamicData.append(self.to_c_materials(gfxFormatter))
 
@@ -2611,7 +2813,6 @@ class FModel:
             self.texturesSavedLastExport = self.save_textures(textureExportSettings.exportPath)
 
         self.freePalettes()
-        return ExportCData(staticData, dynamicData, texC)
 
     def to_c_vertex_scroll(self, scrollName, gfxFormatter):
         scrollData = CData()
@@ -2631,32 +2832,39 @@ class FModel:
         scrollData.header += "extern void scroll_" + scrollName + "();\n"
         return scrollData, hasScrolling
 
+    @profileStage("texture files")
     def save_textures(self, exportPath):
         # TODO: Saving texture should come from FImage
         texturesSaved = 0
-        for (image, texInfo), texture in self.textures.items():
-            if texInfo[1] == "PAL":
-                continue
+        # PNGs are saved to a temporary file first, so that files with the same content are left untouched.
+        with tempfile.TemporaryDirectory() as tempDir:
+            tempPath = os.path.join(tempDir, "texture.png")
+            for (image, texInfo), texture in self.textures.items():
+                if texInfo[1] == "PAL":
+                    continue
 
-            # remove '.inc.c'
-            imageFileName = texture.filename[:-6] + ".png"
+                # remove '.inc.c'
+                imageFileName = texture.filename[:-6] + ".png"
 
-            isPacked = image.packed_file is not None
-            if not isPacked:
-                image.pack()
-            oldpath = image.filepath
-            try:
-                image.filepath = bpy.path.abspath(os.path.join(exportPath, imageFileName))
-                image.save()
-                texturesSaved += 1
+                isPacked = image.packed_file is not None
                 if not isPacked:
-                    image.unpack()
-            except Exception as e:
+                    image.pack()
+                oldpath = image.filepath
+                try:
+                    image.filepath = tempPath
+                    image.save()
+                    with open(tempPath, "rb") as file:
+                        fileSink.write(bpy.path.abspath(os.path.join(exportPath, imageFileName)), file.read())
+                    texturesSaved += 1
+                    if not isPacked:
+                        image.unpack()
+                except Exception as e:
+                    image.filepath = oldpath
+                    raise Exception(str(e))
                 image.filepath = oldpath
-                raise Exception(str(e))
-            image.filepath = oldpath
         return texturesSaved
 
+    @profileStage("texture files")
     def save_soh_textures(self, exportPath):
         # TODO: Saving texture should come from FImage
         texturesSaved = 0
@@ -2704,32 +2912,31 @@ class FModel:
             oldpath = image.filepath
             try:
                 image.filepath = bpy.path.abspath(os.path.join(exportPath, imageFileName))
-                print(imageFileName)
-                with open(image.filepath, "wb") as file:
-                    # Write OTR Header
-                    # I    - Endianness
-                    # I    - Resource Type
-                    # I    - Game Version
-                    # Q    - Magic ID
-                    # I    - Resource Version
-                    # QI   - Empty space
-                    # QQQI - Fill until 64 bytes
-
-                    # Write Texture Header
-                    # I    - Texture Type
-                    # I    - Width
-                    # I    - Height
-                    # I    - Flags
-                    # f    - H Scale
-                    # f    - V Scale
-                    # I    - Data Size
-
-                    file.write(pack("<IIIQIQIQQQIIIIIffI",
-                        # OTR Header
-                        0, 0x4F544558, 1, 0xDEADBEEFDEADBEEF, 0, 0, 0, 0, 0, 0, 0,
-                        # Texture Header
-                        format, texture.width, texture.height, 0, 1.0, 1.0, len(texture.data)
-                    ) + texture.data)
+                printExport(imageFileName)
+                # Write OTR Header
+                # I    - Endianness
+                # I    - Resource Type
+                # I    - Game Version
+                # Q    - Magic ID
+                # I    - Resource Version
+                # QI   - Empty space
+                # QQQI - Fill until 64 bytes
+
+                # Write Texture Header
+                # I    - Texture Type
+                # I    - Width
+                # I    - Height
+                # I    - Flags
+                # f    - H Scale
+                # f    - V Scale
+                # I    - Data Size
+
+                fileSink.write(image.filepath, pack("<IIIQIQIQQQIIIIIffI",
+                    # OTR Header
+                    0, 0x4F544558, 1, 0xDEADBEEFDEADBEEF, 0, 0, 0, 0, 0, 0, 0,
+                    # Texture Header
+                    format, texture.width, texture.height, 0, 1.0, 1.0, len(texture.data)
+                ) + texture.data)
                 texturesSaved += 1
                 if not isPacked:
                     image.unpack()
@@ -2904,6 +3111,8 @@ class FMesh:
         # overrideType, draw layer) : GfxList
         self.drawMatOverrides = {}
         self.DLFormat = DLFormat
+        # Draw layer the mesh was added for with FModel.addMesh, None if unknown
+        self.drawLayer = None
 
         # Used to avoid consecutive calls to the same material if unnecessary
         self.currentFMaterial = None
@@ -3031,6 +3240,27 @@ class FTriGroup:
     def get_ptr_addresses(self, f3d):
         return self.triList.get_ptr_addresses(f3d)
 
+    def getContentKey(self):
+        """Returns a key that is equal for triangle groups with identical vertex data and triangle commands."""
+
+        def getValueKey(value):
+            # The group's own vertices are already compared by content.
+            if value is self.vertexList:
+                return VtxList
+            elif isinstance(value, (list, tuple)):
+                return tuple(getValueKey(item) for item in value)
+            try:
+                hash(value)
+                return value
+            except TypeError:
+                return id(value)
+
+        commands = tuple(
+            (type(command), tuple((name, getValueKey(value)) for name, value in vars(command).items()))
+            for command in self.triList.commands
+        )
+        return bytes(self.vertexList.to_binary()), commands
+
     def set_addr(self, startAddress, f3d):
         addrRange = self.triList.set_addr(startAddress, f3d)
         addrRange = self.vertexList.set_addr(addrRange[1])
@@ -3092,6 +3322,9 @@ class FScrollData:
         self.tile_scroll_tex1 = FSetTileSizeScrollField()
         self.tile_scroll_exported = False
 
+    def hasVertexScroll(self):
+        return any(field.animType != "None" for fields in self.fields for field in fields)
+
 
 def get_f3d_mat_from_version(material: bpy.types.Material):
     return material.f3d_mat if material.mat_ver > 3 else material
@@ -3397,7 +3630,7 @@ class Lights:
     def set_addr(self, startAddress):
         startAddress = get64bitAlignedAddr(startAddress)
         self.startAddress = startAddress
-        print("Lights " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
+        printExport("Lights " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
         return (startAddress, startAddress + self.size())
 
     def save_binary(self, romfile):
@@ -3525,12 +3758,25 @@ class FImage:
         self.width = width
         self.height = height
         self.startAddress = 0
+        self.pendingData = None  # ExportTask converting the data, see f3d_export_workers
         self.data = bytearray(0)
         self.filename = filename
         self.converted = converted
         self.isLargeTexture = False
         self.paletteKey = None  # another FImage reference
 
+    @property
+    def data(self) -> bytearray:
+        if self.pendingData is not None:
+            pendingData, self.pendingData = self.pendingData, None
+            self._data = pendingData.result()
+        return self._data
+
+    @data.setter
+    def data(self, data: bytearray):
+        self.pendingData = None
+        self._data = data
+
     def size(self):
         return len(self.data)
 
@@ -3543,17 +3789,26 @@ class FImage:
     def to_c_tex_separate(self, texPath, texArrayBitSize):
         return self.to_c_helper('#include "' + texPath + self.filename + '"', texArrayBitSize)
 
+    def to_c_stream(self, fp, texArrayBitSize, texPath=None):
+        """Writes the texture array, or an include of the texture file if texPath is given."""
+        if texPath is None:
+            texData = self.to_c_data(texArrayBitSize)
+        else:
+            texData = '#include "' + texPath + self.filename + '"'
+        self.to_c_helper_stream(fp, texData, texArrayBitSize)
+
     def to_c_helper(self, texData, bitsPerValue):
         code = CData()
-        code.header = "extern u" + str(bitsPerValue) + " " + self.name + "[];\n"
+        self.to_c_helper_stream(code, texData, bitsPerValue)
+        return code
+
+    def to_c_helper_stream(self, fp, texData, bitsPerValue):
+        fp.writeHeader("extern u" + str(bitsPerValue) + " " + self.name + "[];\n")
 
         # This is to force 8 byte alignment
         if bitsPerValue != 64:
-            code.source = "Gfx " + self.name + "_aligner[] = {gsSPEndDisplayList()};\n"
-        code.source += "u" + str(bitsPerValue) + " " + self.name + "[] = {\n\t"
-        code.source += texData
-        code.source += "\n};\n\n"
-        return code
+            fp.writeSource("Gfx " + self.name + "_aligner[] = {gsSPEndDisplayList()};\n")
+        fp.writeSource("u" + str(bitsPerValue) + " " + self.name + "[] = {\n\t" + texData + "\n};\n\n")
 
     def to_c_data(self, bitsPerValue):
         if not self.converted:
@@ -3591,7 +3846,7 @@ class FImage:
     def set_addr(self, startAddress):
         startAddress = get64bitAlignedAddr(startAddress)
         self.startAddress = startAddress
-        print("Image " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
+        printExport("Image " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
         return startAddress, startAddress + self.size()
 
     def save_binary(self, romfile):
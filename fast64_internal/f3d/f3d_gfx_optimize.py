@@ -0,0 +1,318 @@
+import copy
+from typing import Callable
+
+# Simulation of the RSP/RDP state set by display lists, to remove commands that can't change what they draw.
+# Commands are matched by the name of their f3d_gbi class, so that this only depends on the standard library
+# and can be tested without bpy.
+
+
+class GfxListOptimizer:
+    """
+    Removes commands that can't change what a GfxList draws, by simulating the RSP/RDP state set in the list:
+    syncs with no primitive or texture load since the previous sync of the same kind,
+    and commands setting state (combiner, colors, othermode, geometry mode, tiles...) to the value it already has.
+    The TMEM areas written by texture and palette loads are tracked with the image and tile descriptor they loaded.
+    Lists can be called from anywhere, so the state at the start of each list is unknown,
+    and commands that aren't handled here (ex. SPSegment) make the whole state unknown again.
+    Draw lists are optimized together with the lists they call (see optimizeCalls), so that a material list
+    only called from one draw list can drop commands setting the state left by the previous material,
+    including whole texture loads (DPSetTextureImage to DPLoadBlock) of what the previous material already loaded.
+    DPSetTileSize commands are never removed, since tile scrolling modifies them after the list is built.
+    """
+
+    syncCommands = {"DPPipeSync", "DPTileSync", "DPLoadSync"}
+    primitiveCommands = {
+        "SP1Triangle",
+        "SP2Triangles",
+        "SPLine3D",
+        "SPLineW3D",
+        "SPTextureRectangle",
+        "SPScisTextureRectangle",
+    }
+    loadCommands = {"DPLoadBlock", "DPLoadTile", "DPLoadTLUTCmd"}
+    # Commands between DPSetTextureImage and the load in a texture or palette load sequence.
+    loadSequenceCommands = {"DPTileSync", "DPLoadSync", "DPSetTile"}
+    # TMEM size in 64 bit words, the lower half is used by textures and the upper half by palettes.
+    tmemWords = 512
+    # Texel size of the load tile : bits per texel loaded, 32 bit texels are split between both halves of TMEM.
+    loadTexelBits = {
+        "G_IM_SIZ_4b": 4,
+        "G_IM_SIZ_8b": 8,
+        "G_IM_SIZ_16b": 16,
+        "G_IM_SIZ_4b_LOAD_BLOCK": 16,
+        "G_IM_SIZ_8b_LOAD_BLOCK": 16,
+        "G_IM_SIZ_16b_LOAD_BLOCK": 16,
+    }
+    # Commands that don't draw anything or change state tracked here.
+    neutralCommands = {
+        "SPVertex",
+        "SPModifyVertex",
+        "SPCullDisplayList",
+        "SPMatrix",
+        "SPViewport",
+        "SPClipRatio",
+        "SPPerspNormalize",
+        "SPNumLights",
+        "SPLight",
+        "SPLightColor",
+        "SPSetLights",
+        "SPLookAt",
+        "DPSetTileSize",
+    }
+    callCommands = {"SPDisplayList", "SPBranchList"}
+    endCommands = {"SPEndDisplayList", "SPBranchList"}
+    # Calls deeper than the RSP display list stack are never run, their state is not followed.
+    maxCallDepth = 18
+    otherModeCommands = {
+        "DPPipelineMode",
+        "DPSetCycleType",
+        "DPSetTexturePersp",
+        "DPSetTextureDetail",
+        "DPSetTextureLOD",
+        "DPSetTextureLUT",
+        "DPSetTextureFilter",
+        "DPSetTextureConvert",
+        "DPSetCombineKey",
+        "DPSetColorDither",
+        "DPSetAlphaDither",
+        "DPSetAlphaCompare",
+        "DPSetDepthSource",
+        "DPSetRenderMode",
+    }
+    # command : state it sets, commands setting the same state completely replace each other.
+    stateKeys = {
+        "DPSetCombineMode": "combine",
+        "DPSetPrimColor": "prim color",
+        "DPSetEnvColor": "env color",
+        "DPSetBlendColor": "blend color",
+        "DPSetFogColor": "fog color",
+        "DPSetFillColor": "fill color",
+        "DPSetPrimDepth": "prim depth",
+        "DPSetConvert": "convert",
+        "DPSetKeyR": "key r",
+        "DPSetKeyGB": "key gb",
+        "SPFogPosition": "fog",
+        "SPFogFactor": "fog",
+        "SPTexture": "texture",
+        "DPSetTextureImage": "texture image",
+        **{otherModeCommand: otherModeCommand for otherModeCommand in otherModeCommands},
+    }
+
+    def __init__(self, getGeometryWord: Callable[[list[str]], int | None]):
+        """getGeometryWord converts a geometry mode flag list to its word, or None if it can't."""
+        self.getGeometryWord = getGeometryWord
+        self.removedCount = 0
+        self.removedLoadCount = 0
+
+    def reset(self):
+        self.state = {}
+        self.textureMemory = []  # (load key, first word, end word) of the loads known to be in TMEM
+        self.pendingSyncs = set(self.syncCommands)  # syncs needed since the last primitive or load
+        self.geometryKnown = 0  # geometry mode bits with a known value
+        self.geometryMode = 0
+
+    def setGeometryMode(self, clearWord: int | None, setWord: int | None, loadAll: bool = False) -> bool:
+        """Applies a geometry mode command, returns whether it didn't change the geometry mode."""
+        if clearWord is None or setWord is None:
+            self.geometryKnown = 0
+            return False
+        mask = 0xFFFFFFFF if loadAll else clearWord | setWord
+        geometryMode = setWord if loadAll else (self.geometryMode & ~clearWord) | setWord
+        redundant = (self.geometryKnown & mask) == mask and geometryMode == self.geometryMode
+        self.geometryKnown |= mask
+        self.geometryMode = geometryMode
+        return redundant
+
+    @staticmethod
+    def getStateValue(command) -> tuple[str, dict]:
+        return type(command).__name__, dict(vars(command))
+
+    def getLoadKey(self, imageValue: tuple[str, dict], tileValue: tuple[str, dict], load) -> tuple:
+        """Identifies what a load writes to TMEM: its texture image, load tile descriptor and load command."""
+        return imageValue, tileValue, self.getStateValue(load)
+
+    def getLoadRegion(self, tile: dict, load) -> tuple[int, int]:
+        """Returns the (first word, end word) of TMEM written by a load, or all of TMEM if it isn't known."""
+        loadName = type(load).__name__
+        start = tile["tmem"]
+        if loadName == "DPLoadTLUTCmd":
+            # Each palette entry is stored as a 64 bit word.
+            size = load.count + 1
+        elif tile["siz"] not in self.loadTexelBits:
+            return 0, self.tmemWords
+        elif loadName == "DPLoadBlock":
+            size = ((load.lrs - load.uls + 1) * self.loadTexelBits[tile["siz"]] + 63) // 64
+        else:
+            # DPLoadTile coordinates are 10.2 fixed point, rows are padded to the line width of the tile.
+            size = tile["line"] * ((load.lrt >> 2) - (load.ult >> 2) + 1)
+        if size <= 0 or start < 0 or start + size > self.tmemWords:
+            return 0, self.tmemWords
+        return start, start + size
+
+    def loadTextureMemory(self, load):
+        """Updates the TMEM contents with a load, using the texture image and load tile in the simulated state."""
+        loadTile = load.t if type(load).__name__ == "DPLoadTile" else load.tile
+        imageValue = self.state.get("texture image")
+        tileValue = self.state.get(("tile", loadTile))
+        if imageValue is None or tileValue is None:
+            # What was loaded and where isn't known.
+            self.textureMemory = []
+            return
+        start, end = self.getLoadRegion(tileValue[1], load)
+        self.textureMemory = [
+            (key, otherStart, otherEnd)
+            for key, otherStart, otherEnd in self.textureMemory
+            if otherEnd <= start or otherStart >= end
+        ]
+        self.textureMemory.append((self.getLoadKey(imageValue, tileValue, load), start, end))
+
+    def isLoadSequence(self, commands: list) -> bool:
+        """Returns whether commands are the start of a texture or palette load sequence, or a whole one."""
+        names = [type(command).__name__ for command in commands]
+        return (
+            names[0] == "DPSetTextureImage"
+            and all(name in self.loadSequenceCommands for name in names[1:-1])
+            and (len(names) == 1 or names[-1] in self.loadSequenceCommands or names[-1] in self.loadCommands)
+        )
+
+    def isLoaded(self, loadSequence: list) -> bool:
+        """Returns whether a whole load sequence only loads what is already in TMEM, so that it can be removed."""
+        load = loadSequence[-1]
+        loadTile = load.t if type(load).__name__ == "DPLoadTile" else load.tile
+        tiles = [command for command in loadSequence if type(command).__name__ == "DPSetTile"]
+        # Removing the sequence must not change any tile other than the load tile.
+        if len(tiles) == 0 or any(tile.tile != loadTile for tile in tiles):
+            return False
+        key = self.getLoadKey(self.getStateValue(loadSequence[0]), self.getStateValue(tiles[-1]), load)
+        return any(loadedKey == key for loadedKey, start, end in self.textureMemory)
+
+    def simulate(self, commands: list, removable: bool) -> list:
+        """Simulates commands, returns the ones which can't be removed (all of them if removable is False)."""
+        keptCommands = []
+        for command in commands:
+            if self.isRedundant(command) and removable:
+                self.removedCount += 1
+            else:
+                keptCommands.append(command)
+        return keptCommands
+
+    def isRedundant(self, command) -> bool:
+        """Updates the simulated state with a command, returns whether the command can be removed."""
+        commandName = type(command).__name__
+        if commandName in self.syncCommands:
+            redundant = commandName not in self.pendingSyncs
+            self.pendingSyncs.discard(commandName)
+            return redundant
+        elif commandName in self.primitiveCommands:
+            self.pendingSyncs.update(self.syncCommands)
+            return False
+        elif commandName in self.loadCommands:
+            self.pendingSyncs.update(self.syncCommands)
+            self.loadTextureMemory(command)
+            return False
+        elif commandName in self.neutralCommands:
+            return False
+        elif commandName in self.stateKeys or commandName == "DPSetTile":
+            key = ("tile", command.tile) if commandName == "DPSetTile" else self.stateKeys[commandName]
+            value = self.getStateValue(command)
+            redundant = self.state.get(key) == value
+            self.state[key] = value
+            return redundant
+        elif commandName == "SPSetGeometryMode":
+            return self.setGeometryMode(0, self.getGeometryWord(command.flagList))
+        elif commandName == "SPClearGeometryMode":
+            return self.setGeometryMode(self.getGeometryWord(command.flagList), 0)
+        elif commandName == "SPGeometryMode":
+            clearWord = self.getGeometryWord(command.clearFlagList)
+            return self.setGeometryMode(clearWord, self.getGeometryWord(command.setFlagList))
+        elif commandName == "SPLoadGeometryMode":
+            return self.setGeometryMode(0, self.getGeometryWord(command.flagList), True)
+        elif commandName in ("SPSetOtherMode", "DPSetOtherMode"):
+            for otherModeCommand in self.otherModeCommands:
+                self.state.pop(otherModeCommand, None)
+            return False
+        else:
+            self.reset()
+            return False
+
+    def optimize(self, gfxList):
+        self.reset()
+        commands = []
+        for index, command in enumerate(gfxList.commands):
+            if type(command).__name__ in self.endCommands:
+                commands.extend(gfxList.commands[index:])
+                break
+            commands.extend(self.simulate([command], True))
+        gfxList.commands = commands
+
+    def optimizeCalls(self, gfxList, removableLists: set, depth: int = 0) -> bool:
+        """
+        Simulates a draw list and the lists it calls, carrying the state through the calls.
+        Commands are removed from the draw list, and from the lists it calls directly that are in removableLists,
+        which must have that call as their only caller, so that they always start with the state simulated here.
+        In those lists, the load sequences of textures and palettes already in TMEM are removed as a whole.
+        Returns whether the list can return to its caller before its end (ex. SPCullDisplayList).
+        """
+        if depth == 0:
+            self.reset()
+        removable = depth == 0 or (depth == 1 and gfxList in removableLists)
+        returnsEarly = False
+        commands = []
+        loadSequence = []  # commands of a load, simulated once it is known whether the load is needed
+        for index, command in enumerate(gfxList.commands):
+            commandName = type(command).__name__
+            if len(loadSequence) > 0 and not self.isLoadSequence(loadSequence + [command]):
+                commands.extend(self.simulate(loadSequence, removable))
+                loadSequence = []
+            if removable and (len(loadSequence) > 0 or commandName == "DPSetTextureImage"):
+                loadSequence.append(command)
+                if commandName in self.loadCommands:
+                    if self.isLoaded(loadSequence):
+                        self.removedCount += len(loadSequence)
+                        self.removedLoadCount += 1
+                    else:
+                        commands.extend(self.simulate(loadSequence, removable))
+                    loadSequence = []
+                continue
+            if commandName in self.callCommands:
+                calledList = command.displayList
+                # Lists without commands are defined outside of the model (ex. OoT material segment calls),
+                # they can set any state.
+                if len(calledList.commands) > 0 and depth < self.maxCallDepth:
+                    if self.optimizeCalls(calledList, removableLists, depth + 1):
+                        # The state is either the one at the early return or the one at the end of the list.
+                        returnsEarly = returnsEarly or commandName == "SPBranchList"
+                        self.reset()
+                else:
+                    self.reset()
+                if commandName == "SPBranchList":
+                    commands.extend(gfxList.commands[index:])
+                    break
+                commands.append(command)
+                continue
+            if commandName == "SPEndDisplayList":
+                commands.extend(gfxList.commands[index:])
+                break
+            if commandName == "SPCullDisplayList" and depth > 0:
+                returnsEarly = True
+            commands.extend(self.simulate([command], removable))
+        commands.extend(self.simulate(loadSequence, removable))
+        if removable:
+            gfxList.commands = commands
+        return returnsEarly
+
+    def getLoadCount(self, gfxLists: list) -> int:
+        """
+        Returns the number of texture and palette loads in lists called one after the other by a draw list,
+        once optimizeCalls removed the loads of what is already in TMEM. The lists aren't modified.
+        """
+        calledLists = [copy.copy(gfxList) for gfxList in gfxLists]
+        removedCounts = self.removedCount, self.removedLoadCount
+        self.reset()
+        for calledList in calledLists:
+            if self.optimizeCalls(calledList, set(calledLists), 1):
+                self.reset()
+        self.removedCount, self.removedLoadCount = removedCounts
+        return sum(
+            type(command).__name__ in self.loadCommands for calledList in calledLists for command in calledList.commands
+        )
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Image encoders only depend on numpy, so that export worker processes can import them without bpy.
+# See f3d_export_workers.
+
+# Same values as RGB_TO_LUM_COEF, stored as float32 like the mathutils.Vector used by colorToLuminance.
+LUM_COEF_F32 = np.array([0.2126729, 0.7151522, 0.0721750], dtype=np.float32)
+
+
+def colorArrayToLuminance(pixels: np.ndarray) -> np.ndarray:
+    """
+    Vectorized colorToLuminance.
+    mathutils.Vector.dot multiplies in single precision and accumulates backwards in double precision,
+    so that is reproduced here to round luminance values the exact same way.
+    """
+    products = pixels[..., :3].astype(np.float32) * LUM_COEF_F32
+    products = products.astype(np.float64)
+    return products[..., 2] + products[..., 1] + products[..., 0]
+
+
+def quantize(values: np.ndarray, maxValue: int) -> np.ndarray:
+    # Same as int(round(value * maxValue)) & maxValue, numpy also rounds half to even.
+    return np.rint(values * maxValue).astype(np.int64) & maxValue
+
+
+def compactNibbles(values: np.ndarray) -> bytearray:
+    values = np.asarray(values, dtype=np.uint8).ravel() & 0xF
+    if values.size % 2 == 1:
+        values = np.append(values, np.uint8(0))
+    return bytearray(((values[0::2] << 4) | values[1::2]).tobytes())
+
+
+def encodeRGBA16(pixels: np.ndarray) -> bytearray:
+    r = quantize(pixels[..., 0], 0x1F)
+    g = quantize(pixels[..., 1], 0x1F)
+    b = quantize(pixels[..., 2], 0x1F)
+    a = pixels[..., 3] > 0.5
+    data = (r << 11) | (g << 6) | (b << 1) | a
+    return bytearray(data.astype(">u2").tobytes())
+
+
+def encodeRGBA32(pixels: np.ndarray) -> bytearray:
+    return bytearray(quantize(pixels, 0xFF).astype(np.uint8).tobytes())
+
+
+def encodeIA4(pixels: np.ndarray) -> bytearray:
+    return compactNibbles((quantize(colorArrayToLuminance(pixels), 0x7) << 1) | (pixels[..., 3] > 0.5))
+
+
+def encodeIA8(pixels: np.ndarray) -> bytearray:
+    data = (quantize(colorArrayToLuminance(pixels), 0xF) << 4) | quantize(pixels[..., 3], 0xF)
+    return bytearray(data.astype(np.uint8).tobytes())
+
+
+def encodeIA16(pixels: np.ndarray) -> bytearray:
+    data = np.stack((quantize(colorArrayToLuminance(pixels), 0xFF), quantize(pixels[..., 3], 0xFF)), axis=-1)
+    return bytearray(data.astype(np.uint8).tobytes())
+
+
+def encodeI4(pixels: np.ndarray) -> bytearray:
+    return compactNibbles(quantize(colorArrayToLuminance(pixels), 0xF))
+
+
+def encodeI8(pixels: np.ndarray) -> bytearray:
+    return bytearray(quantize(colorArrayToLuminance(pixels), 0xFF).astype(np.uint8).tobytes())
+
+
+# (format, bit size) : function converting pixels from getImagePixels to raw texture data
+IMAGE_ENCODERS = {
+    ("G_IM_FMT_RGBA", "G_IM_SIZ_16b"): encodeRGBA16,
+    ("G_IM_FMT_RGBA", "G_IM_SIZ_32b"): encodeRGBA32,
+    ("G_IM_FMT_IA", "G_IM_SIZ_4b"): encodeIA4,
+    ("G_IM_FMT_IA", "G_IM_SIZ_8b"): encodeIA8,
+    ("G_IM_FMT_IA", "G_IM_SIZ_16b"): encodeIA16,
+    ("G_IM_FMT_I", "G_IM_SIZ_4b"): encodeI4,
+    ("G_IM_FMT_I", "G_IM_SIZ_8b"): encodeI8,
+}
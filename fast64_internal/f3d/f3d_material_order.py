@@ -0,0 +1,132 @@
+from typing import Hashable
+
+# The state a material's display list sets, as a dict of (category, name) : value.
+# Values are only compared for equality, so they can be any object (ex. the FImage loaded into TMEM).
+MaterialState = dict[tuple[str, Hashable], object]
+
+# Cost of switching to a material, for each state category that differs from the previous material.
+# TMEM loads dominate, since the RDP stalls while textures and palettes are copied from RDRAM.
+MATERIAL_CHANGE_COSTS = {
+    "material": 1,  # calling a different material display list at all
+    "texture": 16,
+    "palette": 8,
+    "combine": 2,
+    "render mode": 2,
+    "state": 1,
+}
+
+# Meshes with at most this many materials are ordered exactly, with dynamic programming over material subsets.
+MATERIAL_ORDER_EXACT_COUNT = 8
+# Each improvement pass is quadratic in the number of materials, so the number of passes is limited.
+MATERIAL_ORDER_MAX_PASSES = 8
+
+
+def getMaterialChangeCost(previous: MaterialState | None, current: MaterialState) -> int:
+    """Cost of drawing current after previous (None if unknown), counting only the state current sets."""
+    if previous is None:
+        return sum(MATERIAL_CHANGE_COSTS[category] for category, name in current)
+    return sum(
+        MATERIAL_CHANGE_COSTS[key[0]] for key, value in current.items() if key not in previous or previous[key] != value
+    )
+
+
+def getMaterialOrderCost(states: list[MaterialState], order: list[int], previous: MaterialState | None) -> int:
+    cost = 0
+    for index in order:
+        cost += getMaterialChangeCost(previous, states[index])
+        previous = states[index]
+    return cost
+
+
+def optimizeMaterialOrder(states: list[MaterialState], previous: MaterialState | None) -> list[int]:
+    """
+    Orders materials so that the total cost of switching between consecutive materials is minimized,
+    starting after the previously drawn material if it is known.
+
+    This is an open path traveling salesman problem with asymmetric costs, solved exactly for few materials.
+    Otherwise the path is built with nearest neighbor, then improved by moving single materials to a cheaper position.
+    """
+    count = len(states)
+    # costs[i][j] is the cost of drawing j after i, with row count used for the previous material.
+    costs = [[getMaterialChangeCost(states[i], states[j]) for j in range(count)] for i in range(count)]
+    costs.append([getMaterialChangeCost(previous, state) for state in states])
+    start = count
+
+    if count <= MATERIAL_ORDER_EXACT_COUNT:
+        return getExactMaterialOrder(costs, count)
+
+    order = []
+    remaining = set(range(count))
+    current = start
+    while len(remaining) > 0:
+        current = min(remaining, key=lambda index: (costs[current][index], index))
+        remaining.remove(current)
+        order.append(current)
+
+    def edgeCost(i, j):
+        # Nothing is drawn after the last material.
+        return 0 if j is None else costs[i][j]
+
+    for _ in range(MATERIAL_ORDER_MAX_PASSES):
+        improved = False
+        for position in range(count):
+            material = order[position]
+            before = order[position - 1] if position > 0 else start
+            after = order[position + 1] if position + 1 < count else None
+            removeGain = edgeCost(before, material) + edgeCost(material, after) - edgeCost(before, after)
+
+            path = order[:position] + order[position + 1 :]
+            bestDelta = 0
+            bestPosition = None
+            for insertPosition in range(len(path) + 1):
+                insertBefore = path[insertPosition - 1] if insertPosition > 0 else start
+                insertAfter = path[insertPosition] if insertPosition < len(path) else None
+                delta = (
+                    edgeCost(insertBefore, material)
+                    + edgeCost(material, insertAfter)
+                    - edgeCost(insertBefore, insertAfter)
+                    - removeGain
+                )
+                if delta < bestDelta:
+                    bestDelta = delta
+                    bestPosition = insertPosition
+
+            if bestPosition is not None:
+                path.insert(bestPosition, material)
+                order = path
+                improved = True
+        if not improved:
+            break
+
+    return order
+
+
+def getExactMaterialOrder(costs: list[list[int]], count: int) -> list[int]:
+    """Held-Karp over subsets of materials, costs[count] is the row of the previously drawn material."""
+    if count == 0:
+        return []
+    # best[(visited mask, last material)] = (cost, previous material)
+    best = {(1 << index, index): (costs[count][index], None) for index in range(count)}
+    for mask in range(1, 1 << count):
+        for last in range(count):
+            if (mask, last) not in best:
+                continue
+            cost = best[(mask, last)][0]
+            for index in range(count):
+                if mask & (1 << index):
+                    continue
+                key = (mask | (1 << index), index)
+                newCost = cost + costs[last][index]
+                if key not in best or newCost < best[key][0]:
+                    best[key] = (newCost, last)
+
+    mask = (1 << count) - 1
+    last = min(range(count), key=lambda index: (best[(mask, index)][0], index))
+    order = []
+    while last is not None:
+        order.append(last)
+        previous = best[(mask, last)][1]
+        mask &= ~(1 << last)
+        last = previous
+    order.reverse()
+    return order
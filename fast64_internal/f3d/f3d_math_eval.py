@@ -0,0 +1,92 @@
+import ast, functools, operator, re
+
+# Evaluation of the numeric expressions found in C display lists, vertex and texture data.
+# Only depends on the standard library, so that it can be tested and benchmarked without bpy.
+
+binOps = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitAnd: operator.and_,
+    ast.BitXor: operator.xor,
+}
+
+
+# Plain decimal or hex integer literals, which are the vast majority of values in vertex and texture data.
+INT_LITERAL = re.compile(r"-?(?:0[xX][0-9a-fA-F]+|[1-9][0-9]*|0)")
+
+
+@functools.lru_cache(maxsize=None)
+def getClassSymbols(f3dClass: type) -> frozenset[str]:
+    """Returns the names of the attributes of a class (ex. F3D), which is the same for all of its instances."""
+    return frozenset(dir(f3dClass))
+
+
+def getSymbol(f3d, name: str):
+    """Same as getattr(f3d, name) if hasattr(f3d, name) else name."""
+    # Instance attributes are looked up in the instance's own dict, so attributes set at any time are found.
+    instanceSymbols = vars(f3d)
+    if name in instanceSymbols:
+        return instanceSymbols[name]
+    elif name in getClassSymbols(type(f3d)):
+        return getattr(f3d, name)
+    return name
+
+
+@functools.lru_cache(maxsize=4096)
+def compileMathExpression(s: str):
+    """
+    Converts an expression to a function taking an F3D instance, so that the same expression
+    (ex. a macro used for every vertex) is only parsed once.
+    """
+    node = ast.parse(s, mode="eval")
+
+    def _compile(node):
+        if isinstance(node, ast.Expression):
+            return _compile(node.body)
+        elif isinstance(node, ast.Str):
+            value = node.s
+            return lambda f3d: value
+        elif isinstance(node, ast.Name):
+            name = node.id
+            return lambda f3d: getSymbol(f3d, name)
+        elif isinstance(node, ast.Num):
+            value = node.n
+            return lambda f3d: value
+        elif isinstance(node, ast.UnaryOp):
+            operand = _compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda f3d: -1 * operand(f3d)
+            elif isinstance(node.op, ast.Invert):
+                return lambda f3d: ~operand(f3d)
+            else:
+                raise Exception("Unsupported type {}".format(node.op))
+        elif isinstance(node, ast.BinOp):
+            op = binOps[type(node.op)]
+            left = _compile(node.left)
+            right = _compile(node.right)
+            return lambda f3d: op(left(f3d), right(f3d))
+        elif isinstance(node, ast.Call):
+            args = [_compile(arg) for arg in node.args]
+            func = _compile(node.func)
+            return lambda f3d: func(f3d)(*[arg(f3d) for arg in args])
+        else:
+            raise Exception("Unsupported type {}".format(node))
+
+    return _compile(node.body)
+
+
+def math_eval(s, f3d):
+    if isinstance(s, int):
+        return s
+
+    s = s.strip()
+    if INT_LITERAL.fullmatch(s):
+        return int(s, 0)
+    return compileMathExpression(s)(f3d)
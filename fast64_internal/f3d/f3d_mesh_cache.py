@@ -0,0 +1,114 @@
+import bpy, hashlib, os, tempfile
+import numpy as np
+
+from ..utility import raisePluginError
+from .f3d_gbi import Vtx, SPVertex, SP1Triangle, SP2Triangles, SPEndDisplayList
+from .f3d_texture_cache import DiskCache
+
+# Increment whenever mesh conversion changes, so that stale cache entries are never used.
+MESH_CACHE_VERSION = 2
+MESH_CACHE_DIR = os.path.join(tempfile.gettempdir(), "fast64_mesh_cache")
+
+# Vertices are stored as rows of position (3), uv (2) and color / normal (4).
+VTX_WIDTH = 9
+# Commands are stored as rows of an opcode followed by the command arguments, padded with zeros.
+COMMAND_WIDTH = 9
+COMMAND_SPVERTEX = 0
+COMMAND_SP1TRIANGLE = 1
+COMMAND_SP2TRIANGLES = 2
+COMMAND_SPENDDISPLAYLIST = 3
+
+
+class MeshCache(DiskCache):
+    """
+    Cache of converted triangle lists, keyed by a fingerprint of the mesh and of everything affecting its conversion.
+    Each entry stores the vertices and triangle commands of one material's triangles, so that unchanged objects
+    skip triangle ordering, vertex buffer packing and vertex conversion.
+    """
+
+    profileName = "mesh cache"
+
+    def getKey(self, meshFingerprint: str, faceIndices: np.ndarray, *settings) -> str:
+        keyHash = hashlib.sha1()
+        keyHash.update(repr((MESH_CACHE_VERSION, meshFingerprint, settings)).encode())
+        keyHash.update(np.ascontiguousarray(faceIndices, dtype=np.int32).tobytes())
+        return keyHash.hexdigest()
+
+    def loadTriangles(self, key: str, triList, vtxList) -> bool:
+        """Appends the cached commands to triList and vertices to vtxList, returns False if there is no entry."""
+        blocks = self.load(key, 2)
+        if blocks is None or len(blocks[0]) % (VTX_WIDTH * 4) != 0 or len(blocks[1]) % (COMMAND_WIDTH * 4) != 0:
+            return False
+
+        vertexStart = len(vtxList.vertices)
+        vertices = np.frombuffer(blocks[0], dtype=">i4").reshape(-1, VTX_WIDTH).tolist()
+        vtxList.vertices.extend(Vtx(vertex[0:3], vertex[3:5], vertex[5:9]) for vertex in vertices)
+
+        for command in np.frombuffer(blocks[1], dtype=">i4").reshape(-1, COMMAND_WIDTH).tolist():
+            if command[0] == COMMAND_SPVERTEX:
+                triList.commands.append(SPVertex(vtxList, vertexStart + command[1], command[2], command[3]))
+            elif command[0] == COMMAND_SP1TRIANGLE:
+                triList.commands.append(SP1Triangle(*command[1:5]))
+            elif command[0] == COMMAND_SP2TRIANGLES:
+                triList.commands.append(SP2Triangles(*command[1:9]))
+            else:
+                triList.commands.append(SPEndDisplayList())
+        return True
+
+    def storeTriangles(self, key: str, triList, vtxList, commandStart: int, vertexStart: int):
+        """Stores the commands and vertices added to triList and vtxList since commandStart and vertexStart."""
+        commands = []
+        for command in triList.commands[commandStart:]:
+            if isinstance(command, SPVertex) and command.vertList is vtxList:
+                row = [COMMAND_SPVERTEX, command.offset - vertexStart, command.count, command.index]
+            elif isinstance(command, SP1Triangle):
+                row = [COMMAND_SP1TRIANGLE, command.v0, command.v1, command.v2, command.flag]
+            elif isinstance(command, SP2Triangles):
+                row = [COMMAND_SP2TRIANGLES, command.v00, command.v01, command.v02, command.flag0]
+                row += [command.v10, command.v11, command.v12, command.flag1]
+            elif isinstance(command, SPEndDisplayList):
+                row = [COMMAND_SPENDDISPLAYLIST]
+            else:
+                # Only plain triangle lists are cached (ex. not skinned meshes with matrix loads).
+                return
+            commands.append(row + [0] * (COMMAND_WIDTH - len(row)))
+
+        vertices = [[*vertex.position, *vertex.uv, *vertex.colorOrNormal] for vertex in vtxList.vertices[vertexStart:]]
+        self.store(
+            key,
+            [
+                np.array(vertices, dtype=">i4").reshape(-1, VTX_WIDTH).tobytes(),
+                np.array(commands, dtype=">i4").reshape(-1, COMMAND_WIDTH).tobytes(),
+            ],
+        )
+
+    def getReport(self) -> str:
+        return f"Mesh cache: {self.hits} hits, {self.misses} misses"
+
+
+meshCache = MeshCache(MESH_CACHE_DIR, 0)
+
+
+def getMeshCache() -> MeshCache | None:
+    """Returns the mesh cache if it is enabled in the global settings, otherwise None."""
+    settings = bpy.context.scene.fast64.settings
+    if not settings.mesh_cache_enabled:
+        return None
+    meshCache.maxSize = settings.mesh_cache_size * 1024 * 1024
+    return meshCache
+
+
+class F3D_ClearMeshCache(bpy.types.Operator):
+    bl_idname = "object.f3d_clear_mesh_cache"
+    bl_label = "Clear Mesh Cache"
+    bl_description = "Delete all cached mesh conversions and reset the cache statistics"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        try:
+            meshCache.clear()
+        except Exception as e:
+            raisePluginError(self, e)
+            return {"CANCELLED"}
+        self.report({"INFO"}, "Mesh cache cleared.")
+        return {"FINISHED"}
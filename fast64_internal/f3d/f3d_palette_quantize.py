@@ -0,0 +1,139 @@
+import numpy as np
+
+from .f3d_image_encode import quantize
+
+# Palette building and quantization only depend on numpy, like the image encoders.
+# Palette formats are checked by encodePaletteColors before colors get here.
+
+
+def getUniqueColors(colors: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (unique colors, index into unique colors for each color, count of each unique color).
+    Unique colors are in order of first appearance, which is the order palettes have always been built in.
+    """
+    uniqueColors, firstIndices, inverse, counts = np.unique(
+        colors.ravel(), return_index=True, return_inverse=True, return_counts=True
+    )
+    order = np.argsort(firstIndices, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    return uniqueColors[order], rank[inverse.ravel()], counts[order]
+
+
+# Palette colors are compared in a float space where each channel is 0-1.
+# The 1 bit alpha of RGBA16 is weighted so that opaque and transparent colors are never merged:
+# the alpha range is wider than any color channel's, so median cut splits boxes with both alphas on alpha first,
+# and the squared distance between alphas (4) is larger than between any two colors (3).
+RGBA16_ALPHA_WEIGHT = 2
+KMEANS_ITERATIONS = 8
+NEAREST_CHUNK_SIZE = 8192
+
+
+def decodePaletteColors(colors: np.ndarray, palFormat: str) -> np.ndarray:
+    colors = np.asarray(colors, dtype=np.int64)
+    if palFormat == "G_IM_FMT_RGBA":
+        return np.stack(
+            (
+                ((colors >> 11) & 0x1F) / 0x1F,
+                ((colors >> 6) & 0x1F) / 0x1F,
+                ((colors >> 1) & 0x1F) / 0x1F,
+                (colors & 1) * RGBA16_ALPHA_WEIGHT,
+            ),
+            axis=-1,
+        )
+    elif palFormat == "G_IM_FMT_IA":
+        return np.stack(((colors >> 8) / 0xFF, (colors & 0xFF) / 0xFF), axis=-1)
+    else:
+        raise ValueError("Invalid palette format " + palFormat)
+
+
+def encodePaletteFeatures(features: np.ndarray, palFormat: str) -> np.ndarray:
+    if palFormat == "G_IM_FMT_RGBA":
+        r = quantize(features[:, 0], 0x1F)
+        g = quantize(features[:, 1], 0x1F)
+        b = quantize(features[:, 2], 0x1F)
+        return (r << 11) | (g << 6) | (b << 1) | (features[:, 3] > RGBA16_ALPHA_WEIGHT / 2)
+    elif palFormat == "G_IM_FMT_IA":
+        return (quantize(features[:, 0], 0xFF) << 8) | quantize(features[:, 1], 0xFF)
+    else:
+        raise ValueError("Invalid palette format " + palFormat)
+
+
+def getNearestIndices(features: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    # Chunked so that the distance matrix stays small for images with many colors.
+    targetNorms = np.einsum("ij,ij->i", targets, targets)
+    indices = np.empty(len(features), dtype=np.int64)
+    for start in range(0, len(features), NEAREST_CHUNK_SIZE):
+        chunk = features[start : start + NEAREST_CHUNK_SIZE]
+        distances = targetNorms[np.newaxis, :] - 2 * (chunk @ targets.T)
+        indices[start : start + NEAREST_CHUNK_SIZE] = np.argmin(distances, axis=1)
+    return indices
+
+
+def getNearestPaletteIndices(colors: np.ndarray, palette: list[int], palFormat: str) -> np.ndarray:
+    return getNearestIndices(decodePaletteColors(colors, palFormat), decodePaletteColors(palette, palFormat))
+
+
+def medianCut(features: np.ndarray, weights: np.ndarray, maxColors: int) -> list[np.ndarray]:
+    """
+    Splits colors into at most maxColors boxes, returns the color indices of each box.
+    The box with the largest weighted range is split at the weighted median of its widest channel,
+    moved to the closest change of value so that colors with the same value of that channel stay together.
+    """
+
+    def getSplitScore(box):
+        if len(box) < 2:
+            return 0
+        boxFeatures = features[box]
+        return np.max(boxFeatures.max(axis=0) - boxFeatures.min(axis=0)) * weights[box].sum()
+
+    boxes = [np.arange(len(features))]
+    scores = [getSplitScore(boxes[0])]
+    while len(boxes) < maxColors:
+        bestBox = int(np.argmax(scores))
+        if scores[bestBox] <= 0:
+            break
+
+        box = boxes[bestBox]
+        boxFeatures = features[box]
+        axis = np.argmax(boxFeatures.max(axis=0) - boxFeatures.min(axis=0))
+        box = box[np.argsort(boxFeatures[:, axis], kind="stable")]
+        cumulativeWeights = np.cumsum(weights[box])
+        split = int(np.searchsorted(cumulativeWeights, cumulativeWeights[-1] / 2))
+        split = min(max(split, 1), len(box) - 1)
+        values = features[box, axis]
+        if values[split] == values[split - 1]:
+            lower = int(np.searchsorted(values, values[split], side="left"))
+            upper = int(np.searchsorted(values, values[split], side="right"))
+            # The widest channel has at least two values, so at least one of the bounds is inside the box.
+            split = lower if lower > 0 and (upper == len(box) or split - lower <= upper - split) else upper
+        boxes[bestBox : bestBox + 1] = [box[:split], box[split:]]
+        scores[bestBox : bestBox + 1] = [getSplitScore(box[:split]), getSplitScore(box[split:])]
+    return boxes
+
+
+def quantizeColors(colors: np.ndarray, counts: np.ndarray, palFormat: str, maxColors: int) -> list[int]:
+    """
+    Reduces unique palette colors (weighted by pixel counts) to a palette of at most maxColors colors.
+    Uses median cut for the initial palette, then refines it with a few weighted k-means iterations.
+    """
+    features = decodePaletteColors(colors, palFormat)
+    weights = counts.astype(np.float64)
+
+    boxes = medianCut(features, weights, maxColors)
+    centroids = np.array([np.average(features[box], axis=0, weights=weights[box]) for box in boxes])
+
+    for i in range(KMEANS_ITERATIONS):
+        assignments = getNearestIndices(features, centroids)
+        totals = np.zeros_like(centroids)
+        np.add.at(totals, assignments, features * weights[:, np.newaxis])
+        boxWeights = np.bincount(assignments, weights=weights, minlength=len(centroids))
+        used = boxWeights > 0
+        newCentroids = totals[used] / boxWeights[used, np.newaxis]
+        if newCentroids.shape == centroids.shape and np.allclose(newCentroids, centroids):
+            break
+        centroids = newCentroids
+
+    palette = encodePaletteFeatures(centroids, palFormat)
+    _, firstIndices = np.unique(palette, return_index=True)
+    return [int(color) for color in palette[np.sort(firstIndices)]]
@@ -16,6 +16,8 @@ from .f3d_writer import BufferVertex, F3DVert
 from ..utility import *
 import ast, operator
 from .f3d_material_helpers import F3DMaterial_UpdateLock
+from .f3d_symbol_index import getCSymbolIndex
+from .f3d_math_eval import binOps, math_eval
 
 colorCombinationCommands = [
     0x03,  # load lighting data
@@ -349,59 +351,6 @@ def createNewTextureMaterial(romfile, textureStart, textureSize, texelCount, col
             newImg.pixels[n : n + 4] = read16bitRGBA(int.from_bytes(oldPixel, "big"))
 
 
-binOps = {
-    ast.Add: operator.add,
-    ast.Sub: operator.sub,
-    ast.Mult: operator.mul,
-    ast.Div: operator.truediv,
-    ast.Mod: operator.mod,
-    ast.LShift: operator.lshift,
-    ast.RShift: operator.rshift,
-    ast.RShift: operator.rshift,
-    ast.BitOr: operator.or_,
-    ast.BitAnd: operator.and_,
-    ast.BitXor: operator.xor,
-}
-
-
-def math_eval(s, f3d):
-    if isinstance(s, int):
-        return s
-
-    s = s.strip()
-    node = ast.parse(s, mode="eval")
-
-    def _eval(node):
-        if isinstance(node, ast.Expression):
-            return _eval(node.body)
-        elif isinstance(node, ast.Str):
-            return node.s
-        elif isinstance(node, ast.Name):
-            if hasattr(f3d, node.id):
-                return getattr(f3d, node.id)
-            else:
-                return node.id
-        elif isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.UnaryOp):
-            if isinstance(node.op, ast.USub):
-                return -1 * _eval(node.operand)
-            elif isinstance(node.op, ast.Invert):
-                return ~_eval(node.operand)
-            else:
-                raise Exception("Unsupported type {}".format(node.op))
-        elif isinstance(node, ast.BinOp):
-            return binOps[type(node.op)](_eval(node.left), _eval(node.right))
-        elif isinstance(node, ast.Call):
-            args = list(map(_eval, node.args))
-            funcName = _eval(node.func)
-            return funcName(*args)
-        else:
-            raise Exception("Unsupported type {}".format(node))
-
-    return _eval(node.body)
-
-
 def bytesToNormal(normal):
     return [int.from_bytes([round(value)], "big", signed=True) / 128 if value > 0 else value / 128 for value in normal]
 
@@ -488,6 +437,7 @@ class F3DContext:
         self.lastMaterialIndex: bool = None
 
         self.vertexData: dict[str, list[F3DVert]] = {}  # c name : parsed data
+        self.includeData: dict[str, str] = {}  # include path : file contents
         self.textureData: dict[str, bpy.types.Image] = {}  # c name : blender texture
 
         self.tlutAppliedTextures: str = []  # c name
@@ -855,6 +805,11 @@ class F3DContext:
             raise PluginError("Cannot load VTX from " + path + " without any provided base path.")
         return os.path.join(self.basePath, path)
 
+    def readIncludeFile(self, path):
+        if path not in self.includeData:
+            self.includeData[path] = readFile(path)
+        return self.includeData[path]
+
     def setGeoFlags(self, command, value):
         mat = self.mat()
         bitFlags = math_eval(command.params[0], self.f3d)
@@ -1842,7 +1797,9 @@ def parseF3D(
 
 
 def parseDLData(dlData, dlName):
-    matchResult = re.search("Gfx\s*" + re.escape(dlName) + "\s*\[\s*\w*\s*\]\s*=\s*\{([^\}]*)\}", dlData)
+    matchResult = getCSymbolIndex(dlData).search(
+        "Gfx\s*" + re.escape(dlName) + "\s*\[\s*\w*\s*\]\s*=\s*\{([^\}]*)\}", dlName
+    )
     if matchResult is None:
         raise PluginError("Cannot find display list named " + dlName)
 
@@ -1874,8 +1831,8 @@ def parseVertexData(dlData: str, vertexDataName: str, f3dContext: F3DContext):
     if vertexDataName in f3dContext.vertexData:
         return f3dContext.vertexData[vertexDataName]
 
-    matchResult = re.search(
-        "Vtx\s*" + re.escape(vertexDataName) + "\s*\[\s*[0-9x]*\s*\]\s*=\s*\{([^;]*);", dlData, re.DOTALL
+    matchResult = getCSymbolIndex(dlData).search(
+        "Vtx\s*" + re.escape(vertexDataName) + "\s*\[\s*[0-9x]*\s*\]\s*=\s*\{([^;]*);", vertexDataName, re.DOTALL
     )
     if matchResult is None:
         raise PluginError("Cannot find vertex list named " + vertexDataName)
@@ -1884,7 +1841,7 @@ def parseVertexData(dlData: str, vertexDataName: str, f3dContext: F3DContext):
     pathMatch = re.search(r'\#include\s*"([^"]*)"', data)
     if pathMatch is not None:
         path = pathMatch.group(1)
-        data = readFile(f3dContext.getVTXPathFromInclude(path))
+        data = f3dContext.readIncludeFile(f3dContext.getVTXPathFromInclude(path))
 
     f3d = f3dContext.f3d
     patterns = f3dContext.vertexFormatPatterns(data)
@@ -1924,9 +1881,9 @@ def parseLightsData(lightsData, lightsName, f3dContext):
     # if lightsName in f3dContext.lightData:
     # 	return f3dContext.lightData[lightsName]
 
-    matchResult = re.search(
+    matchResult = getCSymbolIndex(lightsData).search(
         "Lights([0-9n])\s*" + re.escape(lightsName) + "\s*=\s*gdSPDefLights[0-9]\s*\(([^\)]*)\)\s*;\s*",
-        lightsData,
+        lightsName,
         re.DOTALL,
     )
     if matchResult is None:
@@ -1979,9 +1936,9 @@ def CI4toRGBA32(value):
 
 def parseTextureData(dlData, textureName, f3dContext, imageFormat, imageSize, width, basePath, isLUT, f3d):
 
-    matchResult = re.search(
+    matchResult = getCSymbolIndex(dlData).search(
         r"([A-Za-z0-9\_]+)\s*" + re.escape(textureName) + r"\s*\[\s*[0-9a-fA-Fx]*\s*\]\s*=\s*\{([^\}]*)\s*\}\s*;\s*",
-        dlData,
+        textureName,
         re.DOTALL,
     )
     if matchResult is None:
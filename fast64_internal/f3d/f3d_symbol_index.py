@@ -0,0 +1,51 @@
+import functools, re
+
+# Matches the start of a C definition, ex. "Vtx name[4] =", "u8 name[] =" or "Lights1 name =".
+# Keywords before the type (static, const, ...) are skipped, since the match has to end with "=".
+C_DEFINITION = re.compile(r"([A-Za-z0-9_]+)\s+([A-Za-z0-9_]+)\s*(?:\[[^\]]*\])?\s*=")
+
+
+class CSymbol:
+    __slots__ = ("type", "name", "start", "end")
+
+    def __init__(self, type: str, name: str, start: int, end: int):
+        self.type = type
+        self.name = name
+        self.start = start  # start of the type
+        self.end = end  # after the "="
+
+
+class CSymbolIndex:
+    """
+    Index of every definition in C data, built with a single pass over the text.
+    Used by the importer to find symbols without searching the whole text for each of them.
+    """
+
+    def __init__(self, data: str):
+        self.data = data
+        self.symbols: dict[str, list[CSymbol]] = {}
+        for match in C_DEFINITION.finditer(data):
+            symbol = CSymbol(match.group(1), match.group(2), match.start(), match.end())
+            self.symbols.setdefault(symbol.name, []).append(symbol)
+
+    def get(self, name: str) -> list[CSymbol]:
+        return self.symbols.get(name, [])
+
+    def search(self, pattern: str, name: str, flags=0) -> re.Match | None:
+        """
+        Equivalent to re.search(pattern, data, flags) for a pattern starting with the type of symbol name.
+        The pattern is only tried at the definitions of name, and the whole text is only
+        searched if none of them match (ex. unusual formatting not handled by the index).
+        """
+        compiledPattern = re.compile(pattern, flags)
+        for symbol in self.get(name):
+            match = compiledPattern.match(self.data, symbol.start)
+            if match is not None:
+                return match
+        return compiledPattern.search(self.data)
+
+
+@functools.lru_cache(maxsize=8)
+def getCSymbolIndex(data: str) -> CSymbolIndex:
+    """Returns the symbol index of data, which is only built once for the same import data."""
+    return CSymbolIndex(data)
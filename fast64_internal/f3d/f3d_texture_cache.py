@@ -0,0 +1,189 @@
+import bpy, hashlib, os, struct, tempfile
+import numpy as np
+
+from ..utility import raisePluginError, exportProfiler, printExport
+
+# Increment whenever texture encoding changes, so that stale cache entries are never used.
+TEXTURE_CACHE_VERSION = 1
+TEXTURE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "fast64_texture_cache")
+DISK_CACHE_EXTENSION = ".bin"
+
+
+class DiskCache:
+    """
+    On disk cache of export data, keyed by a hash computed by subclasses.
+    Each entry is a file containing one or more data blocks (ex. CI texture and palette).
+    Entries are evicted in least recently used order, using the file modification time.
+    Hits and misses are counted since the cache was cleared, and per export in the export profile.
+    """
+
+    profileName = "disk cache"
+
+    def __init__(self, directory: str, maxSize: int):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.size = None  # total size of entries, computed on first store
+
+    def getPath(self, key: str) -> str:
+        return os.path.join(self.directory, key + DISK_CACHE_EXTENSION)
+
+    def load(self, key: str, blockCount: int | None = None) -> list[bytes] | None:
+        """Returns the data blocks of an entry, or None if there is no valid entry with blockCount blocks."""
+        path = self.getPath(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            data = None
+
+        blocks = self.parseBlocks(data) if data is not None else None
+        if blocks is None or (blockCount is not None and len(blocks) != blockCount):
+            self.misses += 1
+            exportProfiler.count(self.profileName + " misses")
+            return None
+        self.hits += 1
+        exportProfiler.count(self.profileName + " hits")
+        return blocks
+
+    def parseBlocks(self, data: bytes) -> list[bytes] | None:
+        """Splits entry data into its blocks, returns None if the data is malformed (ex. truncated)."""
+        blocks = []
+        offset = 0
+        while offset < len(data):
+            if offset + 4 > len(data):
+                return None
+            (blockSize,) = struct.unpack_from(">I", data, offset)
+            offset += 4
+            if offset + blockSize > len(data):
+                return None
+            blocks.append(data[offset : offset + blockSize])
+            offset += blockSize
+        return blocks
+
+    def store(self, key: str, blocks: list[bytes]):
+        """
+        Adds an entry. The cache is only an optimization,
+        so errors (ex. full disk, missing permissions) are printed instead of failing the export.
+        """
+        data = b"".join(struct.pack(">I", len(block)) + bytes(block) for block in blocks)
+        tempPath = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if self.size is None:
+                self.size = sum(size for path, size, mtime in self.getEntries())
+
+            # Write to a uniquely named temporary file first, so that an interrupted export or another Blender
+            # instance storing the same entry never leaves a partial entry.
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as file:
+                tempPath = file.name
+                file.write(data)
+            os.replace(tempPath, self.getPath(key))
+            tempPath = None
+        except OSError as e:
+            printExport(f"Warning: could not store {self.profileName} entry: {e}", "NORMAL")
+            return
+        finally:
+            if tempPath is not None:
+                try:
+                    os.remove(tempPath)
+                except OSError:
+                    pass
+        self.size += len(data)
+
+        if self.size > self.maxSize:
+            self.evict()
+
+    def getEntries(self) -> list[tuple[str, int, float]]:
+        """Returns (path, size, modification time) of each entry, skipping entries removed while listing them."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(DISK_CACHE_EXTENSION):
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+                except OSError:
+                    pass
+        return entries
+
+    def evict(self):
+        try:
+            entries = sorted(self.getEntries(), key=lambda entry: entry[2])
+        except OSError as e:
+            printExport(f"Warning: could not list {self.profileName} entries: {e}", "NORMAL")
+            return
+        self.size = sum(size for path, size, mtime in entries)
+        for path, size, mtime in entries:
+            if self.size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        failedCount = 0
+        try:
+            entries = self.getEntries()
+        except OSError as e:
+            printExport(f"Warning: could not list {self.profileName} entries: {e}", "NORMAL")
+            entries = []
+        for path, size, mtime in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                failedCount += 1
+        if failedCount > 0:
+            printExport(f"Warning: could not remove {failedCount} {self.profileName} entries", "NORMAL")
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+
+
+class TextureCache(DiskCache):
+    """Cache of converted texture data, keyed by a hash of the image pixels and formats."""
+
+    profileName = "texture cache"
+
+    def getKey(self, pixels: np.ndarray, *formats) -> str:
+        keyHash = hashlib.sha1()
+        keyHash.update(repr((TEXTURE_CACHE_VERSION, pixels.shape, formats)).encode())
+        keyHash.update(np.ascontiguousarray(pixels).tobytes())
+        return keyHash.hexdigest()
+
+    def getReport(self) -> str:
+        return f"Texture cache: {self.hits} hits, {self.misses} misses"
+
+
+textureCache = TextureCache(TEXTURE_CACHE_DIR, 0)
+
+
+def getTextureCache() -> TextureCache | None:
+    """Returns the texture cache if it is enabled in the global settings, otherwise None."""
+    settings = bpy.context.scene.fast64.settings
+    if not settings.texture_cache_enabled:
+        return None
+    textureCache.maxSize = settings.texture_cache_size * 1024 * 1024
+    return textureCache
+
+
+class F3D_ClearTextureCache(bpy.types.Operator):
+    bl_idname = "object.f3d_clear_texture_cache"
+    bl_label = "Clear Texture Cache"
+    bl_description = "Delete all cached texture conversions and reset the cache statistics"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        try:
+            textureCache.clear()
+        except Exception as e:
+            raisePluginError(self, e)
+            return {"CANCELLED"}
+        self.report({"INFO"}, "Texture cache cleared.")
+        return {"FINISHED"}
@@ -0,0 +1,62 @@
+import bpy
+import numpy as np
+
+from ..utility import PluginError
+from .f3d_image_encode import IMAGE_ENCODERS, colorArrayToLuminance, quantize, compactNibbles
+from .f3d_palette_quantize import getUniqueColors, getNearestPaletteIndices, quantizeColors
+
+
+def getImagePixels(image: bpy.types.Image) -> np.ndarray:
+    """
+    Reads image pixels with a single foreach_get call.
+    Returns a (height, width, 4) float64 array in N64 row order (N64 is -Y, Blender is +Y).
+    Images with less than 4 channels have their missing fields set to 1, like the CI palette code does.
+    """
+    width, height = image.size
+    channels = image.channels
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, channels)[::-1]
+
+    rgba = np.ones((height, width, 4), dtype=np.float64)
+    rgba[:, :, : min(channels, 4)] = pixels[:, :, :4]
+    return rgba
+
+
+def getImageEncoder(fmt: str, bitSize: str):
+    """Returns the function from IMAGE_ENCODERS for a non CI format."""
+    if fmt == "G_IM_FMT_YUV":
+        raise PluginError("YUV not yet implemented.")
+    elif fmt == "G_IM_FMT_CI":
+        raise PluginError("CI not yet implemented.")
+    elif fmt not in ("G_IM_FMT_RGBA", "G_IM_FMT_IA", "G_IM_FMT_I"):
+        raise PluginError("Invalid image format " + fmt)
+
+    encoder = IMAGE_ENCODERS.get((fmt, bitSize))
+    if encoder is None:
+        raise PluginError("Invalid combo: " + fmt + ", " + bitSize)
+    return encoder
+
+
+def encodeImageData(pixels: np.ndarray, fmt: str, bitSize: str) -> bytearray:
+    """
+    Converts pixels from getImagePixels to raw texture data for a non CI format.
+    """
+    return getImageEncoder(fmt, bitSize)(pixels)
+
+
+def encodePaletteColors(pixels: np.ndarray, palFormat: str) -> np.ndarray:
+    """
+    Vectorized getRGBA16Tuple/getIA16Tuple, returns the 16 bit palette color of each pixel.
+    """
+    if palFormat == "G_IM_FMT_RGBA":
+        r = quantize(pixels[..., 0], 0x1F)
+        g = quantize(pixels[..., 1], 0x1F)
+        b = quantize(pixels[..., 2], 0x1F)
+        return (r << 11) | (g << 6) | (b << 1) | (pixels[..., 3] > 0.5)
+    elif palFormat == "G_IM_FMT_IA":
+        intensity = np.rint(colorArrayToLuminance(pixels) * 0xFF).astype(np.int64)
+        alpha = (pixels[..., 3] * 0xFF).astype(np.int64)
+        return (intensity << 8) | alpha
+    else:
+        raise PluginError("Invalid palette format " + palFormat)
@@ -0,0 +1,110 @@
+import heapq
+from typing import Hashable, Sequence
+
+# A triangle is given as a tuple of three vertex keys, one per corner.
+# Corners that are already present in the vertex buffer (ex. sm64 skinning) use None,
+# since they never have to be loaded.
+TriangleKeys = Sequence[Hashable | None]
+
+
+def countVertexLoads(triangles: list[TriangleKeys], order: list[int], bufferSize: int) -> tuple[int, int]:
+    """
+    Simulates TriangleConverter.addFace for the given triangle order.
+    Returns (number of buffer loads, number of vertices loaded).
+    """
+    loads = 0
+    vertexCount = 0
+    bufferKeys = set()
+    used = 0
+    for index in order:
+        added = [key for key in triangles[index] if key is not None and key not in bufferKeys]
+        if used + len(added) > bufferSize:
+            loads += 1
+            vertexCount += used
+            bufferKeys.clear()
+            added = [key for key in triangles[index] if key is not None]
+            used = 0
+        bufferKeys.update(added)
+        used += len(added)
+
+    if len(order) > 0:
+        loads += 1
+        vertexCount += used
+    return loads, vertexCount
+
+
+def optimizeTriangleOrder(triangles: list[TriangleKeys], bufferSize: int) -> list[int]:
+    """
+    Reorders triangles to minimize vertex loads for the F3D vertex buffer.
+
+    Unlike a post-transform cache (which Forsyth style optimizers target), the RSP buffer is
+    completely refilled once a triangle doesn't fit, so triangles are grouped into batches instead.
+    Each batch greedily takes the triangle adding the fewest new vertices to the buffer.
+    New batches start at the triangle with the fewest unprocessed neighbors, so that the mesh is
+    consumed from its borders inward and doesn't get split into islands.
+    """
+    uniqueKeys = [set(key for key in keys if key is not None) for keys in triangles]
+    keyToTriangles: dict[Hashable, list[int]] = {}
+    for index, keys in enumerate(uniqueKeys):
+        for key in keys:
+            keyToTriangles.setdefault(key, []).append(index)
+
+    # Sum of unprocessed triangle counts of a triangle's vertices, lower means fewer unprocessed neighbors.
+    seedScores = [sum(len(keyToTriangles[key]) for key in keys) for keys in uniqueKeys]
+    processed = [False] * len(triangles)
+
+    seedHeap = [(score, index) for index, score in enumerate(seedScores)]
+    heapq.heapify(seedHeap)
+
+    def peekSeed():
+        while len(seedHeap) > 0:
+            score, index = seedHeap[0]
+            if processed[index] or score != seedScores[index]:
+                heapq.heappop(seedHeap)
+            else:
+                return index
+        return None
+
+    order = []
+    bufferKeys = set()
+    used = 0
+    candidates: dict[int, int] = {}  # triangle index : new vertex count, for triangles sharing a buffered vertex
+
+    def newVertexCount(index):
+        return sum(1 for key in triangles[index] if key is not None and key not in bufferKeys)
+
+    def addTriangle(index, added):
+        nonlocal used
+        processed[index] = True
+        order.append(index)
+        candidates.pop(index, None)
+        used += added
+        for key in uniqueKeys[index]:
+            bufferKeys.add(key)
+            for other in keyToTriangles[key]:
+                if not processed[other]:
+                    seedScores[other] -= 1
+                    candidates[other] = newVertexCount(other)
+                    heapq.heappush(seedHeap, (seedScores[other], other))
+
+    while len(order) < len(triangles):
+        best = None
+        if len(candidates) > 0:
+            best = min(candidates, key=lambda index: (candidates[index], seedScores[index], index))
+            if used + candidates[best] > bufferSize:
+                best = None
+
+        if best is None:
+            seed = peekSeed()
+            added = newVertexCount(seed)
+            if used + added > bufferSize:
+                # Buffer is full, so the next triangle starts a new load.
+                bufferKeys.clear()
+                candidates.clear()
+                used = 0
+                added = newVertexCount(seed)
+            addTriangle(seed, added)
+        else:
+            addTriangle(best, candidates[best])
+
+    return order
@@ -0,0 +1,63 @@
+import struct
+from typing import Any, Sequence
+
+
+def getFloatSteps(values: Sequence[float]) -> list[int]:
+    """
+    Returns the position of each single precision float on the line of all floats.
+    Two floats are equal for mathutils (see EXPP_FloatsAreEqual) when their steps differ by 1 or less,
+    -0.0 being one step below 0.0.
+    """
+    bits = struct.unpack(f"{len(values)}i", struct.pack(f"{len(values)}f", *values))
+    return [value if value >= 0 else -(value & 0x7FFFFFFF) - 1 for value in bits]
+
+
+class BufferVertexIndex:
+    """
+    Finds the first of a list of buffer vertices equal to a given vertex, like list.index(), without comparing
+    the vertex to every entry.
+    Vertices are compared with BufferVertex.__eq__, where mathutils vectors are equal when all of their components
+    are at most one float apart. That isn't transitive, so vertices can't simply be hashed by value.
+    Instead they are bucketed by group, material and position in buckets two floats wide,
+    and only the vertices of the buckets a vertex's position could be equal to are compared.
+    Vertices provide their getBucketKeys() result as bucketKeys, so that it is only computed once per vertex.
+    """
+
+    def __init__(self):
+        self.buckets: dict[tuple, list[tuple[int, Any]]] = {}  # bucket key : [(index, BufferVertex)]
+
+    @staticmethod
+    def getBucketKeys(bufferVert) -> tuple[tuple, list[tuple]]:
+        """Returns (bucket of the vertex, buckets which can contain vertices equal to it)."""
+        ownBuckets = []
+        probedBuckets = []
+        for step in getFloatSteps(bufferVert.f3dVert.position):
+            bucket = step >> 1
+            ownBuckets.append(bucket)
+            # The bucket of the neighbouring float which isn't in this float's bucket.
+            probedBuckets.append((bucket, bucket - 1 + 2 * (step & 1)))
+
+        keys = [()]
+        for buckets in probedBuckets:
+            keys = [key + (bucket,) for key in keys for bucket in buckets]
+        prefix = (bufferVert.groupIndex, bufferVert.materialIndex)
+        return prefix + tuple(ownBuckets), [prefix + key for key in keys]
+
+    def add(self, bufferVert, index: int):
+        """Adds a vertex, indices must be added in increasing order."""
+        self.buckets.setdefault(bufferVert.bucketKeys[0], []).append((index, bufferVert))
+
+    def find(self, bufferVert) -> int | None:
+        """Returns the lowest index of a vertex equal to bufferVert, or None."""
+        found = None
+        for key in bufferVert.bucketKeys[1]:
+            for index, other in self.buckets.get(key, ()):
+                if found is not None and index >= found:
+                    break
+                if other is bufferVert or other == bufferVert:
+                    found = index
+                    break
+        return found
+
+    def __contains__(self, bufferVert) -> bool:
+        return self.find(bufferVert) is not None
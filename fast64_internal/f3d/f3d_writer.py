@@ -1,6 +1,7 @@
 from typing import Union
-import functools
+import functools, hashlib, itertools
 import bpy, bmesh, mathutils, os, re, copy, math
+import numpy as np
 from math import pi, ceil
 from io import BytesIO
 from bpy.utils import register_class, unregister_class
@@ -19,6 +20,22 @@ from .f3d_material import (
 )
 from .f3d_gbi import *
 from .f3d_gbi import _DPLoadTextureBlock
+from .f3d_triangle_order import optimizeTriangleOrder, countVertexLoads
+from .f3d_vertex_index import BufferVertexIndex
+from .f3d_material_order import MaterialState, optimizeMaterialOrder, getMaterialOrderCost
+from .f3d_texture_encode import (
+    getImagePixels,
+    colorArrayToLuminance,
+    getImageEncoder,
+    compactNibbles,
+    encodePaletteColors,
+    getUniqueColors,
+    getNearestPaletteIndices,
+    quantizeColors,
+)
+from .f3d_texture_cache import getTextureCache, F3D_ClearTextureCache
+from .f3d_mesh_cache import getMeshCache, F3D_ClearMeshCache
+from .f3d_export_workers import getExportWorkerPool, exportWorkerPool
 
 from ..utility import *
 
@@ -66,17 +83,183 @@ class VertexGroupInfo:
 
 
 class MeshInfo:
+    """
+    The face adjacency fields (vert, edge, f3dVert, edgeValid, validNeighbors) are only built on first access,
+    so that meshes loaded from the mesh cache never need them.
+    """
+
     def __init__(self):
-        self.vert = {}  # all faces connected to a vert
-        self.edge = {}  # all faces connected to an edge
-        self.f3dVert = {}  # f3d vertex of a given loop
-        self.edgeValid = {}  # bool given two faces
-        self.validNeighbors = {}  # all neighbors of a face with a valid connecting edge
+        self._vert = {}  # all faces connected to a vert
+        self._edge = {}  # all faces connected to an edge
+        self._f3dVert = {}  # f3d vertex of a given loop
+        self._edgeValid = {}  # bool given two faces
+        self._validNeighbors = {}  # all neighbors of a face with a valid connecting edge
         self.texDimensions = {}  # texture dimensions for each material
 
         self.vertexGroupInfo = None
+        self.snapshot: MeshSnapshot | None = None
+        self.adjacencyBuilder: Callable[["MeshInfo"], None] | None = None
+
+    def buildAdjacency(self):
+        if self.adjacencyBuilder is not None:
+            adjacencyBuilder = self.adjacencyBuilder
+            self.adjacencyBuilder = None
+            adjacencyBuilder(self)
+
+    @property
+    def vert(self):
+        self.buildAdjacency()
+        return self._vert
+
+    @property
+    def edge(self):
+        self.buildAdjacency()
+        return self._edge
+
+    @property
+    def f3dVert(self):
+        self.buildAdjacency()
+        return self._f3dVert
+
+    @property
+    def edgeValid(self):
+        self.buildAdjacency()
+        return self._edgeValid
+
+    @property
+    def validNeighbors(self):
+        self.buildAdjacency()
+        return self._validNeighbors
+
+
+def getCollectionArray(collection, attribute: str, dtype, width=1) -> np.ndarray:
+    # dtype must match the property type (int32/float32), otherwise foreach_get falls back to per item access.
+    array = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, array)
+    return array if width == 1 else array.reshape(-1, width)
+
+
+def gammaCorrectColors(colors: np.ndarray) -> np.ndarray:
+    """
+    gammaCorrect for an array of colors, returns (n, 3) float32.
+    Color management can't be reproduced exactly with numpy, so each unique color is converted once with mathutils.
+    """
+    uniqueColors, inverse = np.unique(colors[:, :3], axis=0, return_inverse=True)
+    corrected = np.array([gammaCorrect(color) for color in uniqueColors.tolist()], dtype=np.float32)
+    return corrected.reshape(-1, 3)[inverse.ravel()]
+
+
+class MeshSnapshot:
+    """
+    Mesh attributes read once with foreach_get, instead of one loop at a time through bpy.
+    Colors and normals are converted for all loops at once, with the same results as getLoopColor and getLoopNormal.
+    """
 
+    def __init__(self, mesh: bpy.types.Mesh, uv_data: bpy.types.bpy_prop_collection):
+        self.mesh = mesh
+        self.loopCount = len(mesh.loops)
+        self.loopVertices = getCollectionArray(mesh.loops, "vertex_index", np.int32)
+        self.triangleLoops = getCollectionArray(mesh.loop_triangles, "loops", np.int32, 3)
+        self.triangleVertices = getCollectionArray(mesh.loop_triangles, "vertices", np.int32, 3)
+        self.triangleMaterials = getCollectionArray(mesh.loop_triangles, "material_index", np.int32)
 
+        # N64 is -Y, Blender is +Y
+        uvs = getCollectionArray(uv_data, "uv", np.float32, 2)
+        uvs[np.isnan(uvs)] = 0
+        uvs[:, 1] = 1 - uvs[:, 1].astype(np.float64)
+
+        self.positions = getCollectionArray(mesh.vertices, "co", np.float32, 3)
+        self.uvs = uvs
+        self.fingerprint: str | None = None
+
+        self.loopVertexList: list[int] = self.loopVertices.tolist()
+        self.positionList: list[list[float]] = self.positions.tolist()
+        self.uvList: list[list[float]] = uvs.tolist()
+        self.colorList: list[list[float]] | None = None
+        self.normalList: list[list[float]] | None = None
+        self.f3dVerts: dict[tuple[int, bool], F3DVert] = {}  # (loop index, exportVertexColors) : vertex
+
+    def getFingerprint(self) -> str:
+        """Hash of every mesh attribute used to convert triangles, see MeshCache."""
+        if self.fingerprint is None:
+            arrays = [
+                self.loopVertices,
+                self.triangleLoops,
+                self.triangleVertices,
+                self.triangleMaterials,
+                self.positions,
+                self.uvs,
+                getCollectionArray(self.mesh.loops, "normal", np.float32, 3),
+            ]
+            for layer in ("Col", "Alpha"):
+                colorLayer = getColorLayer(self.mesh, layer)
+                if colorLayer is None:
+                    arrays.append(np.empty(0, dtype=np.float32))
+                else:
+                    arrays.append(getCollectionArray(colorLayer, "color", np.float32, 4))
+
+            fingerprint = hashlib.sha1()
+            for array in arrays:
+                fingerprint.update(repr(array.shape).encode())
+                fingerprint.update(np.ascontiguousarray(array).tobytes())
+            self.fingerprint = fingerprint.hexdigest()
+        return self.fingerprint
+
+    def getLoopColors(self, layer: str) -> np.ndarray | None:
+        colorLayer = getColorLayer(self.mesh, layer)
+        if colorLayer is None:
+            return None
+        colors = getCollectionArray(colorLayer, "color", np.float32, 4)
+        if len(colors) != self.loopCount:
+            # Same indexing as getLoopColor, which uses the loop index regardless of the layer's domain.
+            colors = colors[np.arange(self.loopCount)]
+        if is3_2_or_above():
+            colors = gammaCorrectColors(colors)
+        return colors
+
+    def getAlphas(self) -> np.ndarray:
+        alphaColors = self.getLoopColors("Alpha")
+        if alphaColors is None:
+            return np.ones(self.loopCount, dtype=np.float32)
+        return colorArrayToLuminance(alphaColors).astype(np.float32)
+
+    def getColorList(self) -> list[list[float]]:
+        """Vertex colors of each loop, see getLoopColor."""
+        if self.colorList is None:
+            colors = np.ones((self.loopCount, 4), dtype=np.float32)
+            rgbColors = self.getLoopColors("Col")
+            if rgbColors is not None:
+                colors[:, :3] = rgbColors[:, :3]
+            colors[:, 3] = self.getAlphas()
+            self.colorList = colors.tolist()
+        return self.colorList
+
+    def getNormalList(self) -> list[list[float]]:
+        """Normals of each loop, see get8bitRoundedNormal."""
+        if self.normalList is None:
+            normals = np.empty((self.loopCount, 4), dtype=np.float32)
+            # Don't round, as this may move UV toward UV bounds.
+            normals[:, :3] = np.trunc(getCollectionArray(self.mesh.loops, "normal", np.float32, 3) * 128.0) / 128
+            normals[:, 3] = self.getAlphas()
+            self.normalList = normals.tolist()
+        return self.normalList
+
+    def getF3DVert(self, loopIndex: int, exportVertexColors: bool) -> "F3DVert":
+        """Equivalent to getF3DVert, vertices are cached since both getInfoDict and TriangleConverter use them."""
+        key = (loopIndex, exportVertexColors)
+        f3dVert = self.f3dVerts.get(key)
+        if f3dVert is None:
+            position = mathutils.Vector(self.positionList[self.loopVertexList[loopIndex]]).freeze()
+            uv = mathutils.Vector(self.uvList[loopIndex]).freeze()
+            if exportVertexColors:
+                f3dVert = F3DVert(position, uv, mathutils.Vector(self.getColorList()[loopIndex]), None)
+            else:
+                f3dVert = F3DVert(position, uv, None, mathutils.Vector(self.getNormalList()[loopIndex]).freeze())
+            self.f3dVerts[key] = f3dVert
+        return f3dVert
+
+
+@profileStage("mesh extraction")
 def getInfoDict(obj):
     fixLargeUVs(obj)
     obj.data.calc_loop_triangles()
@@ -86,12 +269,6 @@ def getInfoDict(obj):
 
     infoDict = MeshInfo()
 
-    vertDict = infoDict.vert
-    edgeDict = infoDict.edge
-    f3dVertDict = infoDict.f3dVert
-    edgeValidDict = infoDict.edgeValid
-    validNeighborDict = infoDict.validNeighbors
-
     mesh: bpy.types.Mesh = obj.data
     uv_data: bpy.types.bpy_prop_collection | list[bpy.types.MeshUVLoop] = None
     if len(obj.data.uv_layers) == 0:
@@ -103,44 +280,82 @@ def getInfoDict(obj):
                 uv_data = uv_layer.data
         if uv_data is None:
             raise PluginError("Object '" + obj.name + "' does not have a UV layer named 'UVMap.'")
-    for face in mesh.loop_triangles:
-        validNeighborDict[face] = []
-        material = obj.material_slots[face.material_index].material
+    snapshot = MeshSnapshot(mesh, uv_data)
+    infoDict.snapshot = snapshot
+
+    exportVertexColorsDict = {}  # material index : exportVertexColors
+    for material_index in np.unique(snapshot.triangleMaterials).tolist():
+        material = obj.material_slots[material_index].material
         if material is None:
             raise PluginError("There are some faces on your mesh that are assigned to an empty material slot.")
-        for vertIndex in face.vertices:
+        exportVertexColorsDict[material_index] = isLightingDisabled(material)
+
+    infoDict.adjacencyBuilder = lambda infoDict: buildMeshAdjacency(infoDict, mesh, exportVertexColorsDict)
+    return infoDict
+
+
+def buildMeshAdjacency(infoDict: MeshInfo, mesh: bpy.types.Mesh, exportVertexColorsDict: dict[int, bool]):
+    vertDict = infoDict._vert
+    edgeDict = infoDict._edge
+    f3dVertDict = infoDict._f3dVert
+    edgeValidDict = infoDict._edgeValid
+    validNeighborDict = infoDict._validNeighbors
+
+    snapshot = infoDict.snapshot
+    faces = list(mesh.loop_triangles)
+    triangleVertices = snapshot.triangleVertices.tolist()
+    triangleLoops = snapshot.triangleLoops.tolist()
+
+    def getEdgeKeys(vertices):
+        # Same as MeshLoopTriangle.edge_keys
+        return (
+            (min(vertices[0], vertices[1]), max(vertices[0], vertices[1])),
+            (min(vertices[1], vertices[2]), max(vertices[1], vertices[2])),
+            (min(vertices[2], vertices[0]), max(vertices[2], vertices[0])),
+        )
+
+    def getLoopFromVert(inputIndex, faceIndex):
+        vertices = triangleVertices[faceIndex]
+        for i in range(3):
+            if vertices[i] == inputIndex:
+                return triangleLoops[faceIndex][i]
+
+    faceIndices = {}  # face : index into faces
+    for faceIndex, (face, material_index) in enumerate(zip(faces, snapshot.triangleMaterials.tolist())):
+        faceIndices[face] = faceIndex
+        validNeighborDict[face] = []
+        # A face can only already be in a list if it was just added by this same face.
+        for vertIndex in triangleVertices[faceIndex]:
             if vertIndex not in vertDict:
                 vertDict[vertIndex] = []
-            if face not in vertDict[vertIndex]:
+            if len(vertDict[vertIndex]) == 0 or vertDict[vertIndex][-1] is not face:
                 vertDict[vertIndex].append(face)
-        for edgeKey in face.edge_keys:
+        for edgeKey in getEdgeKeys(triangleVertices[faceIndex]):
             if edgeKey not in edgeDict:
                 edgeDict[edgeKey] = []
-            if face not in edgeDict[edgeKey]:
+            if len(edgeDict[edgeKey]) == 0 or edgeDict[edgeKey][-1] is not face:
                 edgeDict[edgeKey].append(face)
 
-        for loopIndex in face.loops:
-            convertInfo = LoopConvertInfo(
-                uv_data, obj, isLightingDisabled(obj.material_slots[face.material_index].material)
-            )
-            f3dVertDict[loopIndex] = getF3DVert(mesh.loops[loopIndex], face, convertInfo, mesh)
-    for face in mesh.loop_triangles:
-        for edgeKey in face.edge_keys:
+        exportVertexColors = exportVertexColorsDict[material_index]
+        for loopIndex in triangleLoops[faceIndex]:
+            f3dVertDict[loopIndex] = snapshot.getF3DVert(loopIndex, exportVertexColors)
+    for faceIndex, face in enumerate(faces):
+        for edgeKey in getEdgeKeys(triangleVertices[faceIndex]):
             for otherFace in edgeDict[edgeKey]:
-                if otherFace == face:
+                if otherFace is face:
                     continue
                 if (otherFace, face) not in edgeValidDict and (face, otherFace) not in edgeValidDict:
+                    otherFaceIndex = faceIndices[otherFace]
                     edgeValid = (
-                        f3dVertDict[getLoopFromVert(edgeKey[0], face)]
-                        == f3dVertDict[getLoopFromVert(edgeKey[0], otherFace)]
-                        and f3dVertDict[getLoopFromVert(edgeKey[1], face)]
-                        == f3dVertDict[getLoopFromVert(edgeKey[1], otherFace)]
+                        f3dVertDict[getLoopFromVert(edgeKey[0], faceIndex)]
+                        == f3dVertDict[getLoopFromVert(edgeKey[0], otherFaceIndex)]
+                        and f3dVertDict[getLoopFromVert(edgeKey[1], faceIndex)]
+                        == f3dVertDict[getLoopFromVert(edgeKey[1], otherFaceIndex)]
                     )
                     edgeValidDict[(otherFace, face)] = edgeValid
                     if edgeValid:
                         validNeighborDict[face].append(otherFace)
                         validNeighborDict[otherFace].append(face)
-    return infoDict
 
 
 def fixLargeUVs(obj):
@@ -300,7 +515,7 @@ def saveMeshWithLargeTexturesByFaces(
     """
 
     if len(faces) == 0:
-        print("0 Faces Provided.")
+        printExport("0 Faces Provided.")
         return
 
     if material.mat_ver > 3:
@@ -310,9 +525,7 @@ def saveMeshWithLargeTexturesByFaces(
 
     fMaterial, texDimensions = saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData)
     isPointSampled = isTexturePointSampled(material)
-    exportVertexColors = isLightingDisabled(material)
-    uv_data = obj.data.uv_layers["UVMap"].data
-    convertInfo = LoopConvertInfo(uv_data, obj, exportVertexColors)
+    snapshot = triConverterInfo.getSnapshot()
 
     if fMaterial.largeTextureIndex == 0:
         texFormat = f3dMat.tex0.tex_format
@@ -327,7 +540,7 @@ def saveMeshWithLargeTexturesByFaces(
     tileLoads = {}
     faceTileLoads = {}
     for face in faces:
-        uvs = [UVtoST(obj, loopIndex, uv_data, texDimensions, isPointSampled) for loopIndex in face.loops]
+        uvs = [convertUVToST(snapshot.uvList[loopIndex], texDimensions, isPointSampled) for loopIndex in face.loops]
 
         faceTileLoad = TileLoad(texFormat, twoTextures, texDimensions)
         faceTileLoads[face] = faceTileLoad
@@ -442,13 +655,15 @@ def saveStaticModel(
 
     # checkForF3DMaterial(obj)
 
+    snapshot = triConverterInfo.getSnapshot()
     facesByMat = {}
-    for face in obj.data.loop_triangles:
-        if face.material_index not in facesByMat:
-            facesByMat[face.material_index] = []
-        facesByMat[face.material_index].append(face)
+    for face, material_index in zip(obj.data.loop_triangles, snapshot.triangleMaterials.tolist()):
+        if material_index not in facesByMat:
+            facesByMat[material_index] = []
+        facesByMat[material_index].append(face)
 
     fMeshes = {}
+    materialGroups = {}  # draw layer : list of (material, faces)
     for material_index, faces in facesByMat.items():
         material = obj.material_slots[material_index].material
 
@@ -462,45 +677,55 @@ def saveStaticModel(
         if drawLayer not in fMeshes:
             fMesh = fModel.addMesh(obj.original_name, ownerName, drawLayerName, False, obj)
             fMeshes[drawLayer] = fMesh
+            materialGroups[drawLayer] = []
 
             if obj.use_f3d_culling and (fModel.f3d.F3DEX_GBI or fModel.f3d.F3DEX_GBI_2):
                 addCullCommand(obj, fMesh, transformMatrix, fModel.matWriteMethod)
-        else:
-            fMesh = fMeshes[drawLayer]
 
-        checkForF3dMaterialInFaces(obj, material)
-        fMaterial, texDimensions = saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData)
+        materialGroups[drawLayer].append((material, faces))
 
-        if fMaterial.useLargeTextures:
-            saveMeshWithLargeTexturesByFaces(
-                material,
-                faces,
-                fModel,
-                fMesh,
-                obj,
-                drawLayer,
-                convertTextureData,
-                None,
-                triConverterInfo,
-                None,
-                None,
-                None,
-            )
-        else:
-            saveMeshByFaces(
-                material,
-                faces,
-                fModel,
-                fMesh,
-                obj,
-                drawLayer,
-                convertTextureData,
-                None,
-                triConverterInfo,
-                None,
-                None,
-                None,
+    for drawLayer, groups in materialGroups.items():
+        fMesh = fMeshes[drawLayer]
+        if bpy.context.scene.fast64.settings.optimize_material_order:
+            order = getMaterialDrawOrder(
+                [material for material, faces in groups], fModel, obj, drawLayer, convertTextureData
             )
+            groups = [groups[index] for index in order]
+
+        for material, faces in groups:
+            checkForF3dMaterialInFaces(obj, material)
+            fMaterial, texDimensions = saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData)
+
+            if fMaterial.useLargeTextures:
+                saveMeshWithLargeTexturesByFaces(
+                    material,
+                    faces,
+                    fModel,
+                    fMesh,
+                    obj,
+                    drawLayer,
+                    convertTextureData,
+                    None,
+                    triConverterInfo,
+                    None,
+                    None,
+                    None,
+                )
+            else:
+                saveMeshByFaces(
+                    material,
+                    faces,
+                    fModel,
+                    fMesh,
+                    obj,
+                    drawLayer,
+                    convertTextureData,
+                    None,
+                    triConverterInfo,
+                    None,
+                    None,
+                    None,
+                )
 
     for drawLayer, fMesh in fMeshes.items():
         if revertMatAtEnd:
@@ -511,6 +736,72 @@ def saveStaticModel(
     return fMeshes
 
 
+def getMaterialDrawState(fMaterial: FMaterial) -> MaterialState:
+    """Returns the state set by a material's display list, to compare materials when ordering them."""
+    state = {("material", None): fMaterial}
+    image = None
+    tileMemory = {}  # tile : tmem address
+    for command in fMaterial.material.commands:
+        if isinstance(command, DPSetTextureImage):
+            image = command.image
+        elif isinstance(command, DPSetTile):
+            tileMemory[command.tile] = command.tmem
+        elif isinstance(command, (DPLoadBlock, DPLoadTile)):
+            state[("texture", tileMemory.get(command.tile))] = image
+        elif isinstance(command, DPLoadTLUTCmd):
+            state[("palette", tileMemory.get(command.tile))] = image
+        elif isinstance(command, DPSetCombineMode):
+            state[("combine", None)] = vars(command)
+        elif isinstance(command, DPSetRenderMode):
+            state[("render mode", None)] = vars(command)
+        elif type(command).__name__ in GfxListOptimizer.stateKeys or isinstance(
+            command, (SPGeometryMode, SPSetGeometryMode, SPClearGeometryMode, SPLoadGeometryMode)
+        ):
+            state[("state", type(command))] = vars(command)
+    return state
+
+
+@profileStage("material ordering")
+def getMaterialDrawOrder(
+    materials: list[bpy.types.Material], fModel, obj, drawLayer, convertTextureData, lastMaterialName=None
+) -> list[int]:
+    """
+    Returns the order in which to draw the given materials of one mesh, so that consecutive materials
+    share as many textures, palettes, combiners and render modes as possible.
+    The order starts after the material drawn last (ex. by the previous limb), if lastMaterialName is given.
+    """
+    # Materials are saved to be compared, so they are checked first like when they are drawn.
+    for material in materials:
+        checkForF3dMaterialInFaces(obj, material)
+    fMaterials = [
+        saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData)[0] for material in materials
+    ]
+    previous = None
+    if lastMaterialName is not None:
+        for (material, materialDrawLayer, areaKey), (fMaterial, texDimensions) in fModel.materials.items():
+            if material.name == lastMaterialName and materialDrawLayer in (drawLayer, None):
+                previous = getMaterialDrawState(fMaterial)
+                break
+
+    states = [getMaterialDrawState(fMaterial) for fMaterial in fMaterials]
+    order = optimizeMaterialOrder(states, previous)
+    originalCost = getMaterialOrderCost(states, list(range(len(states))), previous)
+    cost = getMaterialOrderCost(states, order, previous)
+    if cost >= originalCost:
+        order = list(range(len(states)))
+    else:
+        exportProfiler.count("material switch cost saved", originalCost - cost)
+
+    # Loads of textures already in TMEM are only removed when display lists are optimized.
+    if bpy.context.scene.fast64.settings.optimize_display_lists:
+        optimizer = GfxListOptimizer(fModel.getGeometryWord)
+        originalLoads = optimizer.getLoadCount([fMaterial.material for fMaterial in fMaterials])
+        loads = optimizer.getLoadCount([fMaterials[index].material for index in order])
+        exportProfiler.count("TMEM loads saved by material order", originalLoads - loads)
+        printExport(f"{obj.name}: {originalLoads} TMEM loads before ordering materials, {loads} after")
+    return order
+
+
 def addCullCommand(obj, fMesh, transformMatrix, matWriteMethod):
     fMesh.add_cull_vtx()
     # if the object has a specifically set culling bounds, use that instead
@@ -665,12 +956,11 @@ def getNextNeighborFace(faces, face, lastEdgeKey, visitedFaces, possibleFaces, i
     return nextFaceAndEdge
 
 
-def saveTriangleStrip(triConverter, faces, mesh, terminateDL):
+def getTriangleStripOrder(faces, infoDict):
     visitedFaces = []
     unvisitedFaces = copy.copy(faces)
     possibleFaces = []
     lastEdgeKey = None
-    infoDict = triConverter.triConverterInfo.infoDict
     neighborFace = getLowestUnvisitedNeighborCountFace(unvisitedFaces, infoDict)
 
     while len(visitedFaces) < len(faces):
@@ -686,7 +976,6 @@ def saveTriangleStrip(triConverter, faces, mesh, terminateDL):
                 neighborFace = getLowestUnvisitedNeighborCountFace(unvisitedFaces, infoDict)
                 lastEdgeKey = None
 
-        triConverter.addFace(neighborFace)
         if neighborFace in visitedFaces:
             raise PluginError("Repeated face")
         visitedFaces.append(neighborFace)
@@ -700,6 +989,17 @@ def saveTriangleStrip(triConverter, faces, mesh, terminateDL):
             faces, neighborFace, lastEdgeKey, visitedFaces, possibleFaces, infoDict
         )
 
+    return visitedFaces
+
+
+def saveTriangleStrip(triConverter, faces, mesh, terminateDL):
+    faceOrder = getTriangleStripOrder(faces, triConverter.triConverterInfo.infoDict)
+    if bpy.context.scene.fast64.settings.optimize_triangle_order:
+        faceOrder = triConverter.optimizeFaceOrder(faceOrder)
+
+    for face in faceOrder:
+        triConverter.addFace(face)
+
     triConverter.finish(terminateDL)
     return triConverter.currentGroupIndex
 
@@ -725,6 +1025,7 @@ def checkIfFlatShaded(material):
     return not f3dMat.rdp_settings.g_shade_smooth
 
 
+@profileStage("triangle conversion")
 def saveMeshByFaces(
     material,
     faces,
@@ -744,19 +1045,26 @@ def saveMeshByFaces(
     """
 
     if len(faces) == 0:
-        print("0 Faces Provided.")
+        printExport("0 Faces Provided.")
         return
     fMaterial, texDimensions = saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData)
-    isPointSampled = isTexturePointSampled(material)
-    exportVertexColors = isLightingDisabled(material)
-    uv_data = obj.data.uv_layers["UVMap"].data
-    convertInfo = LoopConvertInfo(uv_data, obj, exportVertexColors)
 
     if material.name != lastMaterialName:
         fMesh.add_material_call(fMaterial)
     triGroup = fMesh.tri_group_new(fMaterial)
     fMesh.draw.commands.append(SPDisplayList(triGroup.triList))
 
+    meshCache = getMeshCache()
+    cacheKey = None
+    if meshCache is not None and isMeshCacheable(triConverterInfo, currentGroupIndex, existingVertData, matRegionDict):
+        cacheKey = getMeshCacheKey(meshCache, triConverterInfo, faces, material, texDimensions)
+        if meshCache.loadTriangles(cacheKey, triGroup.triList, triGroup.vertexList):
+            if fMaterial.revert is not None:
+                fMesh.draw.commands.append(SPDisplayList(fMaterial.revert))
+            return currentGroupIndex
+
+    commandStart = len(triGroup.triList.commands)
+    vertexStart = len(triGroup.vertexList.vertices)
     triConverter = TriangleConverter(
         triConverterInfo,
         texDimensions,
@@ -769,6 +1077,8 @@ def saveMeshByFaces(
     )
 
     currentGroupIndex = saveTriangleStrip(triConverter, faces, obj.data, True)
+    if cacheKey is not None:
+        meshCache.storeTriangles(cacheKey, triGroup.triList, triGroup.vertexList, commandStart, vertexStart)
 
     if fMaterial.revert is not None:
         fMesh.draw.commands.append(SPDisplayList(fMaterial.revert))
@@ -776,6 +1086,34 @@ def saveMeshByFaces(
     return currentGroupIndex
 
 
+def isMeshCacheable(triConverterInfo, currentGroupIndex, existingVertData, matRegionDict):
+    """Only static meshes are cached, as skinned meshes depend on bones and previously loaded vertices."""
+    return (
+        triConverterInfo.armature is None
+        and triConverterInfo.vertexGroupInfo is None
+        and currentGroupIndex is None
+        and existingVertData is None
+        and matRegionDict is None
+    )
+
+
+def getMeshCacheKey(meshCache, triConverterInfo, faces, material, texDimensions):
+    f3d = triConverterInfo.f3d
+    return meshCache.getKey(
+        triConverterInfo.getSnapshot().getFingerprint(),
+        np.fromiter((face.index for face in faces), dtype=np.int32, count=len(faces)),
+        tuple(texDimensions),
+        isTexturePointSampled(material),
+        isLightingDisabled(material),
+        tuple(material.f3d_mat.tex_scale),
+        tuple(tuple(row) for row in triConverterInfo.transformMatrix),
+        f3d.vert_load_size,
+        f3d.F3DEX_GBI,
+        bpy.context.scene.fast64.settings.optimize_triangle_order,
+        is3_2_or_above(),
+    )
+
+
 def get8bitRoundedNormal(loop: bpy.types.MeshLoop, mesh):
     alpha_layer = getColorLayer(mesh, "Alpha")
 
@@ -815,6 +1153,8 @@ def getNewIndices(existingIndices, bufferStart):
 # Color and normal are separate, since for parsing, the normal must be transformed into
 # bone/object space while the color should just be a regular conversion.
 class F3DVert:
+    __slots__ = ("position", "uv", "color", "normal")
+
     def __init__(
         self,
         position: mathutils.Vector,
@@ -837,6 +1177,18 @@ class F3DVert:
             and self.normal == other.normal
         )
 
+    def key(self):
+        """
+        Hashable, exact-valued tuple of this vertex's components.
+        Unlike __eq__, vertices whose components are one float apart have different keys.
+        """
+        return (
+            tuple(self.position),
+            tuple(self.uv),
+            None if self.color is None else tuple(self.color),
+            None if self.normal is None else tuple(self.normal),
+        )
+
     def getColorOrNormal(self):
         if self.color is None and self.normal is None:
             raise PluginError("An F3D vert has neither a color or a normal.")
@@ -848,10 +1200,29 @@ class F3DVert:
 
 # groupIndex is either a vertex group (writing), or name of c variable identifying a transform group, like a limb (parsing)
 class BufferVertex:
+    __slots__ = ("f3dVert", "groupIndex", "materialIndex", "_key", "_bucketKeys")
+
     def __init__(self, f3dVert: F3DVert, groupIndex: int | str, materialIndex: int):
         self.f3dVert: F3DVert = f3dVert
         self.groupIndex: int | str = groupIndex
         self.materialIndex: int = materialIndex
+        self._key = None
+        self._bucketKeys = None
+
+    # Both keys are computed lazily, since the parser creates many buffer vertices that are never compared.
+    @property
+    def key(self):
+        """Exact-valued key, only used to estimate vertex loads when ordering triangles."""
+        if self._key is None:
+            self._key = (self.f3dVert.key(), self.groupIndex, self.materialIndex)
+        return self._key
+
+    @property
+    def bucketKeys(self):
+        """See BufferVertexIndex.getBucketKeys."""
+        if self._bucketKeys is None:
+            self._bucketKeys = BufferVertexIndex.getBucketKeys(self)
+        return self._bucketKeys
 
     def __eq__(self, other):
         if not isinstance(other, BufferVertex):
@@ -875,6 +1246,14 @@ class TriangleConverterInfo:
 
         # Caching names
         self.groupNames = {}
+        # Caching transforms, group index : matrix
+        self.transformMatrices = {}
+        self.normalMatrices = {}
+
+    def getSnapshot(self) -> MeshSnapshot:
+        if self.infoDict.snapshot is None or self.infoDict.snapshot.mesh != self.mesh:
+            self.infoDict.snapshot = MeshSnapshot(self.mesh, self.mesh.uv_layers["UVMap"].data)
+        return self.infoDict.snapshot
 
     def getMatrixAddrFromGroup(self, groupIndex):
         raise PluginError(
@@ -895,6 +1274,17 @@ class TriangleConverterInfo:
                 groupMatrix = self.armature.bones[name].matrix_local.inverted()
         return self.transformMatrix @ groupMatrix
 
+    def getCachedTransformMatrix(self, groupIndex):
+        if groupIndex not in self.transformMatrices:
+            self.transformMatrices[groupIndex] = self.getTransformMatrix(groupIndex)
+        return self.transformMatrices[groupIndex]
+
+    def getNormalMatrix(self, groupIndex):
+        """Inverse transpose of the group transform, used to transform normals."""
+        if groupIndex not in self.normalMatrices:
+            self.normalMatrices[groupIndex] = self.getCachedTransformMatrix(groupIndex).inverted().transposed()
+        return self.normalMatrices[groupIndex]
+
 
 # existingVertexData is used for cases where we want to assume the presence of vertex data
 # loaded in from a previous matrix transform (ex. sm64 skinning)
@@ -922,13 +1312,27 @@ class TriangleConverter:
         self.bufferStart = len(self.vertBuffer)
         self.vertexBufferTriangles = []  # [(index0, index1, index2)]
 
+        # Indices into vertBuffer, so that membership checks don't need to scan/slice the buffer.
+        # Existing data is never modified, so its indices are only built once.
+        self.existingVertIndex = BufferVertexIndex()  # vertBuffer[:bufferStart]
+        for i, bufferVert in enumerate(self.vertBuffer):
+            self.existingVertIndex.add(bufferVert, i)
+        self.existingMaterialRegionIndices: dict[int, BufferVertexIndex] = {}  # material index : region index
+        if self.existingVertexMaterialRegions is not None:
+            for material_index, matRegion in self.existingVertexMaterialRegions.items():
+                regionIndex = BufferVertexIndex()
+                for i in range(matRegion[0], matRegion[1]):
+                    regionIndex.add(self.vertBuffer[i], i)
+                self.existingMaterialRegionIndices[material_index] = regionIndex
+        self.loadedVertIndex = BufferVertexIndex()  # vertBuffer[bufferStart:]
+        self.bufferVertCache: dict[int, BufferVertex] = {}  # loop index : BufferVertex
+
         self.triList = triList
         self.vtxList = vtxList
 
         isPointSampled = isTexturePointSampled(material)
         exportVertexColors = isLightingDisabled(material)
-        uv_data = triConverterInfo.obj.data.uv_layers["UVMap"].data
-        self.convertInfo = LoopConvertInfo(uv_data, triConverterInfo.obj, exportVertexColors)
+        self.snapshot = triConverterInfo.getSnapshot()
         self.texDimensions = texDimensions
         self.isPointSampled = isPointSampled
         self.exportVertexColors = exportVertexColors
@@ -936,14 +1340,32 @@ class TriangleConverter:
 
     def vertInBuffer(self, bufferVert, material_index):
         if self.existingVertexMaterialRegions is None:
-            return bufferVert in self.vertBuffer
+            return bufferVert in self.existingVertIndex or bufferVert in self.loadedVertIndex
         else:
-            if material_index in self.existingVertexMaterialRegions:
-                matRegion = self.existingVertexMaterialRegions[material_index]
-                if bufferVert in self.vertBuffer[matRegion[0] : matRegion[1]]:
+            if material_index in self.existingMaterialRegionIndices:
+                if bufferVert in self.existingMaterialRegionIndices[material_index]:
                     return True
 
-            return bufferVert in self.vertBuffer[self.bufferStart :]
+            return bufferVert in self.loadedVertIndex
+
+    def getBufferIndex(self, bufferVert):
+        """Equivalent to self.vertBuffer.index(bufferVert)."""
+        index = self.existingVertIndex.find(bufferVert)
+        if index is None:
+            index = self.loadedVertIndex.find(bufferVert)
+        if index is None:
+            raise ValueError("Vertex is not in the vertex buffer.")
+        return index
+
+    def rebuildLoadedVertIndex(self):
+        self.loadedVertIndex = BufferVertexIndex()
+        for i in range(self.bufferStart, len(self.vertBuffer)):
+            self.loadedVertIndex.add(self.vertBuffer[i], i)
+
+    def extendBuffer(self, bufferVerts):
+        for bufferVert in bufferVerts:
+            self.loadedVertIndex.add(bufferVert, len(self.vertBuffer))
+            self.vertBuffer.append(bufferVert)
 
     def getSortedBuffer(self) -> dict[int, list[BufferVertex]]:
         limbVerts: dict[int, list[BufferVertex]] = {}
@@ -970,24 +1392,12 @@ class TriangleConverter:
             del limbVerts[self.currentGroupIndex]
 
             # Save vertices
-            for bufferVert in self.vertBuffer[bufferStart:bufferEnd]:
-                self.vtxList.vertices.append(
-                    convertVertexData(
-                        self.triConverterInfo.mesh,
-                        bufferVert.f3dVert.position,
-                        bufferVert.f3dVert.uv,
-                        bufferVert.f3dVert.getColorOrNormal(),
-                        self.texDimensions,
-                        self.triConverterInfo.getTransformMatrix(bufferVert.groupIndex),
-                        self.isPointSampled,
-                        self.exportVertexColors,
-                        tex_scale=self.tex_scale,
-                    )
-                )
+            self.saveVertices(self.vertBuffer[bufferStart:bufferEnd], self.currentGroupIndex)
 
             bufferStart = bufferEnd
         else:
             self.vertBuffer = self.vertBuffer[: self.bufferStart]
+        self.rebuildLoadedVertIndex()
 
         # Load other limb verts
         for groupIndex, bufferVerts in limbVerts.items():
@@ -1000,62 +1410,111 @@ class TriangleConverter:
                 SPVertex(self.vtxList, len(self.vtxList.vertices), len(bufferVerts), bufferStart)
             )
 
-            self.vertBuffer += bufferVerts
+            self.extendBuffer(bufferVerts)
             bufferEnd += len(bufferVerts)
 
             # Save vertices
-            for bufferVert in self.vertBuffer[bufferStart:bufferEnd]:
-                self.vtxList.vertices.append(
-                    convertVertexData(
-                        self.triConverterInfo.mesh,
-                        bufferVert.f3dVert.position,
-                        bufferVert.f3dVert.uv,
-                        bufferVert.f3dVert.getColorOrNormal(),
-                        self.texDimensions,
-                        self.triConverterInfo.getTransformMatrix(bufferVert.groupIndex),
-                        self.isPointSampled,
-                        self.exportVertexColors,
-                        tex_scale=self.tex_scale,
-                    )
-                )
+            self.saveVertices(self.vertBuffer[bufferStart:bufferEnd], groupIndex)
 
             bufferStart = bufferEnd
 
         # Load triangles
+        triangleIndices = [
+            [self.getBufferIndex(bufferVert) for bufferVert in triangle] for triangle in self.vertexBufferTriangles
+        ]
         self.triList.commands.extend(
-            createTriangleCommands(self.vertexBufferTriangles, self.vertBuffer, self.triConverterInfo.f3d.F3DEX_GBI)
+            createTriangleCommandsFromIndices(triangleIndices, self.triConverterInfo.f3d.F3DEX_GBI)
         )
 
+    def saveVertices(self, bufferVerts: list[BufferVertex], groupIndex):
+        """Converts vertices of the same group with a single batched call."""
+        self.vtxList.vertices.extend(
+            convertVertexDataBatch(
+                [bufferVert.f3dVert.position for bufferVert in bufferVerts],
+                [bufferVert.f3dVert.uv for bufferVert in bufferVerts],
+                [bufferVert.f3dVert.getColorOrNormal() for bufferVert in bufferVerts],
+                self.texDimensions,
+                self.triConverterInfo.getCachedTransformMatrix(groupIndex),
+                None if self.exportVertexColors else self.triConverterInfo.getNormalMatrix(groupIndex),
+                self.isPointSampled,
+                self.exportVertexColors,
+                tex_scale=self.tex_scale,
+            )
+        )
+
+    def getBufferVertex(self, loopIndex, face):
+        if loopIndex in self.bufferVertCache:
+            return self.bufferVertCache[loopIndex]
+
+        vertexGroup = (
+            self.triConverterInfo.vertexGroupInfo.vertexGroups[self.snapshot.loopVertexList[loopIndex]]
+            if self.triConverterInfo.vertexGroupInfo is not None
+            else None
+        )
+        bufferVert = BufferVertex(
+            self.snapshot.getF3DVert(loopIndex, self.exportVertexColors), vertexGroup, face.material_index
+        )
+        self.bufferVertCache[loopIndex] = bufferVert
+        return bufferVert
+
+    def isPreloaded(self, bufferVert, material_index):
+        """Whether a vertex is part of the existing data, and will never need to be loaded."""
+        if self.existingVertexMaterialRegions is None:
+            return bufferVert in self.existingVertIndex
+        else:
+            regionIndex = self.existingMaterialRegionIndices.get(material_index)
+            return regionIndex is not None and bufferVert in regionIndex
+
+    def optimizeFaceOrder(self, faces):
+        """
+        Reorders faces to minimize vertex loads, see optimizeTriangleOrder().
+        The given order is kept if the optimized one is not an improvement.
+        """
+        triangles = []
+        for face in faces:
+            keys = []
+            for loopIndex in face.loops:
+                bufferVert = self.getBufferVertex(loopIndex, face)
+                keys.append(None if self.isPreloaded(bufferVert, face.material_index) else bufferVert.key)
+            triangles.append(keys)
+
+        bufferSize = self.triConverterInfo.f3d.vert_load_size - self.bufferStart
+        order = optimizeTriangleOrder(triangles, bufferSize)
+        loadsBefore, vertsBefore = countVertexLoads(triangles, list(range(len(faces))), bufferSize)
+        loadsAfter, vertsAfter = countVertexLoads(triangles, order, bufferSize)
+        printExport(
+            f"Triangle order optimization for {self.triList.name}: "
+            + f"{loadsBefore} -> {loadsAfter} vertex loads, {vertsBefore} -> {vertsAfter} vertices"
+        )
+
+        if (loadsAfter, vertsAfter) >= (loadsBefore, vertsBefore):
+            return faces
+        return [faces[index] for index in order]
+
     def addFace(self, face):
         triIndices = []
         addedVerts = []  # verts added to existing vertexBuffer
         allVerts = []  # all verts not in 'untouched' buffer region
 
         for loopIndex in face.loops:
-            loop = self.triConverterInfo.mesh.loops[loopIndex]
-            vertexGroup = (
-                self.triConverterInfo.vertexGroupInfo.vertexGroups[loop.vertex_index]
-                if self.triConverterInfo.vertexGroupInfo is not None
-                else None
-            )
-            bufferVert = BufferVertex(
-                getF3DVert(loop, face, self.convertInfo, self.triConverterInfo.mesh), vertexGroup, face.material_index
-            )
+            bufferVert = self.getBufferVertex(loopIndex, face)
             triIndices.append(bufferVert)
             if not self.vertInBuffer(bufferVert, face.material_index):
                 addedVerts.append(bufferVert)
 
-            if bufferVert not in self.vertBuffer[: self.bufferStart]:
+            if bufferVert not in self.existingVertIndex:
                 allVerts.append(bufferVert)
 
         # We care only about load size, since loading is what takes up time.
         # Even if vert_buffer is larger, its still another load to fill it.
         if len(self.vertBuffer) + len(addedVerts) > self.triConverterInfo.f3d.vert_load_size:
             self.processGeometry()
-            self.vertBuffer = self.vertBuffer[: self.bufferStart] + allVerts
+            self.vertBuffer = self.vertBuffer[: self.bufferStart]
+            self.loadedVertIndex = BufferVertexIndex()
+            self.extendBuffer(allVerts)
             self.vertexBufferTriangles = [triIndices]
         else:
-            self.vertBuffer.extend(addedVerts)
+            self.extendBuffer(addedVerts)
             self.vertexBufferTriangles.append(triIndices)
 
     def finish(self, terminateDL):
@@ -1199,8 +1658,10 @@ def getHighestFaceWeight(faceWeights):
 def UVtoST(obj, loopIndex, uv_data, texDimensions, isPointSampled):
     uv = uv_data[loopIndex].uv.copy()
     uv[1] = 1 - uv[1]
-    loopUV = uv.freeze()
+    return convertUVToST(uv.freeze(), texDimensions, isPointSampled)
+
 
+def convertUVToST(loopUV, texDimensions, isPointSampled):
     pixelOffset = 0 if isPointSampled else 0.5
     return [
         convertFloatToFixed16(loopUV[0] * texDimensions[0] - pixelOffset) / 32,
@@ -1219,8 +1680,75 @@ def convertVertexData(
     exportVertexColors,
     tex_scale=(1, 1),
 ):
+    normalMatrix = None if exportVertexColors else transformMatrix.inverted().transposed()
+    return convertVertexDataBatch(
+        [loopPos],
+        [loopUV],
+        [loopColorOrNormal],
+        texDimensions,
+        transformMatrix,
+        normalMatrix,
+        isPointSampled,
+        exportVertexColors,
+        tex_scale=tex_scale,
+    )[0]
+
+
+def vectorsToArray(vectors, width: int) -> np.ndarray:
+    # Faster than np.array for short lists of mathutils vectors.
+    values = np.fromiter(itertools.chain.from_iterable(vectors), dtype=np.float32, count=len(vectors) * width)
+    return values.reshape(-1, width)
+
+
+def transformVectors(matrix: mathutils.Matrix, vectors: np.ndarray) -> np.ndarray:
+    """
+    Equivalent to matrix @ vector for each 3 or 4 component vector, returns (n, 4) float32.
+    mathutils multiplies in single precision and sums in double precision, which is reproduced here.
+    """
+    matrix = np.array(matrix, dtype=np.float32)
+    padded = np.ones((len(vectors), 4), dtype=np.float32)
+    padded[:, : vectors.shape[1]] = vectors
+    products = (matrix[np.newaxis, :, :] * padded[:, np.newaxis, :]).astype(np.float64)
+    return (((products[:, :, 0] + products[:, :, 1]) + products[:, :, 2]) + products[:, :, 3]).astype(np.float32)
+
+
+def normalizeVectors(vectors: np.ndarray) -> np.ndarray:
+    """
+    Equivalent to Vector.normalized() for each float32 vector, of any number of components.
+    mathutils squares in single precision and sums backwards in double precision, which is reproduced here.
+    """
+    squares = (vectors * vectors).astype(np.float64)
+    lengthSquared = squares[:, -1]
+    for index in reversed(range(vectors.shape[1] - 1)):
+        lengthSquared = lengthSquared + squares[:, index]
+    valid = lengthSquared > 1.0e-35
+    lengths = np.sqrt(lengthSquared, where=valid, out=np.ones_like(lengthSquared)).astype(np.float32)
+    return np.where(valid[:, np.newaxis], vectors * (np.float32(1) / lengths)[:, np.newaxis], np.float32(0))
+
+
+def convertVertexDataBatch(
+    positions,
+    uvs,
+    colorsOrNormals,
+    texDimensions,
+    transformMatrix,
+    normalMatrix,
+    isPointSampled,
+    exportVertexColors,
+    tex_scale=(1, 1),
+) -> list[Vtx]:
+    """
+    Converts vertices sharing the same transform at once, with the same results as convertVertexData.
+    normalMatrix is transformMatrix.inverted().transposed(), it is only used for normals and can be None otherwise.
+    """
+    positions = vectorsToArray(positions, 3)
+    uvs = vectorsToArray(uvs, 2).astype(np.float64)
+    colorsOrNormals = vectorsToArray(colorsOrNormals, 4)
+    if not (np.isfinite(positions).all() and np.isfinite(uvs).all() and np.isfinite(colorsOrNormals).all()):
+        raise PluginError("Vertex data contains invalid values (NaN or infinity).")
+
     # Position (8 bytes)
-    position = [int(round(floatValue)) for floatValue in (transformMatrix @ loopPos)]
+    positionData = np.rint(transformVectors(transformMatrix, positions)[:, :3].astype(np.float64)).astype(np.int64)
 
     # UV (4 bytes)
     # For F3D, Bilinear samples the point from the center of the pixel.
@@ -1232,26 +1760,29 @@ def convertVertexData(
         if (isPointSampled or tex_scale[0] == 0 or tex_scale[1] == 0)
         else (0.5 / tex_scale[0], 0.5 / tex_scale[1])
     )
-
-    uv = [
-        convertFloatToFixed16(loopUV[0] * texDimensions[0] - pixelOffset[0]),
-        convertFloatToFixed16(loopUV[1] * texDimensions[1] - pixelOffset[1]),
-    ]
+    uvData = np.empty((len(uvs), 2), dtype=np.int64)
+    for i in range(2):
+        uvData[:, i] = np.rint((uvs[:, i] * texDimensions[i] - pixelOffset[i]) * 2**5)
 
     # Color/Normal (4 bytes)
+    colorOrNormalData = np.empty((len(colorsOrNormals), 4), dtype=np.int64)
     if exportVertexColors:
-        colorOrNormal = [scaleToU8(c).to_bytes(1, "big")[0] for c in loopColorOrNormal]
+        colorOrNormalData[:] = np.minimum(np.rint(colorsOrNormals.astype(np.float64) * 0xFF), 0xFF)
+        if (colorOrNormalData < 0).any():
+            raise PluginError("Vertex colors must not be negative.")
     else:
         # normal transformed correctly.
-        normal = (transformMatrix.inverted().transposed() @ loopColorOrNormal).normalized()
-        colorOrNormal = [
-            int(round(normal[0] * 127)).to_bytes(1, "big", signed=True)[0],
-            int(round(normal[1] * 127)).to_bytes(1, "big", signed=True)[0],
-            int(round(normal[2] * 127)).to_bytes(1, "big", signed=True)[0],
-            scaleToU8(loopColorOrNormal[3]).to_bytes(1, "big")[0],
-        ]
+        # Like Matrix @ Vector on the loop's (x, y, z, alpha), the 4th component is part of the normalization.
+        normals = normalizeVectors(transformVectors(normalMatrix, colorsOrNormals))[:, :3]
+        colorOrNormalData[:, :3] = np.rint(normals.astype(np.float64) * 127).astype(np.int64) & 0xFF
+        colorOrNormalData[:, 3] = np.minimum(np.rint(colorsOrNormals[:, 3].astype(np.float64) * 0xFF), 0xFF)
+        if (colorOrNormalData[:, 3] < 0).any():
+            raise PluginError("Vertex alpha must not be negative.")
 
-    return Vtx(position, uv, colorOrNormal)
+    return [
+        Vtx(position, uv, colorOrNormal)
+        for position, uv, colorOrNormal in zip(positionData.tolist(), uvData.tolist(), colorOrNormalData.tolist())
+    ]
 
 
 @functools.lru_cache(0)
@@ -1293,47 +1824,19 @@ def getLoopColorOrNormal(
         return None, getLoopNormal(loop, face, mesh, isFlatShaded)
 
 
-def createTriangleCommands(triangles, vertexBuffer, useSP2Triangle):
-    triangles = copy.deepcopy(triangles)
-    commands = []
-    if useSP2Triangle:
-        while len(triangles) > 0:
-            if len(triangles) >= 2:
-                commands.append(
-                    SP2Triangles(
-                        vertexBuffer.index(triangles[0][0]),
-                        vertexBuffer.index(triangles[0][1]),
-                        vertexBuffer.index(triangles[0][2]),
-                        0,
-                        vertexBuffer.index(triangles[1][0]),
-                        vertexBuffer.index(triangles[1][1]),
-                        vertexBuffer.index(triangles[1][2]),
-                        0,
-                    )
-                )
-                triangles = triangles[2:]
-            else:
-                commands.append(
-                    SP1Triangle(
-                        vertexBuffer.index(triangles[0][0]),
-                        vertexBuffer.index(triangles[0][1]),
-                        vertexBuffer.index(triangles[0][2]),
-                        0,
-                    )
-                )
-                triangles = []
-    else:
-        while len(triangles) > 0:
-            commands.append(
-                SP1Triangle(
-                    vertexBuffer.index(triangles[0][0]),
-                    vertexBuffer.index(triangles[0][1]),
-                    vertexBuffer.index(triangles[0][2]),
-                    0,
-                )
-            )
-            triangles = triangles[1:]
+def createTriangleCommandsFromIndices(triangleIndices, useSP2Triangle):
+    """
+    Creates triangle commands from vertex buffer slots, in a single pass.
+    With SP2Triangles, consecutive triangles are paired, so every command except maybe the last draws two triangles.
+    """
+    if not useSP2Triangle:
+        return [SP1Triangle(v0, v1, v2, 0) for v0, v1, v2 in triangleIndices]
 
+    commands = []
+    for i in range(0, len(triangleIndices) - 1, 2):
+        commands.append(SP2Triangles(*triangleIndices[i], 0, *triangleIndices[i + 1], 0))
+    if len(triangleIndices) % 2 == 1:
+        commands.append(SP1Triangle(*triangleIndices[-1], 0))
     return commands
 
 
@@ -1376,6 +1879,7 @@ def getTexDimensions(material):
     return texDimensions
 
 
+@profileStage("material building")
 def saveOrGetF3DMaterial(material, fModel, obj, drawLayer, convertTextureData):
     if material.mat_ver > 3:
         f3dMat = material.f3d_mat
@@ -2050,6 +2554,24 @@ class FSharedPalette:
     def __init__(self, name):
         self.name = name
         self.palette = []
+        self.paletteIndex = {}  # color : index in palette
+        self.isQuantized = False
+
+    def quantize(self, images: list[bpy.types.Image], texFmt: str, palFmt: str):
+        """
+        Builds a palette for all images of the group at once if they have too many colors together.
+        Colors of the images are then mapped to their nearest palette color.
+        """
+        palFormat = texFormatOf[palFmt]
+        maxColors = 16 if texBitSizeOf[texFmt] == "G_IM_SIZ_4b" else 256
+        colors = np.concatenate([encodePaletteColors(getImagePixels(image), palFormat).ravel() for image in images])
+        uniqueColors, inverse, counts = getUniqueColors(colors)
+        if len(uniqueColors) <= maxColors:
+            return
+
+        self.palette[:] = quantizeColors(uniqueColors, counts, palFormat, maxColors)
+        self.paletteIndex = {color: index for index, color in enumerate(self.palette)}
+        self.isQuantized = True
 
 
 def saveOrGetPaletteOnlyDefinition(
@@ -2101,6 +2623,48 @@ def imageAlreadyExists(fModel: FModel, image: bpy.types.Image, texFmt: str, palF
     return fImage is not None
 
 
+def getPaletteIndices(
+    pixels: np.ndarray,
+    imageName: str,
+    palFormat: str,
+    maxColors: int,
+    palette: list[int],
+    paletteIndex: dict[int, int],
+    sharedPalette: FSharedPalette | None,
+) -> tuple[np.ndarray, list[int]]:
+    """
+    Adds the colors of the image to the palette, and returns (palette index of each pixel, palette).
+    The returned palette is a new list if the image had to be quantized.
+    """
+    colors = encodePaletteColors(pixels, palFormat)
+    uniqueColors, inverse, counts = getUniqueColors(colors)
+    newColors = [color for color in uniqueColors.tolist() if color not in paletteIndex]
+
+    if sharedPalette is not None and sharedPalette.isQuantized:
+        uniqueIndices = getNearestPaletteIndices(uniqueColors, palette, palFormat)
+    elif len(palette) + len(newColors) > maxColors:
+        # A shared palette can't be quantized here, since previous textures already use its indices.
+        if sharedPalette is not None or not bpy.context.scene.fast64.settings.quantize_ci_textures:
+            raise PluginError(
+                "Texture "
+                + imageName
+                + " has more than "
+                + str(maxColors)
+                + " colors, or is part of a shared palette with too many colors."
+            )
+        printExport(f"Quantizing {imageName} from {len(uniqueColors)} to {maxColors} colors", "NORMAL")
+        palette = quantizeColors(uniqueColors, counts, palFormat, maxColors)
+        uniqueIndices = getNearestPaletteIndices(uniqueColors, palette, palFormat)
+    else:
+        for color in newColors:
+            paletteIndex[color] = len(palette)
+            palette.append(color)
+        uniqueIndices = np.array([paletteIndex[color] for color in uniqueColors.tolist()], dtype=np.int64)
+
+    return uniqueIndices[inverse].astype(np.uint8), palette
+
+
+@profileStage("texture conversion")
 def saveOrGetPaletteAndImageDefinition(
     fMaterial, fModelOrTexRect, image, imageName, texFmt, palFmt, convertTextureData, sharedPalette: FSharedPalette
 ) -> tuple[FImage, FImage, bool]:
@@ -2117,36 +2681,41 @@ def saveOrGetPaletteAndImageDefinition(
     # print(f"Size: {str(image.size[0])} x {str(image.size[1])}, Data: {str(len(image.pixels))}")
     if sharedPalette is not None:
         palette = sharedPalette.palette
+        paletteIndex = sharedPalette.paletteIndex
     else:
         palette = []
+        paletteIndex = {}
     texture = []
     maxColors = 16 if bitSize == "G_IM_SIZ_4b" else 256
+    contentKey = None
     if convertTextureData:
-        # N64 is -Y, Blender is +Y
-        pixels = image.pixels[:]
-        for j in reversed(range(image.size[1])):
-            for i in range(image.size[0]):
-                color = [1, 1, 1, 1]
-                for field in range(image.channels):
-                    color[field] = pixels[(j * image.size[0] + i) * image.channels + field]
-                if palFormat == "G_IM_FMT_RGBA":
-                    pixelColor = getRGBA16Tuple(color)
-                elif palFormat == "G_IM_FMT_IA":
-                    pixelColor = getIA16Tuple(color)
-                else:
-                    raise PluginError("Invalid combo: " + palFormat + ", " + bitSize)
-
-                if pixelColor not in palette:
-                    palette.append(pixelColor)
-                    if len(palette) > maxColors:
-                        raise PluginError(
-                            "Texture "
-                            + imageName
-                            + " has more than "
-                            + str(maxColors)
-                            + " colors, or is part of a shared palette with too many colors."
-                        )
-                texture.append(palette.index(pixelColor))
+        if sharedPalette is None and bpy.context.scene.fast64.settings.deduplicate_textures:
+            quantize = bpy.context.scene.fast64.settings.quantize_ci_textures
+            contentKey = getTextureContentKey(
+                fModelOrTexRect, image, texFmt, palFmt, quantize, fMaterial.useLargeTextures
+            )
+            fImage, fPalette = getTextureWithSameContent(fMaterial, fModelOrTexRect, contentKey, image)
+            if fImage is not None:
+                return fImage, fPalette, True
+        pixels = getImagePixels(image)
+        # Textures using a shared palette depend on the previous textures of the group, so they aren't cached.
+        cache = getTextureCache() if sharedPalette is None else None
+        if cache is not None:
+            quantize = bpy.context.scene.fast64.settings.quantize_ci_textures
+            cacheKey = cache.getKey(pixels, texFmt, palFmt, quantize)
+            cachedData = cache.load(cacheKey, 2)
+        else:
+            cachedData = None
+
+        if cachedData is not None:
+            texture = np.frombuffer(cachedData[0], dtype=np.uint8)
+            palette = np.frombuffer(cachedData[1], dtype=">u2").tolist()
+        else:
+            texture, palette = getPaletteIndices(
+                pixels, imageName, palFormat, maxColors, palette, paletteIndex, sharedPalette
+            )
+            if cache is not None:
+                cache.store(cacheKey, [texture.tobytes(), np.array(palette, dtype=">u2").tobytes()])
 
     if image.filepath == "":
         name = image.name
@@ -2177,7 +2746,7 @@ def saveOrGetPaletteAndImageDefinition(
         if bitSize == "G_IM_SIZ_4b":
             fImage.data = compactNibbleArray(texture, image.size[0], image.size[1])
         else:
-            fImage.data = bytearray(texture)
+            fImage.data = bytearray(texture.tobytes())
 
     fModelOrTexRect.addTexture((image, (texFmt, palFmt)), fImage, fMaterial)
 
@@ -2192,6 +2761,8 @@ def saveOrGetPaletteAndImageDefinition(
         )
         paletteKey = (image, (palFmt, "PAL"))
         fImage.paletteKey = paletteKey
+        if contentKey is not None:
+            fModelOrTexRect.textureContentKeys[contentKey] = imageKey
     else:
         fPalette = None
         fImage.paletteKey = None
@@ -2200,15 +2771,38 @@ def saveOrGetPaletteAndImageDefinition(
 
 
 def compactNibbleArray(texture, width, height):
-    nibbleData = bytearray(0)
-    dataSize = int(width * height / 2)
+    return compactNibbles(texture[: width * height])
 
-    nibbleData = [((texture[i * 2] & 0xF) << 4) | (texture[i * 2 + 1] & 0xF) for i in range(dataSize)]
 
-    if (width * height) % 2 == 1:
-        nibbleData.append((texture[-1] & 0xF) << 4)
+def getTextureContentKey(fModelOrTexRect, image: bpy.types.Image, *formats) -> tuple:
+    """
+    Returns a key that is equal for images with identical pixels converted with the same formats.
+    The pixels of an image are only read and hashed once per export, since merged images are looked up on every use.
+    """
+    rootModel = fModelOrTexRect if fModelOrTexRect.parentModel is None else fModelOrTexRect.parentModel
+    if image not in rootModel.imagePixelHashes:
+        pixels = getImagePixels(image)
+        pixelHash = hashlib.sha1(np.ascontiguousarray(pixels).tobytes()).hexdigest()
+        rootModel.imagePixelHashes[image] = (pixels.shape, pixelHash)
+    return *rootModel.imagePixelHashes[image], formats
 
-    return bytearray(nibbleData)
+
+def getTextureWithSameContent(fMaterial, fModelOrTexRect, contentKey, image: bpy.types.Image) -> tuple[FImage, FImage]:
+    """
+    Returns (fImage, fPalette) of an already exported texture with the given content, or (None, None).
+    The texture is added to the used images of the material, so that it is shared along with the material.
+    """
+    imageKey = fModelOrTexRect.getTextureKeyFromContent(contentKey)
+    if imageKey is None:
+        return None, None
+    fImage, fPalette = fModelOrTexRect.getTextureAndHandleShared(imageKey)
+    if fImage is not None:
+        if imageKey not in fMaterial.usedImages:
+            fMaterial.usedImages.append(imageKey)
+        printExport(f"Using {fImage.name} for {image.name}, which has identical pixels")
+        fModelOrTexRect.mergedTextures.append((image.name, fImage.name))
+        exportProfiler.count("duplicate textures merged")
+    return fImage, fPalette
 
 
 def checkDuplicateTextureName(fModelOrTexRect, name):
@@ -2220,6 +2814,7 @@ def checkDuplicateTextureName(fModelOrTexRect, name):
     return name
 
 
+@profileStage("texture conversion")
 def saveOrGetTextureDefinition(fMaterial, fModel, image: bpy.types.Image, imageName, texFormat, convertTextureData):
     fmt = texFormatOf[texFormat]
     bitSize = texBitSizeOf[texFormat]
@@ -2230,6 +2825,15 @@ def saveOrGetTextureDefinition(fMaterial, fModel, image: bpy.types.Image, imageN
     if fImage is not None:
         return fImage
 
+    contentKey = None
+    if convertTextureData:
+        if bpy.context.scene.fast64.settings.deduplicate_textures:
+            contentKey = getTextureContentKey(fModel, image, texFormat, "NONE", fMaterial.useLargeTextures)
+            fImage, fPalette = getTextureWithSameContent(fMaterial, fModel, contentKey, image)
+            if fImage is not None:
+                return fImage
+        pixels = getImagePixels(image)
+
     if image.filepath == "":
         name = image.name
     else:
@@ -2249,212 +2853,22 @@ def saveOrGetTextureDefinition(fMaterial, fModel, image: bpy.types.Image, imageN
         fImage.isLargeTexture = True
 
     if convertTextureData:
-        pixels = image.pixels[:]
-        print(f"Converting texture data for {filename}")
-        if fmt == "G_IM_FMT_RGBA":
-            if bitSize == "G_IM_SIZ_16b":
-                # fImage.data = bytearray([byteVal for doubleByte in [
-                # 	(((int(image.pixels[(j * image.size[0] + i) * image.channels + 0] * 0x1F) & 0x1F) << 11) | \
-                # 	((int(image.pixels[(j * image.size[0] + i) * image.channels + 1] * 0x1F) & 0x1F) << 6) | \
-                # 	((int(image.pixels[(j * image.size[0] + i) * image.channels + 2] * 0x1F) & 0x1F) << 1) | \
-                # 	(1 if image.pixels[(j * image.size[0] + i) * image.channels + 3] > 0.5 else 0)
-                # 	).to_bytes(2, 'big')
-                # 	for j in reversed(range(image.size[1])) for i in range(image.size[0])] for byteVal in doubleByte])
-
-                fImage.data = bytearray(
-                    [
-                        byteVal
-                        for doubleByte in [
-                            (
-                                (
-                                    (
-                                        (int(round(pixels[(j * image.size[0] + i) * image.channels + 0] * 0x1F)) & 0x1F)
-                                        << 3
-                                    )
-                                    | (
-                                        (int(round(pixels[(j * image.size[0] + i) * image.channels + 1] * 0x1F)) & 0x1F)
-                                        >> 2
-                                    )
-                                ),
-                                (
-                                    (
-                                        (int(round(pixels[(j * image.size[0] + i) * image.channels + 1] * 0x1F)) & 0x03)
-                                        << 6
-                                    )
-                                    | (
-                                        (int(round(pixels[(j * image.size[0] + i) * image.channels + 2] * 0x1F)) & 0x1F)
-                                        << 1
-                                    )
-                                    | (1 if pixels[(j * image.size[0] + i) * image.channels + 3] > 0.5 else 0)
-                                ),
-                            )
-                            for j in reversed(range(image.size[1]))
-                            for i in range(image.size[0])
-                        ]
-                        for byteVal in doubleByte
-                    ]
-                )
-            elif bitSize == "G_IM_SIZ_32b":
-                fImage.data = bytearray(
-                    [
-                        int(round(pixels[(j * image.size[0] + i) * image.channels + field] * 0xFF)) & 0xFF
-                        for j in reversed(range(image.size[1]))
-                        for i in range(image.size[0])
-                        for field in range(image.channels)
-                    ]
-                )
-            else:
-                raise PluginError("Invalid combo: " + fmt + ", " + bitSize)
-
-        elif fmt == "G_IM_FMT_YUV":
-            raise PluginError("YUV not yet implemented.")
-            if bitSize == "G_IM_SIZ_16b":
-                pass
-            else:
-                raise PluginError("Invalid combo: " + fmt + ", " + bitSize)
-
-        elif fmt == "G_IM_FMT_CI":
-            raise PluginError("CI not yet implemented.")
-
-        elif fmt == "G_IM_FMT_IA":
-            if bitSize == "G_IM_SIZ_4b":
-                fImage.data = bytearray(
-                    [
-                        (
-                            (
-                                int(
-                                    round(
-                                        colorToLuminance(
-                                            pixels[
-                                                (j * image.size[0] + i)
-                                                * image.channels : (j * image.size[0] + i)
-                                                * image.channels
-                                                + 3
-                                            ]
-                                        )
-                                        * 0x7
-                                    )
-                                )
-                                & 0x7
-                            )
-                            << 1
-                        )
-                        | (1 if pixels[(j * image.size[0] + i) * image.channels + 3] > 0.5 else 0)
-                        for j in reversed(range(image.size[1]))
-                        for i in range(image.size[0])
-                    ]
-                )
-            elif bitSize == "G_IM_SIZ_8b":
-                fImage.data = bytearray(
-                    [
-                        (
-                            (
-                                int(
-                                    round(
-                                        colorToLuminance(
-                                            pixels[
-                                                (j * image.size[0] + i)
-                                                * image.channels : (j * image.size[0] + i)
-                                                * image.channels
-                                                + 3
-                                            ]
-                                        )
-                                        * 0xF
-                                    )
-                                )
-                                & 0xF
-                            )
-                            << 4
-                        )
-                        | (int(round(pixels[(j * image.size[0] + i) * image.channels + 3] * 0xF)) & 0xF)
-                        for j in reversed(range(image.size[1]))
-                        for i in range(image.size[0])
-                    ]
-                )
-            elif bitSize == "G_IM_SIZ_16b":
-                fImage.data = bytearray(
-                    [
-                        byteVal
-                        for doubleByte in [
-                            (
-                                int(
-                                    round(
-                                        colorToLuminance(
-                                            pixels[
-                                                (j * image.size[0] + i)
-                                                * image.channels : (j * image.size[0] + i)
-                                                * image.channels
-                                                + 3
-                                            ]
-                                        )
-                                        * 0xFF
-                                    )
-                                )
-                                & 0xFF,
-                                int(round(pixels[(j * image.size[0] + i) * image.channels + 3] * 0xFF)) & 0xFF,
-                            )
-                            for j in reversed(range(image.size[1]))
-                            for i in range(image.size[0])
-                        ]
-                        for byteVal in doubleByte
-                    ]
-                )
-            else:
-                raise PluginError("Invalid combo: " + fmt + ", " + bitSize)
-        elif fmt == "G_IM_FMT_I":
-            if bitSize == "G_IM_SIZ_4b":
-                fImage.data = bytearray(
-                    [
-                        int(
-                            round(
-                                colorToLuminance(
-                                    pixels[
-                                        (j * image.size[0] + i)
-                                        * image.channels : (j * image.size[0] + i)
-                                        * image.channels
-                                        + 3
-                                    ]
-                                )
-                                * 0xF
-                            )
-                        )
-                        & 0xF
-                        for j in reversed(range(image.size[1]))
-                        for i in range(image.size[0])
-                    ]
-                )
-            elif bitSize == "G_IM_SIZ_8b":
-                fImage.data = bytearray(
-                    [
-                        int(
-                            round(
-                                colorToLuminance(
-                                    pixels[
-                                        (j * image.size[0] + i)
-                                        * image.channels : (j * image.size[0] + i)
-                                        * image.channels
-                                        + 3
-                                    ]
-                                )
-                                * 0xFF
-                            )
-                        )
-                        & 0xFF
-                        for j in reversed(range(image.size[1]))
-                        for i in range(image.size[0])
-                    ]
-                )
-            else:
-                raise PluginError("Invalid combo: " + fmt + ", " + bitSize)
+        cache = getTextureCache()
+        cacheKey = cache.getKey(pixels, texFormat, "NONE") if cache is not None else None
+        cachedData = cache.load(cacheKey, 1) if cache is not None else None
+        if cachedData is not None:
+            printExport(f"Using cached texture data for {filename}")
+            fImage.data = bytearray(cachedData[0])
         else:
-            raise PluginError("Invalid image format " + fmt)
+            printExport(f"Converting texture data for {filename}")
+            # The data is only read when writing the texture, so other textures can be converted in the meantime.
+            onResult = (lambda data: cache.store(cacheKey, [data])) if cache is not None else None
+            fImage.pendingData = getExportWorkerPool().submit(getImageEncoder(fmt, bitSize), (pixels,), onResult)
 
-        # We stored 4bit values in byte arrays, now to convert
-        if bitSize == "G_IM_SIZ_4b":
-            fImage.data = compactNibbleArray(fImage.data, image.size[0], image.size[1])
-
-    print("Finished converting.")
+    printExport("Finished converting.")
     fModel.addTexture((image, (texFormat, "NONE")), fImage, fMaterial)
+    if contentKey is not None:
+        fModel.textureContentKeys[contentKey] = imageKey
 
     return fImage
 
@@ -2921,6 +3335,7 @@ class F3D_ExportDL(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         if context.mode != "OBJECT":
             bpy.ops.object.mode_set(mode="OBJECT")
@@ -3014,6 +3429,8 @@ class F3D_ExportDLPanel(bpy.types.Panel):
 f3d_writer_classes = (
     F3D_ExportDL,
     F3D_ExportDLPanel,
+    F3D_ClearTextureCache,
+    F3D_ClearMeshCache,
 )
 
 
@@ -3025,6 +3442,8 @@ def f3d_writer_register():
 
 
 def f3d_writer_unregister():
+    exportWorkerPool.shutdown()
+
     for cls in reversed(f3d_writer_classes):
         unregister_class(cls)
 
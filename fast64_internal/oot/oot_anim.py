@@ -2,7 +2,17 @@ import math, mathutils, bpy, os, re
 from ..panels import OOT_Panel
 from bpy.utils import register_class, unregister_class
 from .oot_skeleton import ootConvertArmatureToSkeletonWithoutMesh
-from ..utility import CData, PluginError, toAlnum, writeCData, readFile, hexOrDecInt, raisePluginError, prop_split
+from ..utility import (
+    CData,
+    PluginError,
+    toAlnum,
+    writeCData,
+    readFile,
+    hexOrDecInt,
+    raisePluginError,
+    prop_split,
+    profileExport,
+)
 
 from .oot_utility import (
     checkForStartBone,
@@ -760,6 +770,7 @@ class OOT_ExportAnim(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         try:
             if len(context.selected_objects) == 0 or not isinstance(
@@ -11,9 +11,13 @@ from ..utility import (
     hideObjsInList,
     writeCData,
     raisePluginError,
+    profileStage,
+    profileExport,
 )
+from ..utility_collision import CollisionVertexWelder
 
 from .oot_collision_classes import (
+    OOT_COLLISION_MAX_INDEX,
     OOTCollisionVertex,
     OOTCollisionPolygon,
     OOTCollision,
@@ -193,18 +197,12 @@ def exportCollisionCommon(collision, obj, transformMatrix, includeChildren, name
     collisionDict = {}
 
     addCollisionTriangles(obj, collisionDict, includeChildren, transformMatrix, collision.bounds)
+    welder = CollisionVertexWelder(collision.ownerName, collision.vertices, OOTCollisionVertex, OOT_COLLISION_MAX_INDEX)
     for polygonType, faces in collisionDict.items():
         collision.polygonGroups[polygonType] = []
         for (faceVerts, normal, distance) in faces:
             assert len(faceVerts) == 3
-            indices = []
-            for roundedPosition in faceVerts:
-                index = collisionVertIndex(roundedPosition, collision.vertices)
-                if index is None:
-                    collision.vertices.append(OOTCollisionVertex(roundedPosition))
-                    indices.append(len(collision.vertices) - 1)
-                else:
-                    indices.append(index)
+            indices = welder.getIndices(faceVerts)
             assert len(indices) == 3
 
             # We need to ensure two things about the order in which the vertex indices are:
@@ -232,6 +230,7 @@ def exportCollisionCommon(collision, obj, transformMatrix, includeChildren, name
                 indices[1], indices[2] = indices[2], indices[1]
 
             collision.polygonGroups[polygonType].append(OOTCollisionPolygon(indices, normal, distance))
+    welder.finish()
 
 
 def exportCollisionToC(originalObj, transformMatrix, includeChildren, name, isCustomExport, folderName, exportPath):
@@ -287,6 +286,7 @@ def updateBounds(position, bounds):
             maxBounds[i] = position[i]
 
 
+@profileStage("collision")
 def addCollisionTriangles(obj, collisionDict, includeChildren, transformMatrix, bounds):
     if isinstance(obj.data, bpy.types.Mesh) and not obj.ignore_collision:
         if len(obj.data.materials) == 0:
@@ -339,14 +339,6 @@ def roundPosition(position):
     return (int(round(position[0])), int(round(position[1])), int(round(position[2])))
 
 
-def collisionVertIndex(vert, vertArray):
-    for i in range(len(vertArray)):
-        colVert = vertArray[i]
-        if colVert.position == vert:
-            return i
-    return None
-
-
 def ootCollisionVertexToC(vertex):
     return "{ " + str(vertex.position[0]) + ", " + str(vertex.position[1]) + ", " + str(vertex.position[2]) + " },\n"
 
@@ -568,6 +560,7 @@ class OOT_ExportCollision(bpy.types.Operator):
     bl_label = "Export Collision"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         obj = None
         if context.mode != "OBJECT":
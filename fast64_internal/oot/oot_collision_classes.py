@@ -205,6 +205,10 @@ decomp_compat_map_CameraSType = {
 }
 
 
+# Polygons store vertex indices in the low 13 bits, the high 3 bits are flags.
+OOT_COLLISION_MAX_INDEX = 0x1FFF
+
+
 class OOTCollisionVertex:
     def __init__(self, position):
         self.position = position
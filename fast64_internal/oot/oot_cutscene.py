@@ -1,7 +1,7 @@
 import os, bpy
 from bpy.utils import register_class, unregister_class
 from ..panels import OOT_Panel
-from ..utility import PluginError, CData, prop_split, writeCData, raisePluginError
+from ..utility import PluginError, CData, prop_split, writeCData, raisePluginError, profileExport
 from .oot_utility import OOTCollectionAdd, drawCollectionOps, getCollection, getCutsceneName, getCustomProperty
 
 from .oot_constants import (
@@ -592,6 +592,7 @@ class OOT_ExportCutscene(bpy.types.Operator):
     bl_label = "Export Cutscene"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         try:
             if context.mode != "OBJECT":
@@ -618,6 +619,7 @@ class OOT_ExportAllCutscenes(bpy.types.Operator):
     bl_label = "Export All Cutscenes"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         try:
             if context.mode != "OBJECT":
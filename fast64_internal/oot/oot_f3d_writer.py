@@ -4,6 +4,7 @@ from ..panels import OOT_Panel
 from ..utility import (
     PluginError,
     CData,
+    CDataStream,
     prop_split,
     writeCData,
     raisePluginError,
@@ -11,6 +12,8 @@ from ..utility import (
     toAlnum,
     readFile,
     writeFile,
+    profileExport,
+    printExport,
 )
 from ..f3d.f3d_parser import importMeshC, ootEnumDrawLayers, getImportData
 from ..f3d.f3d_gbi import DLFormat, TextureExportSettings, ScrollMethod, F3D
@@ -24,6 +27,7 @@ from ..f3d.f3d_writer import (
     saveOrGetF3DMaterial,
     saveMeshWithLargeTexturesByFaces,
     saveMeshByFaces,
+    getMaterialDrawOrder,
 )
 
 from .oot_utility import (
@@ -114,7 +118,7 @@ def ootProcessVertexGroup(
     ]
 
     if len(vertIndices) == 0:
-        print("No vert indices in " + vertexGroup)
+        printExport("No vert indices in " + vertexGroup)
         return None, False, lastMaterialName
 
     bone = armatureObj.data.bones[vertexGroup]
@@ -159,7 +163,7 @@ def ootProcessVertexGroup(
             handledFaces.append(face)
 
     if len(groupFaces) == 0:
-        print("No faces in " + vertexGroup)
+        printExport("No faces in " + vertexGroup)
 
         # OOT will only allocate matrix if DL exists.
         # This doesn't handle case where vertices belong to a limb, but not triangles.
@@ -196,6 +200,19 @@ def ootProcessVertexGroup(
         material = mat.material
         fMaterial, texDimensions = saveOrGetF3DMaterial(material, fModel, meshObj, drawLayerOverride, convertTextureData)
 
+    if bpy.context.scene.fast64.settings.optimize_material_order:
+        # Order materials by the cost of switching between them, starting from the currently loaded material.
+        groupItems = list(groupFaces.items())
+        order = getMaterialDrawOrder(
+            [meshObj.material_slots[material_index].material for material_index, faces in groupItems],
+            fModel,
+            meshObj,
+            drawLayerOverride,
+            convertTextureData,
+            lastMaterialName,
+        )
+        groupFaces = dict(groupItems[index] for index in order)
+
     for material_index, faces in groupFaces.items():
         matLen = len(meshObj.material_slots)
         material = meshObj.material_slots[material_index].material
@@ -286,26 +303,24 @@ def ootConvertMeshToC(
         ootCleanupScene(originalObj, allObjs)
         raise Exception(str(e))
 
-    data = CData()
-    data.source += '#include "ultra64.h"\n#include "global.h"\n'
-    if not isCustomExport:
-        data.source += '#include "' + folderName + '.h"\n\n'
-    else:
-        data.source += "\n"
-
-    path = ootGetPath(exportPath, isCustomExport, "assets/objects/", folderName, False, True)
-    includeDir = settings.customAssetIncludeDir if settings.isCustom else f"assets/objects/{folderName}"
-    exportData = fModel.to_c(
-        TextureExportSettings(False, saveTextures, includeDir, path), OOTGfxFormatter(ScrollMethod.Vertex)
-    )
+    with CDataStream() as data:
+        data.writeSource('#include "ultra64.h"\n#include "global.h"\n')
+        if not isCustomExport:
+            data.writeSource('#include "' + folderName + '.h"\n\n')
+        else:
+            data.writeSource("\n")
 
-    data.append(exportData.all())
+        path = ootGetPath(exportPath, isCustomExport, "assets/objects/", folderName, False, True)
+        includeDir = settings.customAssetIncludeDir if settings.isCustom else f"assets/objects/{folderName}"
+        fModel.to_c_stream(
+            data, TextureExportSettings(False, saveTextures, includeDir, path), OOTGfxFormatter(ScrollMethod.Vertex)
+        )
 
-    if isCustomExport:
-        textureArrayData = writeTextureArraysNew(fModel, flipbookArrayIndex2D)
-        data.append(textureArrayData)
+        if isCustomExport:
+            textureArrayData = writeTextureArraysNew(fModel, flipbookArrayIndex2D)
+            data.append(textureArrayData)
 
-    writeCData(data, os.path.join(path, name + ".h"), os.path.join(path, name + ".c"))
+        writeCData(data, os.path.join(path, name + ".h"), os.path.join(path, name + ".c"))
 
     if not isCustomExport:
         writeTextureArraysExisting(bpy.context.scene.ootDecompPath, overlayName, False, flipbookArrayIndex2D, fModel)
@@ -567,6 +582,7 @@ class OOT_ExportDL(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         obj = None
         if context.mode != "OBJECT":
@@ -31,6 +31,9 @@ from ..utility import (
     checkObjectReference,
     writeCDataSourceOnly,
     writeCDataHeaderOnly,
+    fileSink,
+    printExport,
+    profileExport,
 )
 
 from .c_writer.oot_scene_bootup import (
@@ -137,6 +140,7 @@ def ootExportSceneToC(
 
     levelPath = ootGetPath(exportPath, isCustomExport, exportSubdir, sceneName, True, True)
     levelC = ootLevelToC(scene, TextureExportSettings(False, savePNG, exportSubdir + sceneName, levelPath))
+    fileCounts = fileSink.getCounts()
 
     if bpy.context.scene.ootSceneSingleFile:
         writeCDataSourceOnly(
@@ -188,6 +192,7 @@ def ootExportSceneToC(
 
     # Export the scene .h file
     writeCDataHeaderOnly(ootCreateSceneHeader(levelC), os.path.join(levelPath, scene.sceneName() + ".h"))
+    printExport(f"Scene {sceneName}: {fileSink.getReport(fileCounts)}", "NORMAL")
 
     if not isCustomExport:
         writeOtherSceneProperties(scene, exportInfo, levelC)
@@ -652,6 +657,7 @@ class OOT_ExportScene(bpy.types.Operator):
     bl_label = "Export Scene"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         activeObj = None
         try:
@@ -200,6 +200,14 @@ class OOTModel(FModel):
         # print("Processing flipbook...")
         flipbook = TextureFlipbook(flipbookProp.name, flipbookProp.exportMode, [])
         sharedPalette = FSharedPalette(self.name + "_" + flipbookProp.textures[0].image.name + "_pal")
+        if bpy.context.scene.fast64.settings.quantize_ci_textures and all(
+            flipbookTexture.image is not None for flipbookTexture in flipbookProp.textures
+        ):
+            sharedPalette.quantize(
+                [flipbookTexture.image for flipbookTexture in flipbookProp.textures],
+                texProp.tex_format,
+                texProp.ci_format,
+            )
         existingFPalette = None
         fImages = []
         for flipbookTexture in flipbookProp.textures:
@@ -18,6 +18,7 @@ from ..f3d.f3d_material import ootEnumDrawLayers
 from ..utility import (
     PluginError,
     CData,
+    CDataStream,
     getDeclaration,
     hexOrDecInt,
     applyRotation,
@@ -34,6 +35,7 @@ from ..utility import (
     attemptModifierApply,
     cleanupDuplicatedObjects,
     VertexWeightError,
+    profileExport,
 )
 
 from .oot_utility import (
@@ -846,28 +848,25 @@ def ootConvertArmatureToC(
             limbList[i].lodDL = lodLimbList[i].DL
             limbList[i].isFlex |= lodLimbList[i].isFlex
 
-    data = CData()
-    data.source += '#include "ultra64.h"\n#include "global.h"\n'
-    if not isCustomExport:
-        data.source += '#include "' + folderName + '.h"\n\n'
-    else:
-        data.source += "\n"
-
-    path = ootGetPath(exportPath, isCustomExport, "assets/objects/", folderName, False, True)
-    includeDir = settings.customAssetIncludeDir if settings.isCustom else f"assets/objects/{folderName}"
-    exportData = fModel.to_c(
-        TextureExportSettings(False, savePNG, includeDir, path), OOTGfxFormatter(ScrollMethod.Vertex)
-    )
-    skeletonC = skeleton.toC()
+    with CDataStream() as data:
+        data.writeSource('#include "ultra64.h"\n#include "global.h"\n')
+        if not isCustomExport:
+            data.writeSource('#include "' + folderName + '.h"\n\n')
+        else:
+            data.writeSource("\n")
 
-    data.append(exportData.all())
-    data.append(skeletonC)
+        path = ootGetPath(exportPath, isCustomExport, "assets/objects/", folderName, False, True)
+        includeDir = settings.customAssetIncludeDir if settings.isCustom else f"assets/objects/{folderName}"
+        fModel.to_c_stream(
+            data, TextureExportSettings(False, savePNG, includeDir, path), OOTGfxFormatter(ScrollMethod.Vertex)
+        )
+        data.append(skeleton.toC())
 
-    if isCustomExport:
-        textureArrayData = writeTextureArraysNew(fModel, flipbookArrayIndex2D)
-        data.append(textureArrayData)
+        if isCustomExport:
+            textureArrayData = writeTextureArraysNew(fModel, flipbookArrayIndex2D)
+            data.append(textureArrayData)
 
-    writeCData(data, os.path.join(path, skeletonName + ".h"), os.path.join(path, skeletonName + ".c"))
+        writeCData(data, os.path.join(path, skeletonName + ".h"), os.path.join(path, skeletonName + ".c"))
 
     if not isCustomExport:
         writeTextureArraysExisting(bpy.context.scene.ootDecompPath, overlayName, isLink, flipbookArrayIndex2D, fModel)
@@ -1291,6 +1290,7 @@ class OOT_ExportSkeleton(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         armatureObj = None
         if context.mode != "OBJECT":
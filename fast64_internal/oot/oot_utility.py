@@ -1,4 +1,4 @@
-import bpy, math, os, re
+import bpy, math, mathutils, os, re
 from bpy.utils import register_class, unregister_class
 from ..utility import (
     PluginError,
@@ -10,6 +10,13 @@ from ..utility import (
     applyRotation,
     cleanupDuplicatedObjects,
     ootGetSceneOrRoomHeader,
+    useEvaluatedExport,
+    isSelectableForExport,
+    copyEvaluatedObject,
+    setEvaluatedTransform,
+    getEvaluatedParent,
+    transform_mtx_blender_to_n64,
+    profileStage,
 )
 
 # default indentation to use when writing to decomp files
@@ -224,8 +231,27 @@ class OOTObjectCategorizer:
                 self.meshes.append(obj)
 
 
+# Constraints that make ootDuplicateHierarchy keep an object relative to its parent, see below.
+ootParentConstraintTypes = {
+    "COPY_LOCATION",
+    "COPY_ROTATION",
+    "COPY_SCALE",
+    "COPY_TRANSFORMS",
+    "TRANSFORM",
+    "CHILD_OF",
+    "CLAMP_TO",
+    "DAMPED_TRACK",
+    "LOCKED_TRACK",
+    "TRACK_TO",
+}
+
+
 # This also sets all origins relative to the scene object.
+@profileStage("object duplication")
 def ootDuplicateHierarchy(obj, ignoreAttr, includeEmpties, objectCategorizer):
+    if useEvaluatedExport():
+        return ootEvaluatedDuplicateHierarchy(obj, ignoreAttr, includeEmpties, objectCategorizer)
+
     # Duplicate objects to apply scale / modifiers / linked data
     bpy.ops.object.select_all(action="DESELECT")
     ootSelectMeshChildrenOnly(obj, includeEmpties)
@@ -271,22 +297,7 @@ def ootDuplicateHierarchy(obj, ignoreAttr, includeEmpties, objectCategorizer):
         # doing transform_apply() sets up this transformation.
         hasConstraint = False
         for constraint in tempObj.constraints:
-            if (
-                constraint.type
-                in {
-                    "COPY_LOCATION",
-                    "COPY_ROTATION",
-                    "COPY_SCALE",
-                    "COPY_TRANSFORMS",
-                    "TRANSFORM",
-                    "CHILD_OF",
-                    "CLAMP_TO",
-                    "DAMPED_TRACK",
-                    "LOCKED_TRACK",
-                    "TRACK_TO",
-                }
-                and not constraint.mute
-            ):
+            if constraint.type in ootParentConstraintTypes and not constraint.mute:
                 hasConstraint = True
                 tempObj.constraints.remove(constraint)
         if not hasConstraint:
@@ -310,16 +321,81 @@ def ootDuplicateHierarchy(obj, ignoreAttr, includeEmpties, objectCategorizer):
         raise Exception(str(e))
 
 
-def ootSelectMeshChildrenOnly(obj, includeEmpties):
+def ootEvaluatedDuplicateHierarchy(obj, ignoreAttr, includeEmpties, objectCategorizer):
+    """
+    Same result as ootDuplicateHierarchy, without using operators or modifying the scene.
+    Meshes are read from the evaluated depsgraph and moved to the origin of obj in memory,
+    then the hierarchy is rotated into the game's coordinate system around obj, like applyRotation does.
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    objs = [obj]
+    for child in ootYieldMeshChildrenOnly(obj, includeEmpties):
+        child.original_name = child.name
+        if child != obj and isSelectableForExport(child):
+            objs.append(child)
+
+    origin = mathutils.Matrix.Translation(obj.location)
+    hasConstraint = any(
+        constraint.type in ootParentConstraintTypes and not constraint.mute for constraint in obj.constraints
+    )
+    if hasConstraint:
+        # Only the transform relative to the parent is kept, see ootDuplicateHierarchy.
+        rotation = mathutils.Matrix.Identity(4)
+    else:
+        rotation = origin @ transform_mtx_blender_to_n64() @ origin.inverted()
+
+    copies = {}
+    allObjs = []
+    try:
+        # objs has parents before children, so parent copies are always transformed first
+        for original in objs:
+            evaluatedWorld = original.evaluated_get(depsgraph).matrix_world
+            if original == obj and hasConstraint:
+                worldMatrix = mathutils.Matrix.Identity(4)
+                meshMatrix = original.matrix_basis
+            else:
+                if original == obj:
+                    worldMatrix = origin
+                elif isinstance(original.data, bpy.types.Mesh):
+                    worldMatrix = rotation @ origin
+                else:
+                    worldMatrix = rotation @ evaluatedWorld
+                meshMatrix = worldMatrix.inverted_safe() @ rotation @ evaluatedWorld
+
+            objCopy = copyEvaluatedObject(original, depsgraph, meshMatrix)
+            allObjs.append(objCopy)
+            copies[original] = objCopy
+            setEvaluatedTransform(objCopy, getEvaluatedParent(original, copies, ignoreAttr), worldMatrix)
+
+        if hasConstraint:
+            objCopy = copies[obj]
+            for constraint in list(objCopy.constraints):
+                if constraint.type in ootParentConstraintTypes and not constraint.mute:
+                    objCopy.constraints.remove(constraint)
+    except Exception:
+        cleanupDuplicatedObjects(allObjs)
+        raise
+
+    objectCategorizer.sortObjects(allObjs)
+    return copies[obj], allObjs
+
+
+def ootYieldMeshChildrenOnly(obj, includeEmpties):
+    """Yields the objects selected by ootSelectMeshChildrenOnly, parents before children."""
     isMesh = isinstance(obj.data, bpy.types.Mesh)
     isEmpty = (
         obj.data is None or isinstance(obj.data, bpy.types.Camera) or isinstance(obj.data, bpy.types.Curve)
     ) and includeEmpties
     if isMesh or isEmpty:
-        obj.select_set(True)
-        obj.original_name = obj.name
+        yield obj
     for child in obj.children:
-        ootSelectMeshChildrenOnly(child, includeEmpties)
+        yield from ootYieldMeshChildrenOnly(child, includeEmpties)
+
+
+def ootSelectMeshChildrenOnly(obj, includeEmpties):
+    for child in ootYieldMeshChildrenOnly(obj, includeEmpties):
+        child.select_set(True)
+        child.original_name = child.name
 
 
 def ootCleanupScene(originalSceneObj, allObjs):
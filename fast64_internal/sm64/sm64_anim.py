@@ -674,6 +674,7 @@ class SM64_ExportAnimMario(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         romfileOutput = None
         tempROM = None
@@ -7,6 +7,10 @@ import bpy, shutil, os, math
 from io import BytesIO
 from ..utility import *
 from ..panels import SM64_Panel
+from ..utility_collision import CollisionVertexWelder
+
+# Surfaces are loaded with signed 16 bit vertex indices.
+SM64_COLLISION_MAX_INDEX = 0x7FFF
 
 
 class CollisionVertex:
@@ -87,7 +91,7 @@ class Collision:
     def set_addr(self, startAddress):
         startAddress = get64bitAlignedAddr(startAddress)
         self.startAddress = startAddress
-        print("Collision " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
+        printExport("Collision " + self.name + ": " + str(startAddress) + ", " + str(self.size()))
         return startAddress, startAddress + self.size()
 
     def save_binary(self, romfile):
@@ -99,27 +103,26 @@ class Collision:
 
     def to_c(self):
         data = CData()
-        data.header = "extern const Collision " + self.name + "[];\n"
-        data.source = "const Collision " + self.name + "[] = {\n"
-        data.source += "\tCOL_INIT(),\n"
-        data.source += "\tCOL_VERTEX_INIT(" + str(len(self.vertices)) + "),\n"
-        for vertex in self.vertices:
-            data.source += "\t" + vertex.to_c()
+        self.to_c_stream(data)
+        return data
+
+    def to_c_stream(self, fp):
+        fp.writeHeader("extern const Collision " + self.name + "[];\n")
+        fp.writeSource("const Collision " + self.name + "[] = {\n")
+        fp.writeSource("\tCOL_INIT(),\n")
+        fp.writeSource("\tCOL_VERTEX_INIT(" + str(len(self.vertices)) + "),\n")
+        fp.writeSource("".join(["\t" + vertex.to_c() for vertex in self.vertices]))
         for collisionType, triangles in self.triangles.items():
-            data.source += "\tCOL_TRI_INIT(" + collisionType + ", " + str(len(triangles)) + "),\n"
-            for triangle in triangles:
-                data.source += "\t" + triangle.to_c()
-        data.source += "\tCOL_TRI_STOP(),\n"
+            fp.writeSource("\tCOL_TRI_INIT(" + collisionType + ", " + str(len(triangles)) + "),\n")
+            fp.writeSource("".join(["\t" + triangle.to_c() for triangle in triangles]))
+        fp.writeSource("\tCOL_TRI_STOP(),\n")
         if len(self.specials) > 0:
-            data.source += "\tCOL_SPECIAL_INIT(" + str(len(self.specials)) + "),\n"
-            for special in self.specials:
-                data.source += "\t" + special.to_c()
+            fp.writeSource("\tCOL_SPECIAL_INIT(" + str(len(self.specials)) + "),\n")
+            fp.writeSource("".join(["\t" + special.to_c() for special in self.specials]))
         if len(self.water_boxes) > 0:
-            data.source += "\tCOL_WATER_BOX_INIT(" + str(len(self.water_boxes)) + "),\n"
-            for waterBox in self.water_boxes:
-                data.source += "\t" + waterBox.to_c()
-        data.source += "\tCOL_END()\n" + "};\n"
-        return data
+            fp.writeSource("\tCOL_WATER_BOX_INIT(" + str(len(self.water_boxes)) + "),\n")
+            fp.writeSource("".join(["\t" + waterBox.to_c() for waterBox in self.water_boxes]))
+        fp.writeSource("\tCOL_END()\n" + "};\n")
 
     def rooms_name(self):
         return self.name + "_rooms"
@@ -279,25 +282,19 @@ def exportCollisionC(
 
     colPath = os.path.join(colDirPath, "collision.inc.c")
 
-    fileObj = open(colPath, "w", newline="\n")
     collision = exportCollisionCommon(obj, transformMatrix, includeSpecials, includeChildren, name, None)
-    collisionC = collision.to_c()
-    fileObj.write(collisionC.source)
-    fileObj.close()
-
-    cDefine = collisionC.header
+    with CDataStream() as collisionC:
+        collision.to_c_stream(collisionC)
+        writeCDataSourceOnly(collisionC, colPath)
+        cDefine = collisionC.header
     if writeRoomsFile:
         roomsData = collision.to_c_rooms()
         cDefine += roomsData.header
         roomsPath = os.path.join(colDirPath, "rooms.inc.c")
-        roomsFile = open(roomsPath, "w", newline="\n")
-        roomsFile.write(roomsData.source)
-        roomsFile.close()
+        writeFile(roomsPath, roomsData.source)
 
     headerPath = os.path.join(colDirPath, "collision_header.h")
-    cDefFile = open(headerPath, "w", newline="\n")
-    cDefFile.write(cDefine)
-    cDefFile.close()
+    writeFile(headerPath, cDefine)
 
     if not customExport:
         if headerType == "Actor":
@@ -367,18 +364,13 @@ def exportCollisionCommon(obj, transformMatrix, includeSpecials, includeChildren
         raise Exception(str(e))
 
     collision = Collision(toAlnum(name) + "_collision")
+    welder = CollisionVertexWelder(collision.name, collision.vertices, CollisionVertex, SM64_COLLISION_MAX_INDEX)
     for collisionType, faces in collisionDict.items():
         collision.triangles[collisionType] = []
         for (faceVerts, specialParam, room) in faces:
-            indices = []
-            for roundedPosition in faceVerts:
-                index = collisionVertIndex(roundedPosition, collision.vertices)
-                if index is None:
-                    collision.vertices.append(CollisionVertex(roundedPosition))
-                    indices.append(len(collision.vertices) - 1)
-                else:
-                    indices.append(index)
+            indices = welder.getIndices(faceVerts)
             collision.triangles[collisionType].append(CollisionTriangle(indices, specialParam, room))
+    welder.finish()
     if includeSpecials:
         area = SM64_Area(areaIndex, "", "", "", None, None, [], name, None)
         # This assumes that only levels will export with included specials,
@@ -390,6 +382,7 @@ def exportCollisionCommon(obj, transformMatrix, includeSpecials, includeChildren
     return collision
 
 
+@profileStage("collision")
 def addCollisionTriangles(obj, collisionDict, includeChildren, transformMatrix, areaIndex):
     if isinstance(obj.data, bpy.types.Mesh) and not obj.ignore_collision:
         if len(obj.data.materials) == 0:
@@ -430,14 +423,6 @@ def roundPosition(position):
     return (int(round(position[0])), int(round(position[1])), int(round(position[2])))
 
 
-def collisionVertIndex(vert, vertArray):
-    for i in range(len(vertArray)):
-        colVert = vertArray[i]
-        if colVert.position == vert:
-            return i
-    return None
-
-
 class CollisionSettings:
     def __init__(self):
         self.collision_type = "SURFACE_DEFAULT"
@@ -470,6 +455,7 @@ class SM64_ExportCollision(bpy.types.Operator):
     bl_label = "Export Collision"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         romfileOutput = None
         tempROM = None
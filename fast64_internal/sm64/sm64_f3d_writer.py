@@ -555,6 +555,7 @@ class SM64_ExportDL(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         romfileOutput = None
         tempROM = None
@@ -776,6 +777,7 @@ class ExportTexRectDraw(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         try:
             if context.scene.texrect.tex is None:
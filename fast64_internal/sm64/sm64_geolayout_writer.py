@@ -457,6 +457,7 @@ def saveGeolayoutC(
     DLFormat,
 ):
     dirPath, texDir = getExportDir(customExport, exportDir, headerType, levelName, texDir, dirName)
+    fileCounts = fileSink.getCounts()
 
     dirName = toAlnum(dirName)
     groupName = toAlnum(groupName)
@@ -475,14 +476,6 @@ def saveGeolayoutC(
         texExportPath = dirPath
     else:
         texExportPath = geoDirPath
-    exportData = fModel.to_c(TextureExportSettings(texSeparate, savePNG, texDir, texExportPath), gfxFormatter)
-    staticData = exportData.staticData
-    dynamicData = exportData.dynamicData
-    texC = exportData.textureData
-
-    scrollData, hasScrolling = fModel.to_c_vertex_scroll(scrollName, gfxFormatter)
-    scroll_data = scrollData.source
-    cDefineScroll = scrollData.header
     geolayoutGraph.startGeolayout.name = geoName
 
     # Handle cases where geolayout name != folder name + _geo
@@ -535,47 +528,53 @@ def saveGeolayoutC(
         matHInclude = '#include "levels/' + levelName + "/" + dirName + '/material.inc.h"'
         headerInclude = '#include "levels/' + levelName + "/" + dirName + '/geo_header.h"'
 
-    modifyTexScrollFiles(exportDir, geoDirPath, cDefineScroll, scroll_data, hasScrolling)
-
-    if DLFormat == DLFormat.Static:
-        staticData.source += "\n" + dynamicData.source
-        staticData.header = geoData.header + staticData.header + dynamicData.header
-    else:
-        geoData.source = writeMaterialFiles(
-            exportDir,
-            geoDirPath,
-            headerInclude,
-            matHInclude,
-            dynamicData.header,
-            dynamicData.source,
-            geoData.source,
-            customExport,
+    # Model data is streamed to the exported files, since it can be too large to keep in memory.
+    with CDataStream() as staticData, CDataStream() as dynamicData, CDataStream() as texC:
+        fModel.to_c_parts(
+            TextureExportSettings(texSeparate, savePNG, texDir, texExportPath),
+            gfxFormatter,
+            staticData,
+            dynamicData,
+            texC,
         )
 
-    modelPath = os.path.join(geoDirPath, "model.inc.c")
-    modelFile = open(modelPath, "w", newline="\n")
-    modelFile.write(staticData.source)
-    modelFile.close()
+        scrollData, hasScrolling = fModel.to_c_vertex_scroll(scrollName, gfxFormatter)
+        cDefineScroll = scrollData.header
+        modifyTexScrollFiles(exportDir, geoDirPath, cDefineScroll, scrollData.source, hasScrolling)
+
+        if DLFormat == DLFormat.Static:
+            staticData.writeSource("\n")
+            staticData.append(dynamicData)
+            headerText = geoData.header + staticData.header
+        else:
+            geoData.source = writeMaterialFiles(
+                exportDir,
+                geoDirPath,
+                headerInclude,
+                matHInclude,
+                dynamicData.header,
+                dynamicData.source,
+                geoData.source,
+                customExport,
+            )
+            headerText = staticData.header
 
-    if texSeparate:
-        texPath = os.path.join(geoDirPath, "texture.inc.c")
-        texFile = open(texPath, "w", newline="\n")
-        texFile.write(texC.source)
-        texFile.close()
+        modelPath = os.path.join(geoDirPath, "model.inc.c")
+        writeCDataSourceOnly(staticData, modelPath)
+
+        if texSeparate:
+            texPath = os.path.join(geoDirPath, "texture.inc.c")
+            writeCDataSourceOnly(texC, texPath)
 
     fModel.freePalettes()
 
     # save geolayout
     geoPath = os.path.join(geoDirPath, "geo.inc.c")
-    geoFile = open(geoPath, "w", newline="\n")
-    geoFile.write(geoData.source)
-    geoFile.close()
+    writeFile(geoPath, geoData.source)
 
     # save header
     headerPath = os.path.join(geoDirPath, "geo_header.h")
-    cDefFile = open(headerPath, "w", newline="\n")
-    cDefFile.write(staticData.header)
-    cDefFile.close()
+    writeFile(headerPath, headerText)
 
     fileStatus = None
     if not customExport:
@@ -672,7 +671,8 @@ def saveGeolayoutC(
         if DLFormat != DLFormat.Static:  # Change this
             writeMaterialHeaders(exportDir, matCInclude, matHInclude)
 
-    return staticData.header, fileStatus
+    printExport(f"Geolayout {geoName}: {fileSink.getReport(fileCounts)}", "NORMAL")
+    return headerText, fileStatus
 
 
 # Insertable Binary
@@ -1672,7 +1672,7 @@ def processBone(
             for drawLayer, fMesh in fMeshes.items():
                 drawLayer = int(drawLayer)  # IMPORTANT, otherwise 1 and '1' will be considered separate keys
                 if node.DLmicrocode is not None:
-                    print("Adding additional node from layer " + str(drawLayer))
+                    printExport("Adding additional node from layer " + str(drawLayer))
                     additionalNode = (
                         DisplayListNode(drawLayer)
                         if not isinstance(node, BillboardNode)
@@ -1683,7 +1683,7 @@ def processBone(
                     additionalTransformNode = TransformNode(additionalNode)
                     additionalNodes.append(additionalTransformNode)
                 else:
-                    print("Adding node from layer " + str(drawLayer))
+                    printExport("Adding node from layer " + str(drawLayer))
                     # Setting drawLayer on construction is useless?
                     node.drawLayer = drawLayer
                     node.DLmicrocode = fMesh.draw
@@ -1702,7 +1702,7 @@ def processBone(
                 )
 
             for drawLayer, fSkinnedMesh in fSkinnedMeshes.items():
-                print("Adding skinned mesh node.")
+                printExport("Adding skinned mesh node.")
                 transformNode = addSkinnedMeshNode(
                     armatureObj, boneName, fSkinnedMesh, transformNode, parentTransformNode, int(drawLayer)
                 )
@@ -2168,7 +2168,7 @@ def saveModelGivenVertexGroup(
     parentGroupIndex = getGroupIndexFromname(obj, parentGroup) if parentGroup is not None else -1
 
     if len(vertIndices) == 0:
-        print("No vert indices in " + vertexGroup)
+        printExport("No vert indices in " + vertexGroup)
         return None, None, None
 
     transformMatrix = mathutils.Matrix.Scale(bpy.context.scene.blenderToSM64Scale, 4)
@@ -2247,7 +2247,7 @@ def saveModelGivenVertexGroup(
                 )
 
     if len(groupFaces) == 0 and len(skinnedFaces) == 0:
-        print("No faces in " + vertexGroup)
+        printExport("No faces in " + vertexGroup)
         return None, None, usedDrawLayers
 
     # Save skinned mesh
@@ -2586,19 +2586,18 @@ def saveSkinnedMeshByMaterial(
         )
         curIndex += len(vertData)
 
-        for bufferVert in vertData:
-            skinnedTriGroup.vertexList.vertices.append(
-                convertVertexData(
-                    obj.data,
-                    bufferVert.f3dVert.position,
-                    bufferVert.f3dVert.uv,
-                    bufferVert.f3dVert.getColorOrNormal(),
-                    texDimensions,
-                    parentMatrix,
-                    isPointSampled,
-                    exportVertexColors,
-                )
+        skinnedTriGroup.vertexList.vertices.extend(
+            convertVertexDataBatch(
+                [bufferVert.f3dVert.position for bufferVert in vertData],
+                [bufferVert.f3dVert.uv for bufferVert in vertData],
+                [bufferVert.f3dVert.getColorOrNormal() for bufferVert in vertData],
+                texDimensions,
+                parentMatrix,
+                None if exportVertexColors else parentMatrix.inverted().transposed(),
+                isPointSampled,
+                exportVertexColors,
             )
+        )
 
         skinnedTriGroup.triList.commands.append(SPEndDisplayList())
         if fMaterial.revert is not None:
@@ -2702,6 +2701,7 @@ class SM64_ExportGeolayoutObject(ObjectDataExporter):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         romfileOutput = None
         tempROM = None
@@ -2887,6 +2887,7 @@ class SM64_ExportGeolayoutArmature(bpy.types.Operator):
 
     # Called on demand (i.e. button press, menu item)
     # Can also be called from operator search menu (Spacebar)
+    @profileExport
     def execute(self, context):
         romfileOutput = None
         tempROM = None
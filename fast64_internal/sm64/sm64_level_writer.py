@@ -651,6 +651,7 @@ def exportLevelC(
 ):
 
     fileStatus = SM64OptionalFileStatus()
+    fileCounts = fileSink.getCounts()
 
     if customExport:
         levelDir = os.path.join(exportDir, levelName)
@@ -727,9 +728,7 @@ def exportLevelC(
         geolayoutGraphC = geolayoutGraph.to_c()
 
         # Write geolayout
-        geoFile = open(os.path.join(areaDir, "geo.inc.c"), "w", newline="\n")
-        geoFile.write(geolayoutGraphC.source)
-        geoFile.close()
+        writeFile(os.path.join(areaDir, "geo.inc.c"), geolayoutGraphC.source)
         geoString += '#include "levels/' + levelName + "/" + areaName + '/geo.inc.c"\n'
         headerString += geolayoutGraphC.header
 
@@ -738,18 +737,14 @@ def exportLevelC(
             child, transformMatrix, True, True, levelName + "_" + areaName, child.areaIndex
         )
         collisionC = collision.to_c()
-        colFile = open(os.path.join(areaDir, "collision.inc.c"), "w", newline="\n")
-        colFile.write(collisionC.source)
-        colFile.close()
+        writeFile(os.path.join(areaDir, "collision.inc.c"), collisionC.source)
         levelDataString += '#include "levels/' + levelName + "/" + areaName + '/collision.inc.c"\n'
         headerString += collisionC.header
 
         # Write rooms
         if child.enableRoomSwitch:
             roomsC = collision.to_c_rooms()
-            roomFile = open(os.path.join(areaDir, "room.inc.c"), "w", newline="\n")
-            roomFile.write(roomsC.source)
-            roomFile.close()
+            writeFile(os.path.join(areaDir, "room.inc.c"), roomsC.source)
             levelDataString += '#include "levels/' + levelName + "/" + areaName + '/room.inc.c"\n'
             headerString += roomsC.header
 
@@ -767,18 +762,14 @@ def exportLevelC(
         puppycamVolumeString += area.to_c_puppycam_volumes()
 
         # Write macros
-        macroFile = open(os.path.join(areaDir, "macro.inc.c"), "w", newline="\n")
         macrosC = area.to_c_macros()
-        macroFile.write(macrosC.source)
-        macroFile.close()
+        writeFile(os.path.join(areaDir, "macro.inc.c"), macrosC.source)
         levelDataString += '#include "levels/' + levelName + "/" + areaName + '/macro.inc.c"\n'
         headerString += macrosC.header
 
         # Write splines
-        splineFile = open(os.path.join(areaDir, "spline.inc.c"), "w", newline="\n")
         splinesC = area.to_c_splines()
-        splineFile.write(splinesC.source)
-        splineFile.close()
+        writeFile(os.path.join(areaDir, "spline.inc.c"), splinesC.source)
         levelDataString += '#include "levels/' + levelName + "/" + areaName + '/spline.inc.c"\n'
         headerString += splinesC.header
 
@@ -815,67 +806,60 @@ def exportLevelC(
                 shutil.rmtree(os.path.join(levelDir, f))
 
     gfxFormatter = SM64GfxFormatter(ScrollMethod.Vertex)
-    exportData = fModel.to_c(TextureExportSettings(savePNG, savePNG, "levels/" + levelName, levelDir), gfxFormatter)
-    staticData = exportData.staticData
-    dynamicData = exportData.dynamicData
-    texC = exportData.textureData
-
-    scrollData, hasScrolling = fModel.to_c_vertex_scroll(levelName, gfxFormatter)
-    scroll_data = scrollData.source
-    headerScroll = scrollData.header
-
-    if fModel.texturesSavedLastExport > 0:
-        levelDataString = '#include "levels/' + levelName + '/texture_include.inc.c"\n' + levelDataString
-        texPath = os.path.join(levelDir, "texture_include.inc.c")
-        texFile = open(texPath, "w", newline="\n")
-        texFile.write(texC.source)
-        texFile.close()
-
-    modifyTexScrollFiles(exportDir, levelDir, headerScroll, scroll_data, hasScrolling)
-
-    # Write materials
-    if DLFormat == DLFormat.Static:
-        staticData.append(dynamicData)
-    else:
-        geoString = writeMaterialFiles(
-            exportDir,
-            levelDir,
-            '#include "levels/' + levelName + '/header.h"',
-            '#include "levels/' + levelName + '/material.inc.h"',
-            dynamicData.header,
-            dynamicData.source,
-            geoString,
-            customExport,
+    # Model data is streamed to the exported files, since it can be too large to keep in memory.
+    with CDataStream() as staticData, CDataStream() as dynamicData, CDataStream() as texC:
+        fModel.to_c_parts(
+            TextureExportSettings(savePNG, savePNG, "levels/" + levelName, levelDir),
+            gfxFormatter,
+            staticData,
+            dynamicData,
+            texC,
         )
 
-    modelPath = os.path.join(levelDir, "model.inc.c")
-    modelFile = open(modelPath, "w", newline="\n")
-    modelFile.write(staticData.source)
-    modelFile.close()
+        scrollData, hasScrolling = fModel.to_c_vertex_scroll(levelName, gfxFormatter)
+        scroll_data = scrollData.source
+        headerScroll = scrollData.header
+
+        if fModel.texturesSavedLastExport > 0:
+            levelDataString = '#include "levels/' + levelName + '/texture_include.inc.c"\n' + levelDataString
+            texPath = os.path.join(levelDir, "texture_include.inc.c")
+            writeCDataSourceOnly(texC, texPath)
+
+        modifyTexScrollFiles(exportDir, levelDir, headerScroll, scroll_data, hasScrolling)
+
+        # Write materials
+        if DLFormat == DLFormat.Static:
+            staticData.append(dynamicData)
+        else:
+            geoString = writeMaterialFiles(
+                exportDir,
+                levelDir,
+                '#include "levels/' + levelName + '/header.h"',
+                '#include "levels/' + levelName + '/material.inc.h"',
+                dynamicData.header,
+                dynamicData.source,
+                geoString,
+                customExport,
+            )
+
+        modelPath = os.path.join(levelDir, "model.inc.c")
+        writeCDataSourceOnly(staticData, modelPath)
+        headerString += staticData.header
 
     fModel.freePalettes()
 
     levelDataString += '#include "levels/' + levelName + '/model.inc.c"\n'
-    headerString += staticData.header
     # headerString += '\nextern const LevelScript level_' + levelName + '_entry[];\n'
     # headerString += '\n#endif\n'
 
     # Write geolayout
-    geoFile = open(os.path.join(levelDir, "geo.inc.c"), "w", newline="\n")
-    geoFile.write(geoString)
-    geoFile.close()
+    writeFile(os.path.join(levelDir, "geo.inc.c"), geoString)
 
-    levelDataFile = open(os.path.join(levelDir, "leveldata.inc.c"), "w", newline="\n")
-    levelDataFile.write(levelDataString)
-    levelDataFile.close()
+    writeFile(os.path.join(levelDir, "leveldata.inc.c"), levelDataString)
 
-    headerFile = open(os.path.join(levelDir, "header.inc.h"), "w", newline="\n")
-    headerFile.write(headerString)
-    headerFile.close()
+    writeFile(os.path.join(levelDir, "header.inc.h"), headerString)
 
-    scriptFile = open(os.path.join(levelDir, "script.c"), "w", newline="\n")
-    scriptFile.write(levelscriptString)
-    scriptFile.close()
+    writeFile(os.path.join(levelDir, "script.c"), levelscriptString)
 
     if customExport:
         cameraVolumeString = (
@@ -883,9 +867,7 @@ def exportLevelC(
             + "// Make sure to also add the struct name to the LEVEL_DEFINE in levels/level_defines.h.\n"
             + cameraVolumeString
         )
-        cameraFile = open(os.path.join(levelDir, "camera_trigger.inc.c"), "w", newline="\n")
-        cameraFile.write(cameraVolumeString)
-        cameraFile.close()
+        writeFile(os.path.join(levelDir, "camera_trigger.inc.c"), cameraVolumeString)
 
         hasPuppyCamData = puppycamVolumeString != ""
         puppycamVolumeString = (
@@ -894,9 +876,7 @@ def exportLevelC(
         )
 
         if hasPuppyCamData:
-            cameraFile = open(os.path.join(levelDir, "puppycam_trigger.inc.c"), "w", newline="\n")
-            cameraFile.write(puppycamVolumeString)
-            cameraFile.close()
+            writeFile(os.path.join(levelDir, "puppycam_trigger.inc.c"), puppycamVolumeString)
 
     if not customExport:
         if DLFormat != DLFormat.Static:
@@ -1009,6 +989,7 @@ def exportLevelC(
         if texScrollFileStatus is not None:
             fileStatus.starSelectC = texScrollFileStatus.starSelectC
 
+    printExport(f"Level {levelName}: {fileSink.getReport(fileCounts)}", "NORMAL")
     return fileStatus
 
 
@@ -1064,6 +1045,7 @@ class SM64_ExportLevel(ObjectDataExporter):
     bl_label = "Export Level"
     bl_options = {"REGISTER", "UNDO", "PRESET"}
 
+    @profileExport
     def execute(self, context):
         if context.mode != "OBJECT":
             raise PluginError("Operator can only be used in object mode.")
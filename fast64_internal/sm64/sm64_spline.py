@@ -111,6 +111,7 @@ class SM64_ExportSpline(bpy.types.Operator):
     bl_label = "Export Spline"
     bl_options = {"REGISTER", "UNDO"}
 
+    @profileExport
     def execute(self, context):
         context.object.sm64_special_enum = self.sm64_special_enum
         bpy.context.region.tag_redraw()
@@ -454,10 +454,5 @@ def writeTexScrollFiles(exportDir, assetDir, header, data):
     texscrollCPath = os.path.join(assetDir, "texscroll.inc.c")
     texscrollHPath = os.path.join(assetDir, "texscroll.inc.h")
 
-    texscrollCFile = open(texscrollCPath, "w", newline="\n")
-    texscrollCFile.write(data)
-    texscrollCFile.close()
-
-    texscrollHFile = open(texscrollHPath, "w", newline="\n")
-    texscrollHFile.write(header)
-    texscrollHFile.close()
+    writeFile(texscrollCPath, data)
+    writeFile(texscrollHPath, header)
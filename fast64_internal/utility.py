@@ -1,7 +1,8 @@
-import bpy, random, string, os, math, traceback, re, os, mathutils
+import bpy, random, string, os, io, math, traceback, re, os, mathutils, shutil, tempfile
 from math import pi, ceil, degrees, radians
 from mathutils import *
 from .utility_anim import *
+from .utility_profile import exportProfiler, printExport, profileStage, profileExport
 from typing import Callable, Iterable, Any
 
 CollectionProperty = Any  # collection prop as defined by using bpy.props.CollectionProperty
@@ -100,10 +101,154 @@ def readFile(filepath):
     return data
 
 
+# Existing files are compared with exported data in chunks of this many bytes.
+FILE_COMPARE_CHUNK_SIZE = 1 << 20
+
+
+class FileSink:
+    """
+    Writes exported files, leaving files that already have the same content untouched.
+    This keeps their modification time, so that make does not rebuild everything that includes them.
+    Changed files are written to a temporary file first and then renamed, so a failed export never leaves partial files.
+    """
+
+    def __init__(self):
+        self.rewritten = 0
+        self.unchanged = 0
+
+    def isUnchanged(self, filepath: str, data: bytes) -> bool:
+        try:
+            if os.path.getsize(filepath) != len(data):
+                return False
+            data = memoryview(data)
+            with open(filepath, "rb") as file:
+                for offset in range(0, len(data), FILE_COMPARE_CHUNK_SIZE):
+                    if file.read(FILE_COMPARE_CHUNK_SIZE) != data[offset : offset + FILE_COMPARE_CHUNK_SIZE]:
+                        return False
+            return True
+        except OSError:
+            return False
+
+    def write(self, filepath: str, data: bytes):
+        exportProfiler.setOutputPath(filepath)
+        with exportProfiler.timer("file I/O"):
+            self.writeData(filepath, data)
+
+    def writeData(self, filepath: str, data: bytes):
+        if self.isUnchanged(filepath, data):
+            self.countWrite(True)
+            return
+
+        def writeTo(file):
+            file.write(data)
+            return False
+
+        self.replaceFile(filepath, writeTo)
+
+    def replaceFile(self, filepath: str, writeTo: Callable):
+        """
+        Writes a temporary file with writeTo(binary file), then renames it to filepath.
+        writeTo returns True if what it wrote is the same as the existing file, which is then left untouched.
+        """
+        directory = os.path.dirname(os.path.abspath(filepath))
+        fd, tempPath = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(filepath), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                unchanged = writeTo(file)
+            if unchanged:
+                os.remove(tempPath)
+            else:
+                # mkstemp creates the file as private, give it the permissions a normal write would have.
+                if os.path.exists(filepath):
+                    shutil.copymode(filepath, tempPath)
+                else:
+                    umask = os.umask(0)
+                    os.umask(umask)
+                    os.chmod(tempPath, 0o666 & ~umask)
+                os.replace(tempPath, filepath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        self.countWrite(unchanged)
+
+    def countWrite(self, unchanged: bool):
+        if unchanged:
+            self.unchanged += 1
+            exportProfiler.count("files unchanged")
+        else:
+            self.rewritten += 1
+            exportProfiler.count("files rewritten")
+
+    def writeText(self, filepath: str, text: str):
+        self.write(filepath, text.encode("utf-8"))
+
+    def writeStream(self, filepath: str, writeTo: Callable):
+        """
+        Writes a file from a function taking a text file object, ex. CData.writeSourceTo.
+        The text goes to a temporary file and is compared with the existing file as it is written,
+        so that large files (ex. CDataStream) are never held in memory.
+        """
+        exportProfiler.setOutputPath(filepath)
+        with exportProfiler.timer("file I/O"), ComparingFileWriter(filepath, writeTo) as writer:
+            self.replaceFile(filepath, writer.writeTo)
+
+    def getCounts(self) -> tuple[int, int]:
+        return self.rewritten, self.unchanged
+
+    def getReport(self, since: tuple[int, int] = (0, 0)) -> str:
+        """Returns the number of rewritten and unchanged files, counted from a previous getCounts() if given."""
+        return f"{self.rewritten - since[0]} files rewritten, {self.unchanged - since[1]} unchanged"
+
+
+class ComparingFileWriter:
+    """
+    Text file object used by FileSink.writeStream: writeText(self) encodes its text to a binary file,
+    comparing it with the existing content of filepath as it goes.
+    """
+
+    def __init__(self, filepath: str, writeText: Callable):
+        self.writeText = writeText
+        self.file = None
+        try:
+            self.existingFile = open(filepath, "rb")
+        except OSError:
+            self.existingFile = None
+        self.unchanged = self.existingFile is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self.file.write(data)
+        if self.unchanged:
+            self.unchanged = self.existingFile.read(len(data)) == data
+        return len(text)
+
+    def writeTo(self, file) -> bool:
+        """Writes the text to file, returns True if it is the whole existing file."""
+        self.file = file
+        self.writeText(self)
+        unchanged = self.unchanged and self.existingFile.read(1) == b""
+        # The existing file must be closed before it is replaced on Windows.
+        self.close()
+        return unchanged
+
+    def close(self):
+        if self.existingFile is not None:
+            self.existingFile.close()
+            self.existingFile = None
+
+
+fileSink = FileSink()
+
+
 def writeFile(filepath, data):
-    datafile = open(filepath, "w", newline="\n", encoding="utf-8")
-    datafile.write(data)
-    datafile.close()
+    fileSink.writeText(filepath, data)
 
 
 def checkObjectReference(obj, title):
@@ -297,25 +442,16 @@ def writeXMLData(data, xmlPath):
 
 
 def writeCData(data, headerPath, sourcePath):
-    sourceFile = open(sourcePath, "w", newline="\n", encoding="utf-8")
-    sourceFile.write(data.source)
-    sourceFile.close()
-
-    headerFile = open(headerPath, "w", newline="\n", encoding="utf-8")
-    headerFile.write(data.header)
-    headerFile.close()
+    fileSink.writeStream(sourcePath, data.writeSourceTo)
+    fileSink.writeStream(headerPath, data.writeHeaderTo)
 
 
 def writeCDataSourceOnly(data, sourcePath):
-    sourceFile = open(sourcePath, "w", newline="\n", encoding="utf-8")
-    sourceFile.write(data.source)
-    sourceFile.close()
+    fileSink.writeStream(sourcePath, data.writeSourceTo)
 
 
 def writeCDataHeaderOnly(data, headerPath):
-    headerFile = open(headerPath, "w", newline="\n", encoding="utf-8")
-    headerFile.write(data.header)
-    headerFile.close()
+    fileSink.writeStream(headerPath, data.writeHeaderTo)
 
 
 class CData:
@@ -327,6 +463,82 @@ class CData:
         self.source += other.source
         self.header += other.header
 
+    # Stream interface, see CDataStream. Classes with a to_c_stream(fp) method write to either.
+    def writeSource(self, text: str):
+        self.source += text
+
+    def writeHeader(self, text: str):
+        self.header += text
+
+    def writeSourceTo(self, file):
+        file.write(self.source)
+
+    def writeHeaderTo(self, file):
+        file.write(self.header)
+
+
+# Size in characters after which CDataStream moves its text from memory to temporary files.
+C_DATA_SPILL_SIZE = 16 * 1024 * 1024
+
+
+class CDataStream:
+    """
+    CData that streams its text instead of concatenating strings.
+    Text is kept in memory until it reaches spillSize characters, then it is moved to temporary files,
+    so that large exports have bounded memory usage. Use a spillSize of 0 to never spill.
+    The source and header properties read back the whole text, and are meant for compatibility only.
+    """
+
+    def __init__(self, spillSize: int = C_DATA_SPILL_SIZE):
+        self.sourceFile = tempfile.SpooledTemporaryFile(spillSize, "w+", newline="\n", encoding="utf-8")
+        self.headerFile = tempfile.SpooledTemporaryFile(spillSize, "w+", newline="\n", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.sourceFile.close()
+        self.headerFile.close()
+
+    def append(self, other):
+        other.writeSourceTo(self.sourceFile)
+        other.writeHeaderTo(self.headerFile)
+
+    def writeSource(self, text: str):
+        self.sourceFile.write(text)
+
+    def writeHeader(self, text: str):
+        self.headerFile.write(text)
+
+    @staticmethod
+    def copyFile(srcFile, dstFile):
+        srcFile.seek(0)
+        shutil.copyfileobj(srcFile, dstFile)
+        srcFile.seek(0, os.SEEK_END)
+
+    def writeSourceTo(self, file):
+        self.copyFile(self.sourceFile, file)
+
+    def writeHeaderTo(self, file):
+        self.copyFile(self.headerFile, file)
+
+    @property
+    def source(self) -> str:
+        self.sourceFile.seek(0)
+        text = self.sourceFile.read()
+        self.sourceFile.seek(0, os.SEEK_END)
+        return text
+
+    @property
+    def header(self) -> str:
+        self.headerFile.seek(0)
+        text = self.headerFile.read()
+        self.headerFile.seek(0, os.SEEK_END)
+        return text
+
 
 def getObjectFromData(data):
     for obj in bpy.data.objects:
@@ -463,14 +675,10 @@ def writeMaterialFiles(
     levelMatCPath = os.path.join(assetDir, "material.inc.c")
     levelMatHPath = os.path.join(assetDir, "material.inc.h")
 
-    levelMatCFile = open(levelMatCPath, "w", newline="\n")
-    levelMatCFile.write(dynamic_data)
-    levelMatCFile.close()
+    writeFile(levelMatCPath, dynamic_data)
 
     headerDynamic = headerInclude + "\n\n" + headerDynamic
-    levelMatHFile = open(levelMatHPath, "w", newline="\n")
-    levelMatHFile.write(headerDynamic)
-    levelMatHFile.close()
+    writeFile(levelMatHPath, headerDynamic)
 
     return matHInclude + "\n\n" + geoString
 
@@ -775,16 +983,65 @@ def copy_object_and_apply(obj: bpy.types.Object, apply_scale=False, apply_modifi
     if apply_scale:
         bounds_mtx = bounds_mtx @ scale_mtx_from_vector(obj.scale)  # apply scale if needed
     obj_copy["culling_bounds"] = rotate_bounds(obj_copy.bound_box, bounds_mtx)
+    return obj_copy
+
+
+class TempExportSession:
+    """
+    Objects created by store_original_meshes for one export, so that they can be found without scanning bpy.data.
+    Temp objects are indexed by their instanced_mesh_name, and cleanup only touches what was created or flagged here.
+    """
+
+    def __init__(self):
+        self.temp_objects: dict[str, bpy.types.Object] = {}  # first copy for each instanced_mesh_name, for lookup
+        self.all_temp_objects: list[bpy.types.Object] = []  # every copy, including ones with a colliding name
+        self.flagged_objects: list[bpy.types.Object] = []  # originals given instanced_mesh_name / original_mtx
+
+    def add_temp_object(self, instanced_mesh_name: str, obj_copy: bpy.types.Object):
+        self.temp_objects.setdefault(instanced_mesh_name, obj_copy)
+        self.all_temp_objects.append(obj_copy)
+
+    def get_temp_object(self, obj: bpy.types.Object) -> bpy.types.Object | None:
+        return self.temp_objects.get(obj.get("instanced_mesh_name"))
+
+    def cleanup(self):
+        remove_data = []
+        for obj_copy in self.all_temp_objects:
+            remove_data.append(obj_copy.data)
+            bpy.data.objects.remove(obj_copy)
+        for obj in self.flagged_objects:
+            if obj.get("instanced_mesh_name"):
+                del obj["instanced_mesh_name"]
+            if obj.get("original_mtx"):
+                del obj["original_mtx"]
+        removeTempData(remove_data)
+        self.temp_objects.clear()
+        self.all_temp_objects.clear()
+        self.flagged_objects.clear()
+
 
+temp_export_session: TempExportSession | None = None
 
-def store_original_meshes(add_warning: Callable[[str], None]):
+
+def store_original_meshes(add_warning: Callable[[str], None]) -> TempExportSession:
     """
     - Creates new objects at 0, 0, 0 with shared mesh
     - Original mesh name is saved to each object
+    - Starts the export session used by get_obj_temp_mesh and cleanupTempMeshes
     """
+    global temp_export_session
+    if temp_export_session is not None:
+        # Left over from an export that was not cleaned up, its objects may already be gone (ex. after an undo),
+        # so remove leftovers by scanning for them instead.
+        temp_export_session = None
+        cleanupTempMeshes()
+    session = TempExportSession()
+    temp_export_session = session
+
     instanced_meshes = set()
     active_obj = bpy.context.view_layer.objects.active
     for obj in yield_children(active_obj):
+        session.flagged_objects.append(obj)
         if obj.data is not None:
             has_modifiers = len(obj.modifiers) != 0
             has_uneven_scale = not obj_scale_is_unified(obj)
@@ -799,7 +1056,7 @@ def store_original_meshes(add_warning: Callable[[str], None]):
 
                 if obj.data.name not in instanced_meshes:
                     instanced_meshes.add(obj.data.name)
-                    copy_object_and_apply(obj)
+                    session.add_temp_object(obj["instanced_mesh_name"], copy_object_and_apply(obj))
             else:
                 if shares_mesh and has_modifiers:
                     add_warning(
@@ -810,15 +1067,20 @@ def store_original_meshes(add_warning: Callable[[str], None]):
                         f'Object "{obj.name}" cannot be instanced due to uneven object scaling and an extra displaylist will be created. Set all scale values to the same value to allow instancing.'
                     )
 
-                copy_object_and_apply(obj, apply_scale=True, apply_modifiers=has_modifiers)
+                obj_copy = copy_object_and_apply(obj, apply_scale=True, apply_modifiers=has_modifiers)
+                session.add_temp_object(obj["instanced_mesh_name"], obj_copy)
     bpy.context.view_layer.objects.active = active_obj
+    return session
 
 
 def get_obj_temp_mesh(obj):
+    if temp_export_session is not None:
+        return temp_export_session.get_temp_object(obj)
     for o in bpy.data.objects:
         if o.get("temp_export") and o.get("instanced_mesh_name") == obj.get("instanced_mesh_name"):
             return o
 
+
 def apply_objects_modifiers_and_transformations(allObjs: Iterable[bpy.types.Object]):
     # first apply modifiers so that any objects that affect each other are taken into consideration
     for selectedObj in allObjs:
@@ -837,7 +1099,11 @@ def apply_objects_modifiers_and_transformations(allObjs: Iterable[bpy.types.Obje
 
         bpy.ops.object.transform_apply(location=False, rotation=True, scale=True, properties=False)
 
+@profileStage("object duplication")
 def duplicateHierarchy(obj, ignoreAttr, includeEmpties, areaIndex):
+    if useEvaluatedExport():
+        return evaluatedDuplicateHierarchy(obj, ignoreAttr, includeEmpties, areaIndex)
+
     # Duplicate objects to apply scale / modifiers / linked data
     bpy.ops.object.select_all(action="DESELECT")
     selectMeshChildrenOnly(obj, None, includeEmpties, areaIndex)
@@ -871,6 +1137,87 @@ def duplicateHierarchy(obj, ignoreAttr, includeEmpties, areaIndex):
         raise Exception(str(e))
 
 
+def useEvaluatedExport() -> bool:
+    return bpy.context.scene.fast64.settings.evaluated_export
+
+
+def isSelectableForExport(obj: bpy.types.Object) -> bool:
+    # Objects that are not selectable are skipped by bpy.ops.object.duplicate.
+    return obj.visible_get() and not obj.hide_select
+
+
+def copyEvaluatedObject(obj: bpy.types.Object, depsgraph: bpy.types.Depsgraph, meshMatrix: mathutils.Matrix):
+    """
+    Copies obj without linking it to the scene.
+    Mesh objects get their evaluated mesh (modifiers and shape keys applied) transformed by meshMatrix as their own data.
+    """
+    objCopy = obj.copy()
+    if isinstance(obj.data, bpy.types.Mesh):
+        evaluatedObj = obj.evaluated_get(depsgraph)
+        objCopy.data = bpy.data.meshes.new_from_object(evaluatedObj, preserve_all_data_layers=True, depsgraph=depsgraph)
+        objCopy.data.transform(meshMatrix)
+        objCopy.modifiers.clear()
+    return objCopy
+
+
+def setEvaluatedTransform(objCopy: bpy.types.Object, parentCopy: bpy.types.Object | None, worldMatrix: mathutils.Matrix):
+    """
+    Parents objCopy and gives it worldMatrix as its world matrix, like parenting with keep transform does.
+    The world matrix of parentCopy has to be set first, since the depsgraph never evaluates these copies.
+    """
+    objCopy.parent = parentCopy
+    if parentCopy is not None:
+        objCopy.matrix_parent_inverse = parentCopy.matrix_world.inverted_safe()
+    else:
+        objCopy.matrix_parent_inverse = mathutils.Matrix.Identity(4)
+    objCopy.matrix_world = worldMatrix
+
+
+def getEvaluatedParent(obj: bpy.types.Object, copies: dict, ignoreAttr: str | None) -> bpy.types.Object | None:
+    """
+    Returns the copy obj should be parented to.
+    Objects with ignoreAttr are unparented, and their children are moved to the closest parent without it.
+    """
+    if ignoreAttr is not None and getattr(obj, ignoreAttr):
+        return None
+    parent = obj.parent
+    while parent in copies and ignoreAttr is not None and getattr(parent, ignoreAttr):
+        parent = parent.parent
+    return copies.get(parent)
+
+
+def evaluatedDuplicateHierarchy(obj, ignoreAttr, includeEmpties, areaIndex):
+    """
+    Same result as duplicateHierarchy, without using operators or modifying the scene.
+    Meshes are read from the evaluated depsgraph and their world rotation / scale is applied in memory,
+    so that each copy only keeps its world location, like after transform_apply.
+    The copies are not linked to any collection, cleanupDuplicatedObjects still removes them.
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    objs = [obj]
+    for child in yieldMeshChildrenOnly(obj, None, includeEmpties, areaIndex):
+        child.original_name = child.name
+        if child != obj and isSelectableForExport(child):
+            objs.append(child)
+
+    copies = {}
+    allObjs = []
+    try:
+        # objs has parents before children, so parent copies are always transformed first
+        for original in objs:
+            evaluatedWorld = original.evaluated_get(depsgraph).matrix_world
+            worldMatrix = mathutils.Matrix.Translation(evaluatedWorld.translation)
+            objCopy = copyEvaluatedObject(original, depsgraph, worldMatrix.inverted() @ evaluatedWorld)
+            allObjs.append(objCopy)
+            copies[original] = objCopy
+            setEvaluatedTransform(objCopy, getEvaluatedParent(original, copies, ignoreAttr), worldMatrix)
+    except Exception:
+        cleanupDuplicatedObjects(allObjs)
+        raise
+
+    return copies[obj], allObjs
+
+
 enumSM64PreInlineGeoLayoutObjects = {"Geo ASM", "Geo Branch", "Geo Displaylist", "Custom Geo Command"}
 
 
@@ -902,7 +1249,8 @@ def checkSM64EmptyUsesGeoLayout(sm64_obj_type):
     return sm64_obj_type in enumSM64EmptyWithGeolayout or checkIsSM64InlineGeoLayout(sm64_obj_type)
 
 
-def selectMeshChildrenOnly(obj, ignoreAttr, includeEmpties, areaIndex):
+def yieldMeshChildrenOnly(obj, ignoreAttr, includeEmpties, areaIndex):
+    """Yields the objects selected by selectMeshChildrenOnly, parents before children."""
     checkArea = areaIndex is not None and obj.data is None
     if checkArea and obj.sm64_obj_type == "Area Root" and obj.areaIndex != areaIndex:
         return
@@ -910,13 +1258,18 @@ def selectMeshChildrenOnly(obj, ignoreAttr, includeEmpties, areaIndex):
     isMesh = isinstance(obj.data, bpy.types.Mesh)
     isEmpty = obj.data is None and includeEmpties and checkSM64EmptyUsesGeoLayout(obj.sm64_obj_type)
     if (isMesh or isEmpty) and not ignoreObj:
-        obj.select_set(True)
-        obj.original_name = obj.name
+        yield obj
     for child in obj.children:
         if checkArea and obj.sm64_obj_type == "Level Root":
             if not (child.data is None and child.sm64_obj_type == "Area Root"):
                 continue
-        selectMeshChildrenOnly(child, ignoreAttr, includeEmpties, areaIndex)
+        yield from yieldMeshChildrenOnly(child, ignoreAttr, includeEmpties, areaIndex)
+
+
+def selectMeshChildrenOnly(obj, ignoreAttr, includeEmpties, areaIndex):
+    for child in yieldMeshChildrenOnly(obj, ignoreAttr, includeEmpties, areaIndex):
+        child.select_set(True)
+        child.original_name = child.name
 
 
 def cleanupDuplicatedObjects(selected_objects):
@@ -932,6 +1285,14 @@ def cleanupDuplicatedObjects(selected_objects):
 
 def cleanupTempMeshes():
     """Delete meshes that have been duplicated for instancing"""
+    global temp_export_session
+    if temp_export_session is not None:
+        session = temp_export_session
+        temp_export_session = None
+        session.cleanup()
+        return
+
+    # No session, scan for temp objects instead
     remove_data = []
     for obj in bpy.data.objects:
         if obj.get("temp_export"):
@@ -942,7 +1303,10 @@ def cleanupTempMeshes():
                 del obj["instanced_mesh_name"]
             if obj.get("original_mtx"):
                 del obj["original_mtx"]
+    removeTempData(remove_data)
+
 
+def removeTempData(remove_data: list):
     for data in remove_data:
         data_type = type(data)
         if data_type == bpy.types.Mesh:
@@ -1038,10 +1402,9 @@ def writeInsertableFile(filepath, dataType, address_ptrs, startPtr, data):
     address += 4
 
     # 16-? - Pointer address list
-    for i in range(len(address_ptrs)):
-        openfile.seek(address)
-        openfile.write(address_ptrs[i].to_bytes(4, "big"))
-        address += 4
+    openfile.seek(address)
+    openfile.write(b"".join([ptr.to_bytes(4, "big") for ptr in address_ptrs]))
+    address += 4 * len(address_ptrs)
 
     openfile.seek(address)
     openfile.write(data)
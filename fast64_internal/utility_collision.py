@@ -0,0 +1,44 @@
+from .utility import PluginError, printExport
+
+
+class CollisionVertexWelder:
+    """
+    Welds collision triangle corners with the same rounded position into shared vertices.
+    Vertices are looked up in a dict keyed on position, instead of scanning the vertex list for every corner.
+    Works with both the SM64 and OoT collision classes, since only the vertex class differs.
+    """
+
+    def __init__(self, name: str, vertices: list, vertexClass: type, maxIndex: int):
+        self.name = name
+        self.vertices = vertices  # list of vertexClass, usually the collision's own vertex list
+        self.vertexClass = vertexClass
+        self.maxIndex = maxIndex
+        self.vertexIndices: dict[tuple[int, int, int], int] = {
+            tuple(vertex.position): index for index, vertex in enumerate(vertices)
+        }
+        self.cornerCount = 0
+
+    def getIndex(self, roundedPosition: tuple[int, int, int]) -> int:
+        self.cornerCount += 1
+        index = self.vertexIndices.get(roundedPosition)
+        if index is None:
+            index = len(self.vertices)
+            self.vertices.append(self.vertexClass(roundedPosition))
+            self.vertexIndices[roundedPosition] = index
+        return index
+
+    def getIndices(self, roundedPositions) -> list[int]:
+        return [self.getIndex(roundedPosition) for roundedPosition in roundedPositions]
+
+    def finish(self):
+        """Reports vertex counts before and after welding, and checks them against the index limit."""
+        printExport(
+            f"Collision {self.name}: {self.cornerCount} triangle corners welded into {len(self.vertices)} vertices "
+            + f"(limit {self.maxIndex + 1})",
+            "NORMAL",
+        )
+        if len(self.vertices) > self.maxIndex + 1:
+            raise PluginError(
+                f"Collision {self.name} has {len(self.vertices)} unique vertices, "
+                + f"but vertex indices can only go up to {self.maxIndex}. Try splitting the collision mesh."
+            )
@@ -0,0 +1,162 @@
+import bpy, datetime, functools, importlib, json, os, time
+
+EXPORT_LOG_LEVELS = {"QUIET": 0, "NORMAL": 1, "VERBOSE": 2}
+EXPORT_PROFILE_FILENAME = "fast64_export_profile.json"
+EXPORT_COST_FILENAME = "fast64_display_list_cost.json"
+
+
+def printExport(message: str, level: str = "VERBOSE"):
+    """Prints export progress, if the export log level setting is at least level."""
+    if EXPORT_LOG_LEVELS[bpy.context.scene.fast64.settings.export_log_level] >= EXPORT_LOG_LEVELS[level]:
+        print(message)
+
+
+class ProfileTimer:
+    def __init__(self, profiler: "ExportProfiler", stage: str):
+        self.profiler = profiler
+        self.stage = stage
+        self.start = 0.0
+        self.nestedTime = 0.0  # time spent in stages started inside this one
+
+    def __enter__(self):
+        self.profiler.timers.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        timers = self.profiler.timers
+        timers.pop()
+        stats = self.profiler.stages.setdefault(self.stage, [0.0, 0.0, 0])
+        # Recursive calls (ex. collision of child objects) are only counted once in the total time.
+        if not any(timer.stage == self.stage for timer in timers):
+            stats[0] += elapsed
+        stats[1] += elapsed - self.nestedTime
+        stats[2] += 1
+        if timers:
+            timers[-1].nestedTime += elapsed
+        return False
+
+
+class ExportProfiler:
+    """
+    Collects the time spent in each export stage, and event counters (ex. cache hits), during an export.
+    Stages can be nested: each stage records its total time, and its own time excluding the stages inside it.
+    """
+
+    def __init__(self):
+        self.name = None
+        self.depth = 0  # exports started during another export are part of the outer one
+        self.startTime = 0.0
+        self.stages: dict[str, list] = {}  # name : [total seconds, own seconds, calls]
+        self.counters: dict[str, int] = {}
+        self.timers: list[ProfileTimer] = []
+        self.directory = None  # directory of the first exported file, where the report is saved
+        self.lastReport: dict | None = None
+        self.costReports: list[dict] = []  # estimated display list cost of each exported model
+        self.lastCostReports: list[dict] | None = None
+
+    def timer(self, stage: str) -> ProfileTimer:
+        return ProfileTimer(self, stage)
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def addCostReport(self, report: dict):
+        self.costReports.append(report)
+
+    def setOutputPath(self, filepath: str):
+        if self.directory is None:
+            self.directory = os.path.dirname(os.path.abspath(filepath))
+
+    def begin(self, name: str):
+        if self.depth == 0:
+            self.name = name
+            self.startTime = time.perf_counter()
+            self.stages = {}
+            self.counters = {}
+            self.timers = []
+            self.costReports = []
+            self.directory = None
+        self.depth += 1
+
+    def end(self):
+        self.depth -= 1
+        if self.depth > 0:
+            return
+
+        self.lastReport = self.getReport()
+        printExport(self.getSummary(), "NORMAL")
+        settings = bpy.context.scene.fast64.settings
+        if settings.save_export_profile:
+            self.saveReport(EXPORT_PROFILE_FILENAME, self.lastReport, "export profile")
+        if len(self.costReports) > 0:
+            self.lastCostReports = self.costReports
+            costReport = {"export": self.name, "models": self.costReports}
+            self.saveReport(EXPORT_COST_FILENAME, costReport, "display list cost")
+
+    def saveReport(self, filename: str, report: dict, description: str):
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, filename)
+        try:
+            with open(path, "w", newline="\n") as file:
+                json.dump(report, file, indent=4)
+            printExport(f"Saved {description} to {path}", "NORMAL")
+        except OSError as e:
+            print(f"Could not save {description} to {path}: {e}")
+
+    def getReport(self) -> dict:
+        return {
+            "export": self.name,
+            "addonVersion": ".".join(str(number) for number in getAddonVersion()),
+            "blenderVersion": bpy.app.version_string,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.startTime, 6),
+            "stages": {
+                stage: {"seconds": round(total, 6), "ownSeconds": round(own, 6), "calls": calls}
+                for stage, (total, own, calls) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def getSummary(self) -> str:
+        report = self.lastReport
+        stages = ", ".join(f"{stage} {stats['ownSeconds']:.2f}s" for stage, stats in report["stages"].items())
+        return f"{report['export']}: {report['seconds']:.2f}s ({stages})"
+
+
+exportProfiler = ExportProfiler()
+
+
+def getAddonVersion() -> tuple:
+    addon = importlib.import_module(__package__.rpartition(".")[0])
+    return addon.bl_info["version"]
+
+
+def profileStage(stage: str):
+    """Decorator timing every call of a function as the given export stage."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with exportProfiler.timer(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profileExport(execute):
+    """Decorator for export operator execute methods, profiling the export under the operator's label."""
+
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        exportProfiler.begin(self.bl_label)
+        try:
+            return execute(self, context)
+        finally:
+            exportProfiler.end()
+
+    return wrapper
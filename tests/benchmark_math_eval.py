@@ -0,0 +1,157 @@
+"""
+Benchmarks math_eval against the ast walker it replaced, on the values read when importing a large display list
+in the vanilla decomp format (vertices, 16 bit texture data and texture command arguments).
+Run with: python tests/benchmark_math_eval.py
+"""
+
+import ast, importlib.util, os, random, re, time
+
+# math_eval only depends on the standard library, it is loaded from its file since the addon packages import bpy.
+MATH_EVAL_PATH = os.path.join(os.path.dirname(__file__), "..", "fast64_internal", "f3d", "f3d_math_eval.py")
+spec = importlib.util.spec_from_file_location("f3d_math_eval", MATH_EVAL_PATH)
+mathEval = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mathEval)
+
+# Same pattern as F3DContext.vertexFormatPatterns for the decomp format.
+VERTEX_PATTERN = (
+    r"\{\s*\{\s*"
+    + r"\{([^,\}]*),([^,\}]*),([^,\}]*)\}\s*,"
+    + r"[^,\}]*,\s*"
+    + r"\{([^,\}]*),([^,\}]*)\}\s*,\s*"
+    + r"\{([^,\}]*),([^,\}]*),([^,\}]*),([^,\}]*)\}\s*"
+    + r"\}\s*\}"
+)
+
+# Texture command arguments, as written by the decomp for gsDPLoadTextureBlock / gsDPSetTile.
+COMMAND_ARGUMENTS = [
+    "G_IM_FMT_RGBA",
+    "G_IM_SIZ_16b",
+    "32",
+    "G_TX_RENDERTILE",
+    "G_TX_WRAP | G_TX_NOMIRROR",
+    "G_TX_CLAMP | G_TX_MIRROR",
+    "G_TX_NOMASK",
+    "G_TX_NOLOD",
+    "(32 - 1) << G_TEXTURE_IMAGE_FRAC",
+    "((32 * 32) + G_IM_SIZ_16b_INCR) >> G_IM_SIZ_16b_SHIFT",
+    "-1",
+]
+
+
+class BenchmarkF3D:
+    """The F3D constants used by the benchmark data, with the values of the F3D class."""
+
+    G_IM_FMT_RGBA = 0
+    G_IM_SIZ_16b = 2
+    G_IM_SIZ_16b_INCR = 0
+    G_IM_SIZ_16b_SHIFT = 1
+    G_TX_RENDERTILE = 0
+    G_TX_WRAP = 0
+    G_TX_NOMIRROR = 0
+    G_TX_MIRROR = 1
+    G_TX_CLAMP = 2
+    G_TX_NOMASK = 0
+    G_TX_NOLOD = 0
+    G_TEXTURE_IMAGE_FRAC = 2
+
+    def __init__(self):
+        self.F3D_VER = "F3D"
+
+
+def baselineMathEval(s, f3d):
+    """math_eval before it was cached, walking the ast of every value."""
+    if isinstance(s, int):
+        return s
+
+    s = s.strip()
+    node = ast.parse(s, mode="eval")
+
+    def _eval(node):
+        if isinstance(node, ast.Expression):
+            return _eval(node.body)
+        elif isinstance(node, ast.Str):
+            return node.s
+        elif isinstance(node, ast.Name):
+            if hasattr(f3d, node.id):
+                return getattr(f3d, node.id)
+            else:
+                return node.id
+        elif isinstance(node, ast.Num):
+            return node.n
+        elif isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.USub):
+                return -1 * _eval(node.operand)
+            elif isinstance(node.op, ast.Invert):
+                return ~_eval(node.operand)
+            else:
+                raise Exception("Unsupported type {}".format(node.op))
+        elif isinstance(node, ast.BinOp):
+            return mathEval.binOps[type(node.op)](_eval(node.left), _eval(node.right))
+        elif isinstance(node, ast.Call):
+            args = list(map(_eval, node.args))
+            funcName = _eval(node.func)
+            return funcName(*args)
+        else:
+            raise Exception("Unsupported type {}".format(node))
+
+    return _eval(node.body)
+
+
+def getDisplayListData(vertexCount: int, texelCount: int, commandCount: int, seed: int = 0) -> str:
+    """C data like a vanilla model's .inc.c files: a vertex list, a 16 bit texture and texture commands."""
+    rng = random.Random(seed)
+    vertices = []
+    for i in range(vertexCount):
+        position = ", ".join(f"{rng.randint(-2000, 2000):6}" for j in range(3))
+        uv = ", ".join(f"{rng.randint(-1024, 2048):6}" for j in range(2))
+        normal = ", ".join(f"0x{rng.randint(0, 255):02x}" for j in range(3))
+        vertices.append("    {{{" + position + "}, 0, {" + uv + "}, {" + normal + ", 0xff}}},")
+    texels = [f"0x{rng.randint(0, 0xFFFF):04x}" for i in range(texelCount)]
+    commands = [
+        f"    gsDPSetTile({', '.join(rng.choice(COMMAND_ARGUMENTS) for j in range(6))})," for i in range(commandCount)
+    ]
+    return (
+        "static const Vtx model_vertices[] = {\n"
+        + "\n".join(vertices)
+        + "\n};\n\nALIGNED8 static const Texture model_texture[] = {\n"
+        + ", ".join(texels)
+        + "\n};\n\nconst Gfx model_dl[] = {\n"
+        + "\n".join(commands)
+        + "\n};\n"
+    )
+
+
+def getValueTokens(data: str) -> list[str]:
+    """The strings math_eval is called with when parsing the data, like parseVertexData and parseTextureData."""
+    tokens = []
+    vertexMatch = re.search(r"Vtx\s*model_vertices\s*\[\s*\]\s*=\s*\{([^;]*);", data, re.DOTALL)
+    for match in re.finditer(VERTEX_PATTERN, vertexMatch.group(1), re.DOTALL):
+        tokens.extend(match.groups())
+    textureMatch = re.search(r"Texture\s*model_texture\s*\[\s*\]\s*=\s*\{([^\}]*)\}", data, re.DOTALL)
+    tokens.extend(value.strip() for value in textureMatch.group(1).split(",") if value.strip() != "")
+    for match in re.finditer(r"gsDPSetTile\((.*)\),", data):
+        tokens.extend(match.group(1).split(", "))
+    return tokens
+
+
+def timeEvaluation(evaluate, tokens: list[str], f3d) -> tuple[float, list]:
+    start = time.perf_counter()
+    values = [evaluate(token, f3d) for token in tokens]
+    return time.perf_counter() - start, values
+
+
+def runBenchmark(vertexCount: int = 20000, texelCount: int = 64 * 64 * 8, commandCount: int = 2000):
+    tokens = getValueTokens(getDisplayListData(vertexCount, texelCount, commandCount))
+    f3d = BenchmarkF3D()
+    mathEval.compileMathExpression.cache_clear()
+    baselineTime, baselineValues = timeEvaluation(baselineMathEval, tokens, f3d)
+    newTime, newValues = timeEvaluation(mathEval.math_eval, tokens, f3d)
+    if newValues != baselineValues:
+        raise AssertionError("math_eval results differ from the ast walker.")
+    print(f"{len(tokens)} values")
+    print(f"ast walker: {baselineTime:.3f} s")
+    print(f"math_eval:  {newTime:.3f} s ({baselineTime / newTime:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    runBenchmark()
@@ -0,0 +1,325 @@
+import importlib.util, os
+
+# The optimizer only depends on the standard library, it is loaded from its file since the addon packages import bpy.
+OPTIMIZE_PATH = os.path.join(os.path.dirname(__file__), "..", "fast64_internal", "f3d", "f3d_gfx_optimize.py")
+spec = importlib.util.spec_from_file_location("f3d_gfx_optimize", OPTIMIZE_PATH)
+gfxOptimize = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gfxOptimize)
+
+GEOMETRY_FLAGS = {"G_ZBUFFER": 0x1, "G_SHADE": 0x4, "G_LIGHTING": 0x20000}
+commandTypes = {}
+
+
+def command(name: str, **fields):
+    """A command with the name and fields of the f3d_gbi class the optimizer matches it with."""
+    commandType = commandTypes.setdefault(name, type(name, (), {}))
+    result = commandType()
+    vars(result).update(fields)
+    return result
+
+
+class GfxList:
+    def __init__(self, name: str, commands: list):
+        self.name = name
+        self.commands = commands + [command("SPEndDisplayList")]
+
+
+def getGeometryWord(flagList: list[str]) -> int | None:
+    if any(flag not in GEOMETRY_FLAGS for flag in flagList):
+        return None
+    return sum(GEOMETRY_FLAGS[flag] for flag in flagList)
+
+
+def combine(value: str):
+    return command("DPSetCombineMode", a0=value, b0="0", c0="0", d0=value)
+
+
+def tile(tile: int, tmem: int):
+    return command("DPSetTile", fmt="G_IM_FMT_RGBA", siz="G_IM_SIZ_16b", line=8, tmem=tmem, tile=tile, palette=0)
+
+
+def triangle():
+    return command("SP1Triangle", v0=0, v1=1, v2=2, flag=0)
+
+
+def optimize(commands: list) -> list:
+    gfxList = GfxList("list", commands)
+    gfxOptimize.GfxListOptimizer(getGeometryWord).optimize(gfxList)
+    return gfxList.commands[:-1]
+
+
+def test_syncs_after_primitive_or_load_are_kept():
+    commands = [
+        command("DPPipeSync"),
+        command("DPPipeSync"),
+        triangle(),
+        command("DPPipeSync"),
+        command("DPLoadSync"),
+        command("DPLoadBlock", tile=7, uls=0, ult=0, lrs=1023, dxt=256),
+        command("DPLoadSync"),
+        command("DPLoadSync"),
+        command("DPTileSync"),
+        command("DPTileSync"),
+    ]
+    assert optimize(commands) == [commands[i] for i in (0, 2, 3, 4, 5, 6, 8)]
+
+
+def test_duplicate_state_is_removed():
+    commands = [
+        combine("TEXEL0"),
+        tile(0, 0),
+        combine("TEXEL0"),
+        tile(0, 0),
+        tile(1, 0),
+        tile(0, 256),
+        command("SPSetGeometryMode", flagList=["G_ZBUFFER", "G_SHADE"]),
+        command("SPGeometryMode", clearFlagList=["G_LIGHTING"], setFlagList=["G_SHADE"]),
+        command("SPClearGeometryMode", flagList=["G_LIGHTING"]),
+        command("SPSetGeometryMode", flagList=["G_ZBUFFER"]),
+    ]
+    # The lighting bit isn't known until SPGeometryMode clears it.
+    assert optimize(commands) == [commands[i] for i in (0, 1, 4, 5, 6, 7)]
+
+
+def test_unhandled_commands_reset_the_state():
+    for unhandled in (command("SPSegment", segment=8, base=0), command("DPLoadTextureBlock", fmt="G_IM_FMT_RGBA")):
+        commands = [
+            combine("TEXEL0"),
+            command("SPSetGeometryMode", flagList=["G_ZBUFFER"]),
+            command("DPPipeSync"),
+            unhandled,
+            combine("TEXEL0"),
+            command("SPSetGeometryMode", flagList=["G_ZBUFFER"]),
+            command("DPPipeSync"),
+        ]
+        assert optimize(commands) == commands
+
+
+def test_unknown_geometry_flags_reset_the_geometry_mode():
+    commands = [
+        command("SPSetGeometryMode", flagList=["G_ZBUFFER"]),
+        combine("TEXEL0"),
+        command("SPClearGeometryMode", flagList=["G_UNKNOWN"]),
+        command("SPSetGeometryMode", flagList=["G_ZBUFFER"]),
+        combine("TEXEL0"),
+    ]
+    assert optimize(commands) == commands[:4]
+
+
+def test_set_tile_size_is_never_removed():
+    commands = [
+        command("DPSetTileSize", t=0, uls=0, ult=0, lrs=124, lrt=124),
+        command("DPSetTileSize", t=0, uls=0, ult=0, lrs=124, lrt=124),
+        triangle(),
+        command("DPSetTileSize", t=0, uls=0, ult=0, lrs=124, lrt=124),
+    ]
+    assert optimize(commands) == commands
+
+    material = GfxList("material", commands[:2])
+    drawList = GfxList("draw", [command("SPDisplayList", displayList=material), commands[0]])
+    optimizer = gfxOptimize.GfxListOptimizer(getGeometryWord)
+    optimizer.optimizeCalls(drawList, {material})
+    assert material.commands[:-1] == commands[:2]
+    assert drawList.commands[1] is commands[0]
+    assert optimizer.removedCount == 0
+
+
+def getDrawList(firstMaterial: GfxList, secondMaterial: GfxList) -> GfxList:
+    triangles = GfxList("triangles", [command("SPVertex", count=3), triangle()])
+    return GfxList(
+        "draw",
+        [
+            command("SPDisplayList", displayList=firstMaterial),
+            command("SPDisplayList", displayList=triangles),
+            command("SPDisplayList", displayList=secondMaterial),
+            command("SPDisplayList", displayList=triangles),
+            combine("SHADE"),
+        ],
+    )
+
+
+def test_state_is_carried_into_single_caller_material_lists():
+    firstCommands = [command("DPPipeSync"), combine("TEXEL0"), tile(0, 0), combine("SHADE")]
+    secondCommands = [command("DPPipeSync"), combine("SHADE"), tile(0, 0), tile(1, 256)]
+    firstMaterial = GfxList("first", list(firstCommands))
+    secondMaterial = GfxList("second", list(secondCommands))
+    drawList = getDrawList(firstMaterial, secondMaterial)
+
+    optimizer = gfxOptimize.GfxListOptimizer(getGeometryWord)
+    optimizer.optimizeCalls(drawList, {firstMaterial, secondMaterial})
+    # The first material starts with an unknown state, the second one with the state left by the first.
+    assert firstMaterial.commands[:-1] == firstCommands
+    assert secondMaterial.commands[:-1] == [secondCommands[0], secondCommands[3]]
+    # The draw list's own command sets the combiner left by the second material.
+    assert len(drawList.commands) == 5
+    assert optimizer.removedCount == 3
+
+
+def test_state_is_not_carried_into_shared_material_lists():
+    secondCommands = [command("DPPipeSync"), combine("SHADE"), tile(0, 0), combine("SHADE")]
+    firstMaterial = GfxList("first", [combine("SHADE"), tile(0, 0)])
+    secondMaterial = GfxList("second", list(secondCommands))
+    drawList = getDrawList(firstMaterial, secondMaterial)
+
+    # The second material isn't removable, for example because another draw list calls it too.
+    optimizer = gfxOptimize.GfxListOptimizer(getGeometryWord)
+    optimizer.optimizeCalls(drawList, {firstMaterial})
+    # Only the duplicates within the list itself could be removed, which is left to GfxListOptimizer.optimize.
+    assert secondMaterial.commands[:-1] == secondCommands
+    assert len(drawList.commands) == 5
+
+    optimizer.optimize(secondMaterial)
+    assert secondMaterial.commands[:-1] == secondCommands[:3]
+
+
+def test_lists_called_by_material_lists_are_not_modified():
+    nestedCommands = [combine("SHADE"), tile(0, 0)]
+    nestedList = GfxList("nested", list(nestedCommands))
+    material = GfxList("material", [combine("SHADE"), tile(0, 0), command("SPDisplayList", displayList=nestedList)])
+    drawList = GfxList("draw", [command("SPDisplayList", displayList=material)])
+
+    gfxOptimize.GfxListOptimizer(getGeometryWord).optimizeCalls(drawList, {material, nestedList})
+    assert nestedList.commands[:-1] == nestedCommands
+
+
+def test_early_return_resets_the_state():
+    material = GfxList("material", [combine("SHADE"), command("SPCullDisplayList", vstart=0, vend=7), tile(0, 0)])
+    drawList = GfxList(
+        "draw",
+        [command("SPDisplayList", displayList=material), combine("SHADE"), tile(0, 0)],
+    )
+    gfxOptimize.GfxListOptimizer(getGeometryWord).optimizeCalls(drawList, {material})
+    # The material list can return after the combiner is set, before the tile is set.
+    assert len(drawList.commands) == 4
+
+
+def test_calls_to_external_lists_reset_the_state():
+    externalList = GfxList("0x08000000", [])
+    externalList.commands = []
+    material = GfxList("material", [combine("SHADE"), command("SPDisplayList", displayList=externalList)])
+    drawList = GfxList("draw", [command("SPDisplayList", displayList=material), combine("SHADE")])
+    gfxOptimize.GfxListOptimizer(getGeometryWord).optimizeCalls(drawList, {material})
+    assert len(drawList.commands) == 3
+
+
+def textureLoad(image, tmem: int = 0, width: int = 32, height: int = 32, cms=("G_TX_WRAP", "G_TX_NOMIRROR")):
+    """The commands saveTextureLoading writes for a 16 bit texture loaded with DPLoadBlock."""
+    tileFields = dict(fmt="G_IM_FMT_RGBA", tmem=tmem, palette=0, cmt=list(cms), cms=list(cms))
+    return [
+        command("DPTileSync"),
+        command("DPSetTextureImage", fmt="G_IM_FMT_RGBA", siz="G_IM_SIZ_16b_LOAD_BLOCK", width=1, image=image),
+        command("DPSetTile", siz="G_IM_SIZ_16b_LOAD_BLOCK", line=0, tile=7, **tileFields),
+        command("DPLoadSync"),
+        command("DPLoadBlock", tile=7, uls=0, ult=0, lrs=width * height - 1, dxt=2048 // width),
+        command("DPPipeSync"),
+        command("DPSetTile", siz="G_IM_SIZ_16b", line=width // 4, tile=0, **tileFields),
+        command("DPSetTileSize", t=0, uls=0, ult=0, lrs=(width - 1) << 2, lrt=(height - 1) << 2),
+    ]
+
+
+def paletteLoad(image, colorCount: int = 16):
+    """The commands savePaletteLoading writes."""
+    tileFields = dict(palette=0, cmt=["G_TX_WRAP", "G_TX_NOMIRROR"], cms=["G_TX_WRAP", "G_TX_NOMIRROR"])
+    return [
+        command("DPSetTextureLUT", mode="G_TT_RGBA16"),
+        command("DPSetTextureImage", fmt="G_IM_FMT_RGBA", siz="G_IM_SIZ_16b", width=1, image=image),
+        command("DPTileSync"),
+        command("DPSetTile", fmt="0", siz="0", line=0, tmem=256, tile=7, **tileFields),
+        command("DPLoadSync"),
+        command("DPLoadTLUTCmd", tile=7, count=colorCount - 1),
+        command("DPPipeSync"),
+    ]
+
+
+def getLoads(gfxList: GfxList) -> list:
+    return [command for command in gfxList.commands if type(command).__name__ in ("DPLoadBlock", "DPLoadTLUTCmd")]
+
+
+def optimizeMaterials(materialCommands: list[list], removable: bool = True) -> tuple[list[GfxList], object]:
+    """Optimizes a draw list calling materials with a triangle list after each, returns (materials, optimizer)."""
+    materials = [GfxList(f"material {index}", commands) for index, commands in enumerate(materialCommands)]
+    triangles = GfxList("triangles", [command("SPVertex", count=3), triangle()])
+    drawList = GfxList(
+        "draw",
+        [
+            callCommand
+            for material in materials
+            for callCommand in (
+                command("SPDisplayList", displayList=material),
+                command("SPDisplayList", displayList=triangles),
+            )
+        ],
+    )
+    optimizer = gfxOptimize.GfxListOptimizer(getGeometryWord)
+    optimizer.optimizeCalls(drawList, set(materials) if removable else set())
+    return materials, optimizer
+
+
+def test_texture_already_in_tmem_is_not_loaded_again():
+    image = object()
+    materials, optimizer = optimizeMaterials([textureLoad(image), [combine("SHADE")] + textureLoad(image)])
+    assert len(getLoads(materials[0])) == 1
+    assert len(getLoads(materials[1])) == 0
+    assert optimizer.removedLoadCount == 1
+    names = [type(command).__name__ for command in materials[1].commands]
+    assert "DPSetTextureImage" not in names and "DPLoadSync" not in names
+    # The render tile is set again by the material, and its size can be scrolled.
+    assert names.count("DPSetTileSize") == 1
+
+
+def test_texture_loads_differing_from_tmem_are_kept():
+    image = object()
+    for secondLoad in (
+        textureLoad(object()),
+        textureLoad(image, tmem=128),
+        textureLoad(image, width=16),
+        textureLoad(image, cms=("G_TX_CLAMP", "G_TX_NOMIRROR")),
+    ):
+        materials, optimizer = optimizeMaterials([textureLoad(image), secondLoad])
+        assert len(getLoads(materials[1])) == 1
+        assert optimizer.removedLoadCount == 0
+
+
+def test_overwritten_textures_are_loaded_again():
+    image, otherImage, palette = object(), object(), object()
+    # A 32x32 16 bit texture uses the words 0 to 255, a texture at 128 overwrites it, a palette at 256 doesn't.
+    materials, optimizer = optimizeMaterials(
+        [
+            textureLoad(image),
+            textureLoad(otherImage, tmem=128),
+            textureLoad(image),
+            paletteLoad(palette),
+            textureLoad(image),
+        ]
+    )
+    assert [len(getLoads(material)) for material in materials] == [1, 1, 1, 1, 0]
+
+    # A 32x64 texture also overwrites palettes.
+    materials, optimizer = optimizeMaterials(
+        [paletteLoad(palette), textureLoad(image), paletteLoad(palette)]
+        + [textureLoad(otherImage, height=64), paletteLoad(palette)]
+    )
+    assert [len(getLoads(material)) for material in materials] == [1, 1, 0, 1, 1]
+
+
+def test_texture_loads_are_kept_in_shared_lists_and_after_unknown_state():
+    image = object()
+    materials, optimizer = optimizeMaterials([textureLoad(image), textureLoad(image)], False)
+    assert [len(getLoads(material)) for material in materials] == [1, 1]
+
+    materials, optimizer = optimizeMaterials(
+        [textureLoad(image), [command("SPSegment", segment=8, base=0)] + textureLoad(image)]
+    )
+    assert [len(getLoads(material)) for material in materials] == [1, 1]
+
+
+def test_load_count():
+    first, second = object(), object()
+    materials = [GfxList("first", textureLoad(first)), GfxList("second", textureLoad(second))]
+    materials.append(GfxList("first again", [combine("SHADE")] + textureLoad(first)))
+    commands = [list(material.commands) for material in materials]
+    optimizer = gfxOptimize.GfxListOptimizer(getGeometryWord)
+    assert optimizer.getLoadCount(materials) == 3
+    assert optimizer.getLoadCount([materials[0], materials[2], materials[1]]) == 2
+    assert [material.commands for material in materials] == commands
+    assert optimizer.removedCount == optimizer.removedLoadCount == 0
@@ -0,0 +1,127 @@
+import importlib.util, os, struct
+
+import numpy as np
+import pytest
+
+# The encoders only depend on numpy, they are loaded from their file since the addon packages import bpy.
+ENCODE_PATH = os.path.join(os.path.dirname(__file__), "..", "fast64_internal", "f3d", "f3d_image_encode.py")
+spec = importlib.util.spec_from_file_location("f3d_image_encode", ENCODE_PATH)
+imageEncode = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(imageEncode)
+
+
+# Baseline per pixel conversions, as they were written in f3d_writer before encoding was vectorized.
+
+
+def toFloat32(value: float) -> float:
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+RGB_TO_LUM_COEF = [toFloat32(coef) for coef in (0.2126729, 0.7151522, 0.0721750)]
+
+
+def colorToLuminance(color: list[float]) -> float:
+    # mathutils.Vector.dot: single precision products, accumulated backwards in double precision.
+    luminance = 0.0
+    for index in reversed(range(3)):
+        luminance += toFloat32(RGB_TO_LUM_COEF[index] * toFloat32(color[index]))
+    return luminance
+
+
+def compactNibbleArray(texture: list[int], width: int, height: int) -> bytearray:
+    dataSize = int(width * height / 2)
+    nibbleData = [((texture[i * 2] & 0xF) << 4) | (texture[i * 2 + 1] & 0xF) for i in range(dataSize)]
+    if (width * height) % 2 == 1:
+        nibbleData.append((texture[-1] & 0xF) << 4)
+    return bytearray(nibbleData)
+
+
+def baselineRGBA16(pixel):
+    r, g, b = (int(round(pixel[field] * 0x1F)) & 0x1F for field in range(3))
+    return [(r << 3) | (g >> 2), ((g & 0x03) << 6) | (b << 1) | (1 if pixel[3] > 0.5 else 0)]
+
+
+def baselineRGBA32(pixel):
+    return [int(round(pixel[field] * 0xFF)) & 0xFF for field in range(4)]
+
+
+def baselineIA4(pixel):
+    return [((int(round(colorToLuminance(pixel[:3]) * 0x7)) & 0x7) << 1) | (1 if pixel[3] > 0.5 else 0)]
+
+
+def baselineIA8(pixel):
+    return [((int(round(colorToLuminance(pixel[:3]) * 0xF)) & 0xF) << 4) | (int(round(pixel[3] * 0xF)) & 0xF)]
+
+
+def baselineIA16(pixel):
+    return [int(round(colorToLuminance(pixel[:3]) * 0xFF)) & 0xFF, int(round(pixel[3] * 0xFF)) & 0xFF]
+
+
+def baselineI4(pixel):
+    return [int(round(colorToLuminance(pixel[:3]) * 0xF)) & 0xF]
+
+
+def baselineI8(pixel):
+    return [int(round(colorToLuminance(pixel[:3]) * 0xFF)) & 0xFF]
+
+
+# (format, bit size) : (per pixel baseline, 4 bit format)
+BASELINE_ENCODERS = {
+    ("G_IM_FMT_RGBA", "G_IM_SIZ_16b"): (baselineRGBA16, False),
+    ("G_IM_FMT_RGBA", "G_IM_SIZ_32b"): (baselineRGBA32, False),
+    ("G_IM_FMT_IA", "G_IM_SIZ_4b"): (baselineIA4, True),
+    ("G_IM_FMT_IA", "G_IM_SIZ_8b"): (baselineIA8, False),
+    ("G_IM_FMT_IA", "G_IM_SIZ_16b"): (baselineIA16, False),
+    ("G_IM_FMT_I", "G_IM_SIZ_4b"): (baselineI4, True),
+    ("G_IM_FMT_I", "G_IM_SIZ_8b"): (baselineI8, False),
+}
+
+
+def baselineEncode(pixels: np.ndarray, fmt: str, bitSize: str) -> bytearray:
+    encodePixel, is4Bit = BASELINE_ENCODERS[(fmt, bitSize)]
+    height, width = pixels.shape[:2]
+    data = [value for pixel in pixels.reshape(-1, 4).tolist() for value in encodePixel(pixel)]
+    return compactNibbleArray(data, width, height) if is4Bit else bytearray(data)
+
+
+def getRoundingEdges() -> np.ndarray:
+    """
+    The float32 values closest to halfway between two quantized values of every bit depth, and their neighbours,
+    where the rounding direction depends on the exact arithmetic. Also the alpha threshold and the range limits.
+    """
+    edges = [0.0, 1.0, 0.5]
+    for maxValue in (0x7, 0xF, 0x1F, 0xFF):
+        for value in np.arange(maxValue, dtype=np.float64):
+            edges.append((value + 0.5) / maxValue)
+    edges = np.array(edges, dtype=np.float32)
+    return np.concatenate((edges, np.nextafter(edges, np.float32(0)), np.nextafter(edges, np.float32(1))))
+
+
+ROUNDING_EDGES = getRoundingEdges()
+
+
+def getTestPixels(width: int, height: int, seed: int) -> np.ndarray:
+    """Random pixels as read from Blender (float32 values), with the values on rounding edges mixed in."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.random((height, width, 4), dtype=np.float32)
+    mask = rng.random((height, width, 4)) < 0.4
+    pixels[mask] = rng.choice(ROUNDING_EDGES, size=mask.sum())
+    # Gray pixels on rounding edges, where the luminance rounding depends on the float32 products.
+    gray = rng.random((height, width)) < 0.3
+    pixels[gray, :3] = rng.choice(ROUNDING_EDGES, size=(gray.sum(), 1))
+    return pixels.astype(np.float64)
+
+
+@pytest.mark.parametrize("fmt, bitSize", list(BASELINE_ENCODERS))
+@pytest.mark.parametrize("width, height", [(1, 1), (3, 1), (5, 3), (16, 16), (31, 7)])
+def test_encoder_matches_baseline(fmt, bitSize, width, height):
+    pixels = getTestPixels(width, height, seed=width * 100 + height)
+    encoded = imageEncode.IMAGE_ENCODERS[(fmt, bitSize)](pixels)
+    assert isinstance(encoded, bytearray)
+    assert encoded == baselineEncode(pixels, fmt, bitSize)
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 7, 64])
+def test_compact_nibbles_matches_baseline(count):
+    values = np.random.default_rng(count).integers(0, 256, size=count)
+    assert imageEncode.compactNibbles(values) == compactNibbleArray(values.tolist(), count, 1)
@@ -0,0 +1,77 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+from benchmark_math_eval import BenchmarkF3D, baselineMathEval, getDisplayListData, getValueTokens, mathEval
+
+
+@pytest.fixture(autouse=True)
+def clearCache():
+    mathEval.compileMathExpression.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "0",
+        "1458",
+        "-423",
+        "0xff",
+        "0X1F",
+        "-0x10",
+        " 12 ",
+        "-(12)",
+        "~0x0F",
+        "G_IM_SIZ_16b",
+        "G_TX_CLAMP | G_TX_MIRROR",
+        "(32 - 1) << G_TEXTURE_IMAGE_FRAC",
+        "((32 * 32) + G_IM_SIZ_16b_INCR) >> G_IM_SIZ_16b_SHIFT",
+        "7 % 3 ^ 6 & 3",
+        "10 / 4",
+        "UNKNOWN_MACRO",
+        "F3D_VER",
+    ],
+)
+def test_matches_ast_walker(value):
+    f3d = BenchmarkF3D()
+    assert mathEval.math_eval(value, f3d) == baselineMathEval(value, f3d)
+    assert mathEval.math_eval(value, f3d) == baselineMathEval(value, f3d)
+
+
+def test_int_is_returned_as_is():
+    assert mathEval.math_eval(5, BenchmarkF3D()) == 5
+
+
+def test_matches_ast_walker_on_display_list_data():
+    f3d = BenchmarkF3D()
+    tokens = getValueTokens(getDisplayListData(200, 256, 50, seed=1))
+    assert [mathEval.math_eval(token, f3d) for token in tokens] == [baselineMathEval(token, f3d) for token in tokens]
+
+
+def test_symbols_are_looked_up_on_each_instance():
+    first = BenchmarkF3D()
+    second = BenchmarkF3D()
+    assert mathEval.math_eval("G_NEW_SYMBOL", first) == "G_NEW_SYMBOL"
+
+    # Attributes set after an expression was compiled are found, and only on their own instance.
+    first.G_NEW_SYMBOL = 3
+    assert mathEval.math_eval("G_NEW_SYMBOL", first) == 3
+    assert mathEval.math_eval("G_NEW_SYMBOL << 1", first) == 6
+    assert mathEval.math_eval("G_NEW_SYMBOL", second) == "G_NEW_SYMBOL"
+
+    # Instance attributes shadow the class ones.
+    second.G_TX_CLAMP = 8
+    assert mathEval.math_eval("G_TX_CLAMP", second) == 8
+    assert mathEval.math_eval("G_TX_CLAMP", first) == 2
+
+
+def test_calls_instance_functions():
+    f3d = BenchmarkF3D()
+    f3d.G_SHIFT = lambda value, shift: value << shift
+    assert mathEval.math_eval("G_SHIFT(G_TX_CLAMP, 4)", f3d) == baselineMathEval("G_SHIFT(G_TX_CLAMP, 4)", f3d) == 32
+
+
+def test_unsupported_expression_raises():
+    with pytest.raises(Exception):
+        mathEval.math_eval("not 1", BenchmarkF3D())
@@ -0,0 +1,89 @@
+import importlib.util, os, sys, types
+
+import numpy as np
+import pytest
+
+# The palette code only depends on numpy and f3d_image_encode. It is loaded as part of a package of its own,
+# so that its relative import works without importing the addon packages, which import bpy.
+F3D_PATH = os.path.join(os.path.dirname(__file__), "..", "fast64_internal", "f3d")
+package = types.ModuleType("f3d_numpy")
+package.__path__ = [F3D_PATH]
+sys.modules["f3d_numpy"] = package
+spec = importlib.util.spec_from_file_location(
+    "f3d_numpy.f3d_palette_quantize", os.path.join(F3D_PATH, "f3d_palette_quantize.py")
+)
+paletteQuantize = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(paletteQuantize)
+
+PALETTE_FORMATS = ["G_IM_FMT_RGBA", "G_IM_FMT_IA"]
+
+
+def buildPaletteBaseline(colors: list[int]) -> tuple[list[int], list[int]]:
+    """Palette building before it was vectorized, returns (palette, palette index of each color)."""
+    palette = []
+    texture = []
+    for color in colors:
+        if color not in palette:
+            palette.append(color)
+        texture.append(palette.index(color))
+    return palette, texture
+
+
+def getRandomColors(rng, count: int) -> np.ndarray:
+    # Every 16 bit value is a valid RGBA16 and IA16 color.
+    return rng.integers(0, 0x10000, size=count)
+
+
+def quantizeAll(colors: np.ndarray, palFormat: str, maxColors: int) -> tuple[np.ndarray, list[int]]:
+    """Quantizes colors like getPaletteIndices, returns (palette color of each color, palette)."""
+    uniqueColors, inverse, counts = paletteQuantize.getUniqueColors(colors)
+    palette = paletteQuantize.quantizeColors(uniqueColors, counts, palFormat, maxColors)
+    uniqueIndices = paletteQuantize.getNearestPaletteIndices(uniqueColors, palette, palFormat)
+    return np.array(palette)[uniqueIndices[inverse]], palette
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_unique_colors_match_palette_order(seed):
+    rng = np.random.default_rng(seed)
+    # Few distinct colors, so that most of them appear several times.
+    colors = rng.choice(rng.integers(0, 0x10000, size=40), size=(16, 16))
+    uniqueColors, inverse, counts = paletteQuantize.getUniqueColors(colors)
+    palette, texture = buildPaletteBaseline(colors.ravel().tolist())
+    assert uniqueColors.tolist() == palette
+    assert inverse.tolist() == texture
+    assert counts.tolist() == [colors.ravel().tolist().count(color) for color in palette]
+
+
+@pytest.mark.parametrize("palFormat", PALETTE_FORMATS)
+@pytest.mark.parametrize("maxColors", [16, 256])
+@pytest.mark.parametrize("colorCount", [1, 17, 300, 2000])
+def test_quantized_palette_fits(palFormat, maxColors, colorCount):
+    rng = np.random.default_rng(colorCount)
+    colors = getRandomColors(rng, colorCount)
+    quantized, palette = quantizeAll(colors, palFormat, maxColors)
+    assert 0 < len(palette) <= maxColors
+    assert len(set(palette)) == len(palette)
+    assert all(0 <= color <= 0xFFFF for color in palette)
+    if len(np.unique(colors)) <= maxColors:
+        # Colors which already fit are kept.
+        assert np.array_equal(quantized, colors)
+
+
+def test_palette_features_round_trip():
+    colors = np.arange(0x10000)
+    for palFormat in PALETTE_FORMATS:
+        features = paletteQuantize.decodePaletteColors(colors, palFormat)
+        assert np.array_equal(paletteQuantize.encodePaletteFeatures(features, palFormat), colors)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("maxColors", [2, 16])
+def test_rgba16_alpha_is_separated(seed, maxColors):
+    rng = np.random.default_rng(seed)
+    colors = getRandomColors(rng, 500)
+    # Few transparent colors among many opaque ones, which a weighted median alone would put in an opaque box.
+    colors = colors | 1
+    colors[rng.choice(len(colors), size=3, replace=False)] &= ~1
+    colors = np.repeat(colors, rng.integers(1, 20, size=len(colors)))
+    quantized, palette = quantizeAll(colors, "G_IM_FMT_RGBA", maxColors)
+    assert np.array_equal(quantized & 1, colors & 1)
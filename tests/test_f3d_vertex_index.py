@@ -0,0 +1,102 @@
+import importlib.util, os, struct
+
+import numpy as np
+import pytest
+
+# The index only depends on the standard library, it is loaded from its file since the addon packages import bpy.
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "..", "fast64_internal", "f3d", "f3d_vertex_index.py")
+spec = importlib.util.spec_from_file_location("f3d_vertex_index", INDEX_PATH)
+vertexIndex = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(vertexIndex)
+
+
+def floatsAreEqual(a: float, b: float, maxDiff: int = 1) -> bool:
+    """EXPP_FloatsAreEqual from Blender's mathutils, with its 32 bit integer arithmetic."""
+    ai, bi = struct.unpack("2i", struct.pack("2f", a, b))
+    test = -1 if (ai ^ bi) < 0 else 0
+    diff = (ai ^ (test & 0x7FFFFFFF)) - bi
+    diff = (diff + 0x80000000) % 0x100000000 - 0x80000000
+    return maxDiff + diff >= 0 and maxDiff - diff >= 0
+
+
+def vectorsAreEqual(a, b) -> bool:
+    """mathutils.Vector.__eq__"""
+    return len(a) == len(b) and all(floatsAreEqual(x, y) for x, y in zip(a, b))
+
+
+class FakeF3DVert:
+    def __init__(self, position, uv):
+        self.position = position
+        self.uv = uv
+
+
+class FakeBufferVertex:
+    """Same comparison as BufferVertex, with tuples compared like mathutils vectors."""
+
+    def __init__(self, position, uv, groupIndex, materialIndex):
+        self.f3dVert = FakeF3DVert(position, uv)
+        self.groupIndex = groupIndex
+        self.materialIndex = materialIndex
+        self.bucketKeys = vertexIndex.BufferVertexIndex.getBucketKeys(self)
+
+    def __eq__(self, other):
+        return (
+            vectorsAreEqual(self.f3dVert.position, other.f3dVert.position)
+            and vectorsAreEqual(self.f3dVert.uv, other.f3dVert.uv)
+            and self.groupIndex == other.groupIndex
+            and self.materialIndex == other.materialIndex
+        )
+
+
+def getNearbyFloats(rng, count: int) -> list[float]:
+    """Float32 values where many are one or two floats apart, including both zeros."""
+    values = np.array([0.0, -0.0, 1.0, -1.0, 0.5, 100.25], dtype=np.float32)
+    values = np.concatenate((values, rng.random(4, dtype=np.float32)))
+    values = np.concatenate((values, np.nextafter(values, np.float32(np.inf))))
+    values = np.concatenate((values, np.nextafter(values, np.float32(-np.inf))))
+    return rng.choice(values, size=count).tolist()
+
+
+def getVertices(seed: int, count: int) -> list[FakeBufferVertex]:
+    rng = np.random.default_rng(seed)
+    positions = np.array(getNearbyFloats(rng, count * 3)).reshape(count, 3)
+    uvs = np.array(getNearbyFloats(rng, count * 2)).reshape(count, 2)
+    return [
+        FakeBufferVertex(tuple(positions[i]), tuple(uvs[i]), int(rng.integers(2)), int(rng.integers(2)))
+        for i in range(count)
+    ]
+
+
+def listIndex(bufferVerts: list, bufferVert) -> int | None:
+    return bufferVerts.index(bufferVert) if bufferVert in bufferVerts else None
+
+
+def test_float_steps_match_mathutils_comparison():
+    values = getNearbyFloats(np.random.default_rng(0), 400)
+    for a, b in zip(values[::2], values[1::2]):
+        stepA, stepB = vertexIndex.getFloatSteps([a, b])
+        assert (abs(stepA - stepB) <= 1) == floatsAreEqual(a, b)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_matches_list_index(seed):
+    bufferVerts = getVertices(seed, 300)
+    index = vertexIndex.BufferVertexIndex()
+    for i, bufferVert in enumerate(bufferVerts[:200]):
+        index.add(bufferVert, i)
+
+    for bufferVert in bufferVerts:
+        assert index.find(bufferVert) == listIndex(bufferVerts[:200], bufferVert)
+        assert (bufferVert in index) == (bufferVert in bufferVerts[:200])
+
+
+def test_find_returns_first_of_non_transitive_matches():
+    a, b = np.nextafter(np.float32(1.0), np.float32(2.0)), np.float32(1.0)
+    c = np.nextafter(a, np.float32(2.0))
+    # b and c are both equal to a, but not to each other.
+    bufferVerts = [FakeBufferVertex((float(value), 0.0, 0.0), (0.0, 0.0), 0, 0) for value in (c, b, a)]
+    index = vertexIndex.BufferVertexIndex()
+    for i, bufferVert in enumerate(bufferVerts[:2]):
+        index.add(bufferVert, i)
+    assert index.find(bufferVerts[2]) == 0
+    assert index.find(bufferVerts[1]) == 1